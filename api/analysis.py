@@ -1,22 +1,25 @@
 import os
-import traceback
 from dotenv import load_dotenv
-import pandas as pd
-from pymongo import MongoClient
 from datetime import datetime
 from fastapi import APIRouter, Depends
 from core.security import get_current_user
 from core.config import store_collection, analysis_collection
+from core.logger import get_logger
+from core.metrics import timer, STAGE_SECONDS
+from core.dataset_registry import registry
+from api.footfall import compute_footfall_gaps, footfall_input, get_population
+from api.history import record_analysis_snapshot
+from api.leaderboard import record_cell_stats
+from api.seasonal import build_monthly_benchmarks, monthly_benchmark
+from api.sales_store import load_sales_logs
 import asyncio
 
+logger = get_logger(__name__)
+
 
 # .env 파일 로드
 load_dotenv()
 
-# 파일 경로 절대 경로로 설정
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-MARKET_CSV = os.path.join(BASE_DIR, "data_set", "서울상권_추정매출.csv")
-
 # 라우터 정의
 router = APIRouter(prefix="/api/analysis", tags=["analysis"])
 
@@ -37,155 +40,325 @@ def ym_to_quarter_code(ym: str) -> str:
     else: q = "4"
     return f"{year}{q}"
 
+# =================================================================
+# 상권 추정매출 인덱스 (데이터셋 레지스트리가 파일 변경 시 다시 만들어 교체)
+# =================================================================
+# 분기별 파일을 추가로 넣어도 됨 (예: 서울상권_추정매출_20253.csv)
+MARKET_PATTERN = "서울상권_추정매출*.csv"
+# 데이터 교체 시 영향받는 사용자 재분석 여부 / 동시 실행 수
+DATASET_REANALYZE = os.getenv("DATASET_REANALYZE", "0").lower() in ("1", "true", "yes")
+DATASET_REANALYZE_CONCURRENCY = int(os.getenv("DATASET_REANALYZE_CONCURRENCY", "4"))
+_reanalysis_tasks = set()
+
+
+MARKET_KEY_COLUMNS = ["기준_년분기_코드", "행정동_코드", "서비스_업종_코드"]
+
+
+def build_market_rows(market_df):
+    """
+    원본 행을 (행정동, 업종, 분기) 순으로 정렬하고 "행정동:업종" → (시작, 끝) 행 구간을 만듭니다.
+    문자열은 category, 정수는 값이 들어가는 가장 작은 타입으로 줄여서 상주시킴 (유동인구 프레임과 같은 방식)
+    """
+    import numpy as np
+    import pandas as pd
+
+    df = market_df.sort_values(["행정동_코드", "서비스_업종_코드", "기준_년분기_코드"], kind="stable").reset_index(drop=True)
+    keys = (df["행정동_코드"] + ":" + df["서비스_업종_코드"]).to_numpy()
+    for col in df.columns:
+        if pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+        elif not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].astype("category")
+
+    boundaries = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    starts = np.r_[0, boundaries]
+    stops = np.r_[boundaries, len(keys)]
+    return {
+        "frame": df,
+        "offsets": {keys[a]: (int(a), int(b)) for a, b in zip(starts, stops)},
+    }
+
+
+def build_market_index(files: list):
+    """
+    CSV를 매 분석마다 읽지 않도록 (업종, 분기) / (업종, 행정동, 분기) 평균 매출을 미리 집계해 둡니다.
+    (동기 함수 - 레지스트리가 스레드에서 실행)
+    """
+    import pandas as pd
+
+    # 솔루션 프롬프트에 원본 행이 그대로 들어가므로 전체 컬럼을 읽음
+    frames = [
+        pd.read_csv(path, encoding="utf-8", dtype={col: str for col in MARKET_KEY_COLUMNS})
+        for path in files
+    ]
+    market_df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    if len(frames) > 1:
+        # 같은 분기가 여러 파일에 있으면 나중 파일(정정 자료)을 사용
+        market_df = market_df.drop_duplicates(["기준_년분기_코드", "행정동_코드", "서비스_업종_코드"], keep="last")
+
+    # CSV 최신 분기 확인
+    all_quarters = sorted(market_df["기준_년분기_코드"].unique())
+    if not all_quarters:
+        logger.error("상권 CSV 파일에 분기 데이터가 없음")
+        return None
+
+    market_index = {
+        "latest_quarter": all_quarters[-1],
+        "avg_all": market_df.groupby(["서비스_업종_코드", "기준_년분기_코드"])["당월_평균_매출"].mean().to_dict(),
+        "avg_dong": market_df.groupby(["서비스_업종_코드", "행정동_코드", "기준_년분기_코드"])["당월_평균_매출"].mean().to_dict()
+    }
+    # 월 단위 계절성 기준값 (분기 평균을 보간/외삽한 배열, 분석 때는 조회만)
+    market_index["monthly"] = build_monthly_benchmarks(market_index["avg_all"], market_index["avg_dong"])
+    # 솔루션 프롬프트용 원본 행 (분석과 같은 스냅샷 → 데이터셋 버전이 항상 같음)
+    market_index["rows"] = build_market_rows(market_df)
+    logger.info("상권 CSV 인덱스 생성 완료", extra={"latest_quarter": market_index["latest_quarter"]})
+    return market_index
+
+
+async def get_market_index():
+    """현재 상권 인덱스 스냅샷 (version, data). 없으면 None"""
+    return await registry.get("market")
+
+
+async def reanalyze_after_swap(old, new, first_claim: bool):
+    """
+    새 데이터셋으로 교체되면 영향받는 사용자만 다시 분석 (DATASET_REANALYZE=1 일 때, 워커 중 한 곳에서만)
+    - 새 분기가 추가된 경우: 최신 월이 이전 데이터의 마지막 분기보다 뒤인 사용자 (외삽값으로 비교하던 사용자)
+    - 같은 분기 자료가 정정된 경우: 전체
+    """
+    if not DATASET_REANALYZE or old is None or not first_claim:
+        return
+
+    old_latest = old.data["latest_quarter"]
+    quarter_added = new.data["latest_quarter"] > old_latest
+    cursor = analysis_collection.find(
+        {"dataset_version": {"$ne": new.version}},
+        {"_id": 0, "user_email": 1, "target_ym": 1}
+    )
+    users = [
+        doc["user_email"] async for doc in cursor
+        if not quarter_added or ym_to_quarter_code(doc.get("target_ym") or "0000-01") > old_latest
+    ]
+    logger.info("데이터셋 교체 - 재분석 예약", extra={"version": new.version, "users": len(users)})
+
+    semaphore = asyncio.Semaphore(DATASET_REANALYZE_CONCURRENCY)
+
+    async def reanalyze(user_email):
+        async with semaphore:
+            await run_analysis(user_email)
+
+    async def reanalyze_all():
+        await asyncio.gather(*(reanalyze(u) for u in users))
+
+    # 교체 처리(감시 루프)를 붙잡지 않도록 백그라운드에서 진행
+    task = asyncio.get_running_loop().create_task(reanalyze_all())
+    _reanalysis_tasks.add(task)
+    task.add_done_callback(_reanalysis_tasks.discard)
+
+
+registry.register("market", MARKET_PATTERN, build_market_index)
+registry.on_swap("market", reanalyze_after_swap)
+
+
+# =================================================================
+# 분석 지표 계산 (sales_logs는 ym 오름차순, 최근 6개월 이상이면 충분)
+# =================================================================
+def compute_analysis(user_email: str, sales_logs: list, sector_code: str, admin_code: str, market_index: dict, dataset_version: str = None):
+    if len(sales_logs) < 2:
+        logger.info("매출 데이터 2개월 미만 - 분석 생략", extra={"user_id": user_email})
+        return None
+
+    # MoM 계산
+    this_month_row = sales_logs[-1]
+    prev_month_row = sales_logs[-2]
+    my_latest_revenue = this_month_row["revenue"]
+    my_latest_ym = this_month_row["ym"]
+
+    # 그래프용 데이터 (최근 6개월)
+    recent_sales = sales_logs[-6:]
+    months = [log["ym"] for log in recent_sales]
+    my_sales_trend = [log["revenue"] for log in recent_sales]
+
+    # C. 그래프용 리스트 생성 (월별 계절성 기준값, 최신 분기 이후 달은 추세+계절 외삽)
+    monthly = market_index["monthly"]
+    industry_trend_all = []
+    industry_trend_dong = []
+    dong_bands = []
+
+    for ym in months:
+        bench_all = monthly_benchmark(monthly, sector_code, None, ym)
+        bench_dong = monthly_benchmark(monthly, sector_code, admin_code, ym)
+        industry_trend_all.append(bench_all["value"] if bench_all else 0)
+        industry_trend_dong.append(bench_dong["value"] if bench_dong else 0)
+        # 행정동 자료가 없으면 서울 전체 기준의 구간을 씀
+        dong_bands.append(bench_dong or bench_all or {"lower": 0, "upper": 0, "source": None})
+
+    # 5. 지표 계산
+    latest_benchmark = industry_trend_dong[-1]
+    if latest_benchmark == 0:
+         latest_benchmark = industry_trend_all[-1] if industry_trend_all[-1] > 0 else 1
+    latest_band = dong_bands[-1]
+
+    ratio = my_latest_revenue / latest_benchmark
+    grade, label = classify_percentile(ratio)
+
+    prev_revenue = prev_month_row["revenue"]
+    if prev_revenue == 0:
+        mom = 100.0 if my_latest_revenue > 0 else 0.0
+    else:
+        mom = ((my_latest_revenue - prev_revenue) / prev_revenue) * 100
+    direction = "UP" if mom > 1 else "DOWN" if mom < -1 else "FLAT"
+
+    return {
+        "user_email": user_email,
+        "created_at": datetime.utcnow(),
+        "target_ym": my_latest_ym,
+        "dataset_version": dataset_version,
+        "percentile": {
+            "grade": grade,
+            "label": label,
+            "ratio": round(ratio, 2),
+            "benchmark_revenue": int(latest_benchmark),
+            "benchmark_lower": latest_band["lower"],
+            "benchmark_upper": latest_band["upper"],
+            "benchmark_source": latest_band["source"]
+        },
+        "mom_growth": {
+            "value": round(mom, 2),
+            "direction": direction,
+            "diff_amount": int(my_latest_revenue - prev_revenue)
+        },
+        "monthly_trend": {
+            "months": months,
+            "my_store": my_sales_trend,
+            "industry_avg_all": industry_trend_all,
+            "industry_avg_dong": industry_trend_dong,
+            "industry_dong_lower": [band["lower"] for band in dong_bands],
+            "industry_dong_upper": [band["upper"] for band in dong_bands],
+            "benchmark_source": [band["source"] for band in dong_bands],
+            "basis": "monthly_seasonal"
+        },
+        "latest_comparison": {
+            "month": my_latest_ym,
+            "my_store": int(my_latest_revenue),
+            "industry_avg_all": int(industry_trend_all[-1]),
+            "industry_avg_dong": int(industry_trend_dong[-1])
+        }
+    }
+
+
+async def compute_footfall_gap(location: dict, sales_logs: list):
+    population = await get_population()
+    if population is None:
+        return None
+    return compute_footfall_gaps([footfall_input({"location": location, "sales_logs": sales_logs})], population.data)[0]
+
+
+@timer(STAGE_SECONDS, stage="analysis")
 async def run_analysis(user_email: str):
-    print(f"\n========== [DEBUG] 분석 시작: {user_email} ==========")
+    logger.info("분석 시작", extra={"user_id": user_email})
     
     try:
         # 1. storeInfo 조회
-        store = await store_collection.find_one({"user_id": user_email})
+        store = await store_collection.find_one(
+            {"user_id": user_email},
+            {"_id": 0, "sector_code_cs": 1, "location": 1}
+        )
         if not store:
-            print(f"!!! [ERROR] storeInfo 없음: {user_email}")
+            logger.error("storeInfo 없음", extra={"user_id": user_email})
             return
 
         sector_code = str(store["sector_code_cs"])
         admin_code = str(store["location"]["admin_code"])
 
-        # 2. 내 매출 데이터
-        sales_logs = store.get("sales_logs", [])
+        # 2. 내 매출 데이터 (지표 계산에는 최근 6개월이면 충분)
+        sales_logs = await load_sales_logs(user_email, last_n=ANALYSIS_WINDOW_MONTHS)
         if not sales_logs:
-             print("!!! [ERROR] 매출 데이터 없음")
+             logger.error("매출 데이터 없음", extra={"user_id": user_email})
              return
 
-        sales_df = pd.DataFrame(sales_logs)
-        sales_df = sales_df.sort_values("ym")
-
-        if len(sales_df) < 2:
-            print("!!! [STOP] 데이터 2개월 미만")
+        # 3. 상권 인덱스 (레지스트리 스냅샷)
+        market = await get_market_index()
+        if market is None:
             return
 
-        # MoM 계산
-        this_month_row = sales_df.iloc[-1]
-        prev_month_row = sales_df.iloc[-2]
-        my_latest_revenue = this_month_row["revenue"]
-        my_latest_ym = this_month_row["ym"]
-
-        # 그래프용 데이터 (최근 6개월)
-        recent_sales_df = sales_df.tail(6)
-        months = recent_sales_df["ym"].tolist()
-        my_sales_trend = recent_sales_df["revenue"].tolist()
-
-        # 3. CSV 로딩 및 최신 분기 확인
-        if not os.path.exists(MARKET_CSV):
-            print(f"!!! [ERROR] CSV 파일 없음: {MARKET_CSV}")
-            return
-            
-        market_df = pd.read_csv(MARKET_CSV, encoding="utf-8")
-        
-        # 타입 통일
-        market_df["행정동_코드"] = market_df["행정동_코드"].astype(str)
-        market_df["서비스_업종_코드"] = market_df["서비스_업종_코드"].astype(str)
-        market_df["기준_년분기_코드"] = market_df["기준_년분기_코드"].astype(str)
-
-        # CSV 최신 분기 확인
-        all_quarters = sorted(market_df["기준_년분기_코드"].unique())
-        if not all_quarters:
-            print("!!! [ERROR] CSV 파일에 분기 데이터가 없습니다.")
+        # 4. 지표 계산
+        final_result = compute_analysis(user_email, sales_logs, sector_code, admin_code, market.data, market.version)
+        if not final_result:
             return
-        latest_db_quarter = all_quarters[-1]
-        print(f"[DEBUG] CSV 최신 분기: {latest_db_quarter}")
-
-        # 미래 분기 보정 함수
-        def get_adjusted_quarter(ym):
-            q_code = ym_to_quarter_code(ym)
-            if q_code > latest_db_quarter:
-                return latest_db_quarter
-            return q_code
-
-        # 내 매출 월들을 '보정된' 분기 코드로 변환
-        adjusted_quarters = [get_adjusted_quarter(ym) for ym in months]
-
-        # 4. 비교 데이터 추출
-        industry_all_df = market_df[
-            (market_df["서비스_업종_코드"] == sector_code) &
-            (market_df["기준_년분기_코드"].isin(adjusted_quarters))
-        ]
-        quarter_avg_all_map = industry_all_df.groupby("기준_년분기_코드")["당월_평균_매출"].mean().to_dict()
-
-        industry_dong_df = market_df[
-            (market_df["서비스_업종_코드"] == sector_code) &
-            (market_df["행정동_코드"] == admin_code) &
-            (market_df["기준_년분기_코드"].isin(adjusted_quarters))
-        ]
-        quarter_avg_dong_map = industry_dong_df.groupby("기준_년분기_코드")["당월_평균_매출"].mean().to_dict()
-
-        # C. 그래프용 리스트 생성
-        industry_trend_all = []
-        industry_trend_dong = []
-
-        for ym in months:
-            q_key = get_adjusted_quarter(ym)
-            val_all = int(quarter_avg_all_map.get(q_key, 0))
-            val_dong = int(quarter_avg_dong_map.get(q_key, 0))
-            industry_trend_all.append(val_all)
-            industry_trend_dong.append(val_dong)
-
-        # 5. 지표 계산
-        latest_benchmark = industry_trend_dong[-1]
-        if latest_benchmark == 0:
-             latest_benchmark = industry_trend_all[-1] if industry_trend_all[-1] > 0 else 1
-
-        ratio = my_latest_revenue / latest_benchmark
-        grade, label = classify_percentile(ratio)
-
-        prev_revenue = prev_month_row["revenue"]
-        if prev_revenue == 0:
-            mom = 100.0 if my_latest_revenue > 0 else 0.0
-        else:
-            mom = ((my_latest_revenue - prev_revenue) / prev_revenue) * 100
-        direction = "UP" if mom > 1 else "DOWN" if mom < -1 else "FLAT"
 
-        # 6. 저장 (Upsert 적용)
-        final_result = {
-            "user_email": user_email,
-            "created_at": datetime.utcnow(),
-            "target_ym": my_latest_ym,
-            "percentile": {
-                "grade": grade,
-                "label": label,
-                "ratio": round(ratio, 2),
-                "benchmark_revenue": int(latest_benchmark)
-            },
-            "mom_growth": {
-                "value": round(mom, 2),
-                "direction": direction,
-                "diff_amount": int(my_latest_revenue - prev_revenue)
-            },
-            "monthly_trend": {
-                "months": months,
-                "my_store": my_sales_trend,
-                "industry_avg_all": industry_trend_all,
-                "industry_avg_dong": industry_trend_dong,
-                "basis": "quarterly_month_average"
-            },
-            "latest_comparison": {
-                "month": my_latest_ym,
-                "my_store": int(my_latest_revenue),
-                "industry_avg_all": int(industry_trend_all[-1]),
-                "industry_avg_dong": int(industry_trend_dong[-1])
-            }
-        }
+        # 5. 고객 구성 vs 유동인구 격차 (유동인구 데이터가 없으면 None)
+        final_result["footfall_gap"] = await compute_footfall_gap(store["location"], sales_logs)
 
+        # 6. 저장 (Upsert 적용)
         # ▼▼▼ [수정된 부분] insert_one 대신 update_one(upsert=True) 사용 ▼▼▼
         await analysis_collection.update_one(
             {"user_email": user_email}, # 검색 조건: 이메일이 같은 문서 찾기
             {"$set": final_result},     # 수정 내용: final_result 내용으로 덮어쓰기
             upsert=True                 # 옵션: 없으면 새로 생성(Insert), 있으면 수정(Update)
         )
-        print(f"========== [SUCCESS] 분석 완료 (보정 적용됨): {latest_db_quarter} 사용 ==========\n")
+        # 이전 결과는 덮어쓰므로 요약 스냅샷을 이력에 남김
+        await record_analysis_snapshot(final_result)
+        await record_cell_stats(final_result, sector_code, admin_code, store["location"].get("admin_dong_name"))
+        logger.info("분석 완료", extra={"user_id": user_email, "dataset_version": market.version})
+
+    except Exception:
+        logger.exception("분석 중 오류 발생", extra={"user_id": user_email})
+
+
+# =================================================================
+# 증분 분석: 매출 몇 개월만 추가/수정된 경우 최근 6개월만 읽어서 지표 갱신
+# =================================================================
+ANALYSIS_WINDOW_MONTHS = 6
 
-    except Exception as e:
-        print(f"\n!!! [CRITICAL ERROR] 분석 중 오류 발생 !!!: {e}")
-        traceback.print_exc()
+
+@timer(STAGE_SECONDS, stage="analysis_incremental")
+async def update_analysis_incremental(user_email: str, changed_yms: list):
+    try:
+        store = await store_collection.find_one(
+            {"user_id": user_email},
+            {"_id": 0, "sector_code_cs": 1, "location.admin_code": 1, "location.admin_dong_name": 1}
+        )
+        if not store:
+            return False
+
+        # 최근 6개월만 (storeSales 버킷에서 최근 연도부터 읽음)
+        sales_logs = await load_sales_logs(user_email, last_n=ANALYSIS_WINDOW_MONTHS)
+        # 바뀐 달이 전부 그래프 구간(최근 6개월)보다 과거면 지표가 그대로이므로 생략
+        # (아직 분석 결과가 없는 매장이면 그대로일 지표가 없으므로 새로 계산)
+        if sales_logs and all(ym < sales_logs[0]["ym"] for ym in changed_yms):
+            if await analysis_collection.find_one({"user_email": user_email}, {"_id": 1}):
+                return False
+
+        market = await get_market_index()
+        if market is None:
+            return False
+
+        final_result = compute_analysis(
+            user_email,
+            sales_logs,
+            str(store.get("sector_code_cs")),
+            str(store.get("location", {}).get("admin_code")),
+            market.data,
+            market.version
+        )
+        if not final_result:
+            return False
+        final_result["footfall_gap"] = await compute_footfall_gap(store.get("location") or {}, sales_logs)
+
+        await analysis_collection.update_one(
+            {"user_email": user_email},
+            {"$set": final_result},
+            upsert=True
+        )
+        await record_analysis_snapshot(final_result)
+        location = store.get("location") or {}
+        await record_cell_stats(final_result, str(store.get("sector_code_cs")), str(location.get("admin_code")),
+                                location.get("admin_dong_name"))
+        return True
+    except Exception:
+        logger.exception("증분 분석 중 오류 발생", extra={"user_id": user_email})
+        return False
 
 # API 엔드포인트
 @router.post("/run")
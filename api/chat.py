@@ -1,104 +1,260 @@
-import google.generativeai as genai
 from fastapi import APIRouter, Depends, HTTPException
 from core.security import get_current_user
 from pydantic import BaseModel
-from typing import Dict
+from typing import Dict, List, Tuple
+import asyncio
+import time
 from core.config import store_collection, surrounding_collection,solution_collection, analysis_collection
-from core.config import GEMINI_API_KEY
-# Gemini 설정
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel(
-    model_name='gemini-2.5-flash',
-    system_instruction=(
-        "당신은 소상공인 경영 효율화와 매출 증대를 전문으로 하는 '베테랑 비즈니스 전략 컨설턴트'입니다. "
-        "사장님의 데이터를 논리적으로 분석하여 '실행 가능한(Actionable)' 조언을 제공하는 것이 당신의 사명입니다.\n\n"
-        
-        "### 1. 사고 체계 (Logic Framework)\n"
-        "질문을 받으면 항상 다음 3단계 연산을 거쳐 답변하십시오.\n"
-        "- [현상 분석]: 사장님의 매출 추이와 상권의 객관적 상황을 대조하여 현재의 병목 구간(Bottleneck)을 파악합니다.\n"
-        "- [전략 수립]: 최소 비용으로 최대 효율을 낼 수 있는 우선순위 솔루션을 도출합니다.\n"
-        "- [상세 가이드]: 사장님이 바로 행동에 옮길 수 있도록 '무엇을, 언제, 어떻게' 해야 하는지 육하원칙에 따라 설명합니다.\n\n"
-        
-        "### 2. 답변 원칙 (Communication Principles)\n"
-        "- **데이터 기반 조언**: 사장님의 업종(예: 한식 육류요리 전문점)과 지역적 특성을 고려하여 답변하세요.\n"
-        "- **가독성 최적화**: 긴 문장보다는 불렛 포인트와 강조 기호(**)를 사용하여 한눈에 들어오게 작성하세요.\n"
-        "- **쉬운 용어**: 'MoM', '리텐션' 같은 용어 대신 '지난달 대비 매출', '다시 찾아오는 손님 비율'처럼 사장님의 언어로 순화하세요.\n"
-        "- **논리적 근거**: 특정 행동을 권유할 때는 '주변 상권에 동종 업종이 증가하고 있기 때문에'와 같은 근거를 반드시 명시하세요.\n\n"
-        
-        "### 3. 마무리 (Closing)\n"
-        "항상 사장님의 노고에 공감하며, 실질적인 매출 증대를 응원하는 따뜻하고 신뢰감 있는 멘트로 대화를 마무리하십시오."
-    )
+from core.config import GEMINI_API_KEY, CHAT_HISTORY_TURNS, CHAT_TOKEN_BUDGET, CHAT_MODEL_TTL
+from core.metrics import timer, record_cache, record_llm_tokens, EXTERNAL_CALL_SECONDS
+CHAT_MODEL_NAME = 'gemini-2.5-flash'
+
+# 모든 사용자에게 공통으로 들어가는 시스템 프롬프트
+BASE_SYSTEM_INSTRUCTION = (
+    "당신은 소상공인 경영 효율화와 매출 증대를 전문으로 하는 '베테랑 비즈니스 전략 컨설턴트'입니다. "
+    "사장님의 데이터를 논리적으로 분석하여 '실행 가능한(Actionable)' 조언을 제공하는 것이 당신의 사명입니다.\n\n"
+
+    "### 1. 사고 체계 (Logic Framework)\n"
+    "질문을 받으면 항상 다음 3단계 연산을 거쳐 답변하십시오.\n"
+    "- [현상 분석]: 사장님의 매출 추이와 상권의 객관적 상황을 대조하여 현재의 병목 구간(Bottleneck)을 파악합니다.\n"
+    "- [전략 수립]: 최소 비용으로 최대 효율을 낼 수 있는 우선순위 솔루션을 도출합니다.\n"
+    "- [상세 가이드]: 사장님이 바로 행동에 옮길 수 있도록 '무엇을, 언제, 어떻게' 해야 하는지 육하원칙에 따라 설명합니다.\n\n"
+
+    "### 2. 답변 원칙 (Communication Principles)\n"
+    "- **데이터 기반 조언**: 사장님의 업종(예: 한식 육류요리 전문점)과 지역적 특성을 고려하여 답변하세요.\n"
+    "- **가독성 최적화**: 긴 문장보다는 불렛 포인트와 강조 기호(**)를 사용하여 한눈에 들어오게 작성하세요.\n"
+    "- **쉬운 용어**: 'MoM', '리텐션' 같은 용어 대신 '지난달 대비 매출', '다시 찾아오는 손님 비율'처럼 사장님의 언어로 순화하세요.\n"
+    "- **논리적 근거**: 특정 행동을 권유할 때는 '주변 상권에 동종 업종이 증가하고 있기 때문에'와 같은 근거를 반드시 명시하세요.\n\n"
+
+    "### 3. 마무리 (Closing)\n"
+    "항상 사장님의 노고에 공감하며, 실질적인 매출 증대를 응원하는 따뜻하고 신뢰감 있는 멘트로 대화를 마무리하십시오."
 )
 
 router = APIRouter(prefix="/api/chat", tags=["Chat"])
 
-# 사용자별 대화 세션을 관리할 메모리 저장소
+_genai = None
+
+
+def get_genai():
+    """
+    google.generativeai는 import 비용이 커서 첫 대화 요청 시점에 불러오고 설정합니다.
+    """
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        # Gemini 설정
+        genai.configure(api_key=GEMINI_API_KEY)
+        _genai = genai
+    return _genai
+
+# 토큰 수 추정용 (한글 기준 대략 2글자 = 1토큰)
+CHARS_PER_TOKEN = 2
+# 요약문이 차지할 수 있는 최대 예산 비율
+SUMMARY_BUDGET_RATIO = 0.25
+
+SUMMARY_INSTRUCTION = (
+    "다음은 소상공인 사장님과 경영 컨설턴트의 이전 대화입니다. "
+    "이후 상담에 필요한 핵심 사실(매장 상황, 사장님의 고민, 이미 제안한 조언)만 남겨 "
+    "한국어로 간결하게 요약하세요. 불필요한 인사말은 제외합니다."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+# =================================================================
+# 대화 컨텍스트 관리 (최근 K턴 원문 + 이전 대화 누적 요약)
+# =================================================================
+class ChatContext:
+    def __init__(self, max_turns: int = CHAT_HISTORY_TURNS, token_budget: int = CHAT_TOKEN_BUDGET):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.turns: List[Tuple[str, str]] = []   # (사용자 메시지, AI 답변)
+        self.summary = ""                       # 오래된 턴을 접어 넣은 누적 요약 (캐시)
+        self.summarized_turns = 0
+
+    def history_tokens(self) -> int:
+        tokens = estimate_tokens(self.summary)
+        for user_text, model_text in self.turns:
+            tokens += estimate_tokens(user_text) + estimate_tokens(model_text)
+        return tokens
+
+    def prompt_tokens(self, system_instruction: str, message: str) -> int:
+        return estimate_tokens(system_instruction) + self.history_tokens() + estimate_tokens(message)
+
+    def select_turns_to_fold(self, system_instruction: str, message: str) -> List[Tuple[str, str]]:
+        """
+        K턴을 초과했거나 토큰 예산을 넘는 경우, 요약으로 넘길 오래된 턴을 앞에서부터 꺼냅니다.
+        가장 최근 1턴은 항상 원문으로 유지합니다.
+        """
+        folded = []
+        while len(self.turns) > self.max_turns:
+            folded.append(self.turns.pop(0))
+        while len(self.turns) > 1 and self.prompt_tokens(system_instruction, message) > self.token_budget:
+            folded.append(self.turns.pop(0))
+        return folded
+
+    def build_history(self) -> list:
+        history = []
+        if self.summary:
+            history.append({"role": "user", "parts": [f"[이전 대화 요약]\n{self.summary}"]})
+            history.append({"role": "model", "parts": ["네, 이전 대화 내용을 참고하여 답변하겠습니다."]})
+        for user_text, model_text in self.turns:
+            history.append({"role": "user", "parts": [user_text]})
+            history.append({"role": "model", "parts": [model_text]})
+        return history
+
+    def add_turn(self, user_text: str, model_text: str):
+        self.turns.append((user_text, model_text))
+
+
+def summarize_turns(previous_summary: str, turns: List[Tuple[str, str]], max_chars: int) -> str:
+    """
+    이전 요약 + 새로 밀려난 턴들을 하나의 요약으로 합칩니다. (동기 함수 - to_thread로 실행)
+    """
+    dialogue = ""
+    if previous_summary:
+        dialogue += f"[기존 요약]\n{previous_summary}\n\n"
+    for user_text, model_text in turns:
+        dialogue += f"사장님: {user_text}\n컨설턴트: {model_text}\n"
+
+    summary_model = get_genai().GenerativeModel(
+        model_name=CHAT_MODEL_NAME,
+        system_instruction=SUMMARY_INSTRUCTION + f" 요약은 {max_chars}자 이내로 작성하세요."
+    )
+    with timer(EXTERNAL_CALL_SECONDS, service="gemini_summary"):
+        response = summary_model.generate_content(dialogue)
+    usage = getattr(response, "usage_metadata", None)
+    record_llm_tokens(
+        CHAT_MODEL_NAME, "chat_summary",
+        getattr(usage, "prompt_token_count", None), getattr(usage, "candidates_token_count", None)
+    )
+    # 모델이 길이 제한을 어겨도 예산은 지켜지도록 잘라냄
+    return response.text.strip()[:max_chars]
+
+
+# 사용자별 대화 컨텍스트를 관리할 메모리 저장소
 # 로그아웃 후 세션이 끊기면 서버 메모리 상에서만 존재하다 사라짐
-chat_sessions: Dict[str, genai.ChatSession] = {}
+chat_sessions: Dict[str, ChatContext] = {}
 
-class ChatRequest(BaseModel):
-    message: str
+# 사용자별 시스템 프롬프트 + 모델 객체 캐시
+# 솔루션 세대(generation)가 바뀔 때(save_solutions_to_db)만 무효화됨
+# 다른 워커에서 솔루션이 갱신된 경우를 대비해 CHAT_MODEL_TTL이 지나면 다시 만듦
+chat_models: Dict[str, dict] = {}
+# 사용자별 무효화 횟수: 다시 만드는 동안 무효화가 끼어들면 만든 결과(이전 세대일 수 있음)를 캐시에 넣지 않음
+chat_model_epochs: Dict[str, int] = {}
 
-@router.post("/conversation")
-async def talk_to_ai(
-    request: ChatRequest, 
-    current_user: str = Depends(get_current_user)
-):
-    cursor = solution_collection.find({"user_id": current_user}).sort("created_at", -1)
-    solutions = await cursor.to_list(length=5)
-    
+
+def build_system_instruction(solutions: list) -> str:
     # AI에게 주입할 핵심 정보 요약
     solution_context = ""
     for s in solutions:
         solution_context += f"- 전략: {s['title']}\n  상세내용: {s['solution']}\n"
 
+    return (
+        BASE_SYSTEM_INSTRUCTION + "\n\n"
 
-    model = genai.GenerativeModel(
-        model_name='gemini-2.5-flash',
-        system_instruction=(
-            "당신은 소상공인 경영 효율화와 매출 증대를 전문으로 하는 '베테랑 비즈니스 전략 컨설턴트'입니다. "
-            "사장님의 데이터를 논리적으로 분석하여 '실행 가능한(Actionable)' 조언을 제공하는 것이 당신의 사명입니다.\n\n"
-            
-            "### 1. 사고 체계 (Logic Framework)\n"
-            "질문을 받으면 항상 다음 3단계 연산을 거쳐 답변하십시오.\n"
-            "- [현상 분석]: 사장님의 매출 추이와 상권의 객관적 상황을 대조하여 현재의 병목 구간(Bottleneck)을 파악합니다.\n"
-            "- [전략 수립]: 최소 비용으로 최대 효율을 낼 수 있는 우선순위 솔루션을 도출합니다.\n"
-            "- [상세 가이드]: 사장님이 바로 행동에 옮길 수 있도록 '무엇을, 언제, 어떻게' 해야 하는지 육하원칙에 따라 설명합니다.\n\n"
-            
-            "### 2. 답변 원칙 (Communication Principles)\n"
-            "- **데이터 기반 조언**: 사장님의 업종(예: 한식 육류요리 전문점)과 지역적 특성을 고려하여 답변하세요.\n"
-            "- **가독성 최적화**: 긴 문장보다는 불렛 포인트와 강조 기호(**)를 사용하여 한눈에 들어오게 작성하세요.\n"
-            "- **쉬운 용어**: 'MoM', '리텐션' 같은 용어 대신 '지난달 대비 매출', '다시 찾아오는 손님 비율'처럼 사장님의 언어로 순화하세요.\n"
-            "- **논리적 근거**: 특정 행동을 권유할 때는 '주변 상권에 동종 업종이 증가하고 있기 때문에'와 같은 근거를 반드시 명시하세요.\n\n"
-            
-            "### 3. 마무리 (Closing)\n"
-            "항상 사장님의 노고에 공감하며, 실질적인 매출 증대를 응원하는 따뜻하고 신뢰감 있는 멘트로 대화를 마무리하십시오."
-
-            "### 4. 제공 데이터 ###\n"
-            f"현재 사장님께 제안된 핵심 전략은 다음과 같습니다:\n{solution_context}\n\n"
-
-            "### 필수 규칙\n"
-            "모든 말은 3문장 안에 끝나야한다."
-        )
+        "### 4. 제공 데이터 ###\n"
+        f"현재 사장님께 제안된 핵심 전략은 다음과 같습니다:\n{solution_context}\n\n"
+
+        "### 필수 규칙\n"
+        "모든 말은 3문장 안에 끝나야한다."
     )
 
+
+async def get_chat_model(user_id: str) -> dict:
+    cached = chat_models.get(user_id)
+    if cached and time.monotonic() - cached["built_at"] < CHAT_MODEL_TTL:
+        record_cache("chat_model", True)
+        return cached
+    record_cache("chat_model", False)
+
+    epoch = chat_model_epochs.get(user_id, 0)
+    cursor = solution_collection.find({"user_id": user_id}).sort("created_at", -1)
+    solutions = await cursor.to_list(length=5)
+
+    system_instruction = build_system_instruction(solutions)
+    cached = {
+        "generation": max((s.get("generation", 0) for s in solutions), default=0),
+        "system_instruction": system_instruction,
+        "model": get_genai().GenerativeModel(
+            model_name=CHAT_MODEL_NAME,
+            system_instruction=system_instruction
+        ),
+        "built_at": time.monotonic()
+    }
+    if chat_model_epochs.get(user_id, 0) == epoch:
+        chat_models[user_id] = cached
+    return cached
+
+
+def invalidate_chat_model(user_id: str, generation: int = None):
+    """
+    새 솔루션이 저장되면 호출됩니다. 대화 기록(chat_sessions)은 유지하고 모델만 다시 만듭니다.
+    """
+    chat_model_epochs[user_id] = chat_model_epochs.get(user_id, 0) + 1
+    cached = chat_models.get(user_id)
+    if cached is None:
+        return
+    if generation is None or cached["generation"] != generation:
+        del chat_models[user_id]
+
+
+class ChatRequest(BaseModel):
+    message: str
+
+@router.post("/conversation")
+async def talk_to_ai(
+    request: ChatRequest, 
+    current_user: str = Depends(get_current_user)
+):
     if not request.message:
         raise HTTPException(status_code=400, detail="메시지를 입력해주세요.")
 
-    # 1. 해당 사용자의 채팅 세션이 없으면 새로 생성
+    cached = await get_chat_model(current_user)
+    model = cached["model"]
+    system_instruction = cached["system_instruction"]
+
+    # 1. 해당 사용자의 대화 컨텍스트가 없으면 새로 생성
     if current_user not in chat_sessions:
-        # 시스템 프롬프트 설정 (선택 사항: 챗봇의 성격 부여)
-        chat_sessions[current_user] = model.start_chat(history=[])
+        chat_sessions[current_user] = ChatContext()
 
-    session = chat_sessions[current_user]
+    context = chat_sessions[current_user]
 
     try:
-        # 2. Gemini에게 메시지 전송 및 답변 수신 (컨텍스트 유지됨)
-        response = session.send_message(request.message)
-        
+        # 2. 오래된 턴은 누적 요약으로 접어서 프롬프트 크기를 예산 안으로 유지
+        folded = context.select_turns_to_fold(system_instruction, request.message)
+        if folded:
+            summary_chars = int(context.token_budget * SUMMARY_BUDGET_RATIO) * CHARS_PER_TOKEN
+            context.summary = await asyncio.to_thread(
+                summarize_turns, context.summary, folded, summary_chars
+            )
+            context.summarized_turns += len(folded)
+
+        # 3. 요약 + 최근 K턴만으로 세션을 구성해 Gemini에게 메시지 전송
+        estimated_tokens = context.prompt_tokens(system_instruction, request.message)
+        session = model.start_chat(history=context.build_history())
+        with timer(EXTERNAL_CALL_SECONDS, service="gemini_chat"):
+            response = await asyncio.to_thread(session.send_message, request.message)
+        context.add_turn(request.message, response.text)
+
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        record_llm_tokens(CHAT_MODEL_NAME, "chat", prompt_tokens, getattr(usage, "candidates_token_count", None))
+
         return {
             "answer": response.text,
-            "user": current_user
+            "user": current_user,
+            "meta": {
+                "prompt_tokens": prompt_tokens,
+                "estimated_prompt_tokens": estimated_tokens,
+                "token_budget": context.token_budget,
+                "history_turns": len(context.turns),
+                "summarized_turns": context.summarized_turns
+            }
         }
     except Exception as e:
         # 오류 발생 시 세션 초기화 및 에러 반환
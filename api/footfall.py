@@ -0,0 +1,251 @@
+import asyncio
+from core.config import store_collection, analysis_collection
+from core.dataset_registry import registry
+from core.logger import get_logger
+from core.metrics import timer, STAGE_SECONDS
+from api.sales_store import load_sales_logs_many
+from api.peers import WEEKLY_KEYS, TIME_SLOT_KEYS, GENDER_KEYS, AGE_KEYS
+
+logger = get_logger(__name__)
+
+# =================================================================
+# 고객 구성 vs 유동인구 격차 분석
+# - 유동인구 CSV의 시간대/요일/연령/성별 인구를 (행정동, 분기)별 비중 분포로 미리 정규화
+#   (population 데이터셋을 만들 때 같이 계산 → 스냅샷과 함께 교체)
+# - 매장이 입력한 SalesLogDetails 매출 비중과 비교해 항목별 격차와 차원별 점수(총변동거리, 0~1)를 계산
+# - 매장 여러 개를 (매장 x 항목) 행렬로 묶어 한 번에 계산 (배치 모드)
+# =================================================================
+FOOTFALL_WINDOW_MONTHS = 6
+# 이 값보다 더 적게 잡히는 항목을 "덜 잡히는 고객층"으로 표시 (비중 차이)
+UNDER_CAPTURE_GAP = -0.05
+UNDER_CAPTURE_TOP = 3
+FOOTFALL_BATCH_SIZE = 500
+
+# 차원 이름 -> (SalesLogDetails 필드, 매장 항목 키, 유동인구 CSV 컬럼)
+FOOTFALL_DIMENSIONS = {
+    "time_slot": ("time_slot", TIME_SLOT_KEYS, [
+        "시간대_00_06_유동인구_수", "시간대_06_11_유동인구_수", "시간대_11_14_유동인구_수",
+        "시간대_14_17_유동인구_수", "시간대_17_21_유동인구_수", "시간대_21_24_유동인구_수",
+    ]),
+    "weekday": ("weekly", WEEKLY_KEYS, [
+        "월요일_유동인구_수", "화요일_유동인구_수", "수요일_유동인구_수", "목요일_유동인구_수",
+        "금요일_유동인구_수", "토요일_유동인구_수", "일요일_유동인구_수",
+    ]),
+    "age": ("age_groups", AGE_KEYS, [
+        "연령대_10_유동인구_수", "연령대_20_유동인구_수", "연령대_30_유동인구_수",
+        "연령대_40_유동인구_수", "연령대_50_유동인구_수", "연령대_60_이상_유동인구_수",
+    ]),
+    "gender": ("gender", GENDER_KEYS, ["남성_유동인구_수", "여성_유동인구_수"]),
+}
+
+
+def _normalize_rows(values):
+    import numpy as np
+
+    totals = values.sum(axis=1, keepdims=True)
+    return np.divide(values, totals, out=np.zeros_like(values), where=totals > 0)
+
+
+def build_footfall_distributions(frame):
+    """
+    (행정동, 분기) 순으로 정렬된 population 프레임 → 차원별 (행 x 항목) 비중 행렬.
+    행 번호는 프레임과 같으므로 population의 offsets로 행정동 구간을 찾음. (동기 함수)
+    """
+    import numpy as np
+
+    shares = {}
+    for dimension, (_, _, columns) in FOOTFALL_DIMENSIONS.items():
+        if not all(col in frame.columns for col in columns):
+            continue
+        shares[dimension] = _normalize_rows(frame[columns].to_numpy(dtype=np.float32))
+    return {
+        "quarters": frame["기준_년분기_코드"].astype(str).to_numpy(),
+        "shares": shares,
+    }
+
+
+def footfall_row(population: dict, admin_code: str, quarter: str):
+    """행정동의 분기 이하 가장 최근 행 (없으면 그 행정동의 가장 오래된 행, 행정동이 없으면 None)"""
+    import numpy as np
+
+    span = population["offsets"].get(str(admin_code))
+    if span is None:
+        return None
+    quarters = population["footfall"]["quarters"][span[0]:span[1]]
+    pos = int(np.searchsorted(quarters, str(quarter), side="right")) - 1
+    return span[0] + max(pos, 0)
+
+
+def store_shares(sales_logs: list):
+    """최근 매출 로그의 SalesLogDetails 합계 → 차원별 항목 비중 (입력이 없는 차원은 None)"""
+    result = {}
+    details = [log.get("details") for log in sales_logs[-FOOTFALL_WINDOW_MONTHS:] if log.get("details")]
+    for dimension, (field, keys, _) in FOOTFALL_DIMENSIONS.items():
+        totals = [0.0] * len(keys)
+        for detail in details:
+            values = detail.get(field) or {}
+            for i, key in enumerate(keys):
+                totals[i] += max(float(values.get(key) or 0), 0.0)
+        total = sum(totals)
+        result[dimension] = [v / total for v in totals] if total > 0 else None
+    return result
+
+
+def compute_footfall_gaps(stores: list, population: dict) -> list:
+    """
+    stores: footfall_input 결과 리스트 → 매장별 footfall_gap 문서 (비교할 수 없으면 None).
+    차원마다 (매장 x 항목) 행렬로 격차/점수를 한 번에 계산. (동기 함수 - 배치 모드에서는 스레드에서 실행)
+    """
+    import numpy as np
+
+    count = len(stores)
+    results = [None] * count
+    if not population or "footfall" not in population or count == 0:
+        return results
+
+    rows = np.full(count, -1, dtype=np.int64)
+    for s, store in enumerate(stores):
+        row = footfall_row(population, store.get("admin_code"), store.get("quarter") or "")
+        if row is not None:
+            rows[s] = row
+    matched = rows >= 0
+
+    quarters = population["footfall"]["quarters"]
+    per_store = [{} for _ in range(count)]
+    for dimension, (_, keys, _) in FOOTFALL_DIMENSIONS.items():
+        foot_all = population["footfall"]["shares"].get(dimension)
+        if foot_all is None:
+            continue
+        mine = np.zeros((count, len(keys)))
+        has = np.zeros(count, dtype=bool)
+        for s, store in enumerate(stores):
+            shares = store["shares"].get(dimension)
+            if shares is not None:
+                mine[s] = shares
+                has[s] = True
+        has &= matched
+        if not has.any():
+            continue
+
+        foot = np.zeros_like(mine)
+        foot[has] = foot_all[rows[has]]
+        gap = mine - foot
+        score = 0.5 * np.abs(gap).sum(axis=1)
+        capture = np.divide(mine, foot, out=np.zeros_like(mine), where=foot > 0)
+
+        # 문서 생성은 파이썬 루프라 반올림/리스트 변환을 먼저 행렬 단위로 해 둠
+        score_l = np.round(score, 4).tolist()
+        mine_l = np.round(mine, 4).tolist()
+        foot_l = np.round(foot, 4).tolist()
+        gap_l = np.round(gap, 4).tolist()
+        capture_l = np.round(capture, 3).tolist()
+        for s in np.flatnonzero(has).tolist():
+            per_store[s][dimension] = {
+                "score": score_l[s],
+                "buckets": [
+                    {
+                        "key": key,
+                        "store_share": mine_l[s][i],
+                        "footfall_share": foot_l[s][i],
+                        "gap": gap_l[s][i],
+                        "capture_index": capture_l[s][i],
+                    }
+                    for i, key in enumerate(keys)
+                ],
+            }
+
+    for s, dimensions in enumerate(per_store):
+        if not dimensions:
+            continue
+        under = sorted(
+            (
+                {"dimension": dimension, "key": bucket["key"], "gap": bucket["gap"]}
+                for dimension, info in dimensions.items()
+                for bucket in info["buckets"]
+                if bucket["gap"] <= UNDER_CAPTURE_GAP
+            ),
+            key=lambda item: item["gap"]
+        )
+        results[s] = {
+            "admin_code": str(stores[s].get("admin_code")),
+            "quarter": str(quarters[rows[s]]),
+            "score": round(sum(info["score"] for info in dimensions.values()) / len(dimensions), 4),
+            "dimensions": dimensions,
+            "under_captured": under[:UNDER_CAPTURE_TOP],
+        }
+    return results
+
+
+async def get_population():
+    """population 데이터셋 스냅샷 (솔루션 모듈이 등록하지 않은 실행 환경이면 None)"""
+    if "population" not in registry.sources:
+        return None
+    return await registry.get("population")
+
+
+# =================================================================
+# 배치: 전체 매장의 격차 분석을 analysisInfo에 반영 (python -m api.footfall)
+# =================================================================
+FOOTFALL_PROJECTION = {
+    "_id": 0,
+    "user_id": 1,
+    "location.admin_code": 1,
+}
+
+
+def footfall_input(store: dict) -> dict:
+    from api.analysis import ym_to_quarter_code
+
+    logs = store.get("sales_logs") or []
+    return {
+        "admin_code": (store.get("location") or {}).get("admin_code"),
+        "quarter": ym_to_quarter_code(logs[-1]["ym"]) if logs else "",
+        "shares": store_shares(logs),
+    }
+
+
+@timer(STAGE_SECONDS, stage="footfall_batch")
+async def run_footfall_batch(batch_size: int = FOOTFALL_BATCH_SIZE) -> int:
+    from pymongo import UpdateOne
+
+    population = await get_population()
+    if population is None:
+        return 0
+
+    async def flush(chunk):
+        logs = await load_sales_logs_many([store.get("user_id") for store in chunk], last_n=FOOTFALL_WINDOW_MONTHS)
+        for store in chunk:
+            store["sales_logs"] = logs.get(store.get("user_id")) or []
+        inputs = [footfall_input(store) for store in chunk]
+        gaps = await asyncio.to_thread(compute_footfall_gaps, inputs, population.data)
+        # 분석 결과가 있는 매장만 갱신 (격차 정보만 있는 analysisInfo 문서를 만들지 않음)
+        ops = [
+            UpdateOne({"user_email": store["user_id"]}, {"$set": {"footfall_gap": gap}})
+            for store, gap in zip(chunk, gaps)
+        ]
+        if ops:
+            await analysis_collection.bulk_write(ops, ordered=False)
+        return sum(gap is not None for gap in gaps)
+
+    total = 0
+    chunk = []
+    async for store in store_collection.find({}, FOOTFALL_PROJECTION):
+        chunk.append(store)
+        if len(chunk) >= batch_size:
+            total += await flush(chunk)
+            chunk = []
+    if chunk:
+        total += await flush(chunk)
+
+    logger.info("유동인구 격차 배치 완료", extra={"stores": total, "dataset_version": population.version})
+    return total
+
+
+if __name__ == "__main__":
+    from core.config import init_db
+    from core.logger import setup_logging
+    import api.solution  # noqa: F401 - population 데이터셋 등록
+
+    setup_logging()
+    init_db()
+    asyncio.run(run_footfall_batch())
@@ -0,0 +1,316 @@
+import asyncio
+import math
+import os
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException
+from core.security import get_current_user
+from core.config import store_collection, forecast_collection
+from core.logger import get_logger
+from core.metrics import timer, record_cache, STAGE_SECONDS
+from api.analysis import get_market_index, ym_to_quarter_code
+from api.sales_store import load_sales_arrays, load_sales_arrays_many
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/api/analysis", tags=["analysis"])
+
+# =================================================================
+# 매출 예측 (다음 N개월)
+# - 로그 매출에 추세 + 연간 계절성(푸리에 항) 최소제곱 적합
+# - 계절성을 뺀 값에 감쇠 추세 Holt 지수평활
+# - 두 예측의 평균에 행정동 업종 매출 추세(상권 CSV)를 일부 반영
+# - 매장 여러 개를 (매장 x 월) 행렬로 묶어 한 번에 계산 (배치 모드)
+# =================================================================
+FORECAST_HORIZON = int(os.getenv("FORECAST_HORIZON", "3"))
+FORECAST_HISTORY_MONTHS = 36
+FORECAST_BATCH_SIZE = int(os.getenv("FORECAST_BATCH_SIZE", "500"))
+MIN_HISTORY_MONTHS = 3
+# 계절성 항은 2년치 이상 있을 때만 사용
+SEASONAL_MIN_MONTHS = 24
+
+HOLT_ALPHA = 0.5
+HOLT_BETA = 0.2
+HOLT_PHI = 0.9
+RIDGE = 1e-3
+# 상권 추세 반영 비율 / 추세 계산에 쓰는 최근 분기 수
+MARKET_TREND_WEIGHT = 0.5
+MARKET_TREND_QUARTERS = 8
+# 분기 자료 잡음으로 추세가 튀는 것 방지 (월 ±3%)
+MARKET_TREND_CLIP = 0.03
+# 80% 예측 구간
+BAND_Z = 1.2816
+
+# 데이터셋 버전별 분기 목록 캐시
+_quarters_cache = {}
+
+
+def index_to_ym(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _market_quarters(market_data: dict, dataset_version: str) -> list:
+    quarters = _quarters_cache.get(dataset_version)
+    if quarters is None:
+        quarters = sorted({quarter for _, quarter in market_data["avg_all"]})
+        _quarters_cache.clear()
+        _quarters_cache[dataset_version] = quarters
+    return quarters
+
+
+def build_series(stores: list, history: int = FORECAST_HISTORY_MONTHS):
+    """
+    매장별 매출 배열(store["sales"], sales_arrays 결과) → (매장 x 월) 로그 매출 행렬.
+    각 매장의 마지막 달이 마지막 열에 오도록 정렬, 빈 달은 mask=False.
+    """
+    import numpy as np
+
+    count = len(stores)
+    values = np.zeros((count, history))
+    mask = np.zeros((count, history), dtype=bool)
+    last = np.zeros(count, dtype=np.int64)
+
+    for s, store in enumerate(stores):
+        sales = store.get("sales")
+        if sales is None or len(sales["ym_index"]) == 0:
+            continue
+        index = sales["ym_index"].astype(np.int64)
+        last[s] = index.max()
+        pos = history - 1 - (last[s] - index)
+        keep = pos >= 0
+        values[s, pos[keep]] = np.log1p(np.maximum(sales["revenue"][keep], 0).astype(np.float64))
+        mask[s, pos[keep]] = True
+    return values, mask, last
+
+
+def _design(month_of_year, t, seasonal):
+    """[절편, 추세, sin/cos 1·2차 계절 항] (계절성 없는 매장은 계절 항 0)"""
+    import numpy as np
+
+    angle = 2 * np.pi * month_of_year / 12
+    season = np.stack([np.sin(angle), np.cos(angle), np.sin(2 * angle), np.cos(2 * angle)], axis=-1)
+    season = season * seasonal[:, None, None]
+    ones = np.ones(t.shape + (1,))
+    return np.concatenate([ones, t[..., None], season], axis=-1)
+
+
+def market_trend(stores: list, market_data: dict, dataset_version: str):
+    """행정동 업종 평균 매출의 월 단위 로그 기울기 (행정동 값이 없으면 서울 전체)"""
+    import numpy as np
+
+    quarters = _market_quarters(market_data, dataset_version)[-MARKET_TREND_QUARTERS:]
+    count = len(stores)
+    logs = np.zeros((count, len(quarters)))
+    mask = np.zeros((count, len(quarters)), dtype=bool)
+    for s, store in enumerate(stores):
+        sector = str(store.get("sector_code_cs"))
+        admin = str((store.get("location") or {}).get("admin_code"))
+        for q, quarter in enumerate(quarters):
+            value = market_data["avg_dong"].get((sector, admin, quarter)) or market_data["avg_all"].get((sector, quarter))
+            if value and value > 0:
+                logs[s, q] = math.log(value)
+                mask[s, q] = True
+
+    # 가중 최소제곱 기울기 (x는 월 단위)
+    x = np.arange(len(quarters)) * 3.0
+    n = mask.sum(axis=1)
+    safe_n = np.maximum(n, 1)
+    x_mean = (mask * x).sum(axis=1) / safe_n
+    y_mean = (mask * logs).sum(axis=1) / safe_n
+    dx = (x[None, :] - x_mean[:, None]) * mask
+    dy = (logs - y_mean[:, None]) * mask
+    denom = (dx * dx).sum(axis=1)
+    slope = np.where((n >= 2) & (denom > 0), (dx * dy).sum(axis=1) / np.where(denom > 0, denom, 1), 0.0)
+    return np.clip(slope, -MARKET_TREND_CLIP, MARKET_TREND_CLIP)
+
+
+def forecast_stores(stores: list, market_data: dict, dataset_version: str, horizon: int = FORECAST_HORIZON) -> list:
+    """
+    매장 여러 개를 한 번에 예측. 반환: forecastInfo 문서 리스트 (이력이 부족한 매장은 제외).
+    (동기 함수 - 배치 모드에서는 스레드에서 실행)
+    """
+    import numpy as np
+
+    if not stores:
+        return []
+
+    values, mask, last = build_series(stores)
+    count, history = values.shape
+    observed = mask.sum(axis=1)
+    seasonal = (observed >= SEASONAL_MIN_MONTHS).astype(float)
+
+    # 1. 추세 + 계절성 최소제곱 (매장마다 다른 달력 위치 → 매장별 설계 행렬을 einsum으로 일괄 처리)
+    offsets = np.arange(history) - (history - 1)
+    month_of_year = (last[:, None] + offsets[None, :]) % 12
+    t = np.broadcast_to(np.arange(history) / 12.0, (count, history))
+    X = _design(month_of_year, t, seasonal)
+    W = mask.astype(float)
+    p = X.shape[-1]
+
+    XtWX = np.einsum("stp,st,stq->spq", X, W, X) + RIDGE * np.eye(p)[None]
+    XtWX[:, 0, 0] -= RIDGE  # 절편은 규제하지 않음
+    XtWy = np.einsum("stp,st,st->sp", X, W, values)
+    beta = np.linalg.solve(XtWX + 1e-9 * np.eye(p)[None], XtWy[..., None])[..., 0]
+
+    fitted = np.einsum("stp,sp->st", X, beta)
+    dof = np.maximum(observed - (2 + 4 * seasonal), 1)
+    sigma = np.sqrt(((values - fitted) ** 2 * W).sum(axis=1) / dof)
+
+    steps = np.arange(1, horizon + 1)
+    future_moy = (last[:, None] + steps[None, :]) % 12
+    future_t = np.broadcast_to((history - 1 + steps) / 12.0, (count, horizon))
+    X_future = _design(future_moy, future_t, seasonal)
+    ls_forecast = np.einsum("shp,sp->sh", X_future, beta)
+
+    # 2. 계절성을 뺀 값에 감쇠 추세 Holt (시간 축만 순회, 매장 축은 벡터)
+    season_past = np.einsum("stp,sp->st", X[..., 2:], beta[:, 2:])
+    season_future = np.einsum("shp,sp->sh", X_future[..., 2:], beta[:, 2:])
+    deseason = values - season_past
+
+    level = np.zeros(count)
+    trend = np.zeros(count)
+    started = np.zeros(count, dtype=bool)
+    for i in range(history):
+        obs = mask[:, i]
+        first = obs & ~started
+        level = np.where(first, deseason[:, i], level)
+        started |= first
+
+        update = obs & ~first
+        prev_level = level
+        smoothed = HOLT_ALPHA * deseason[:, i] + (1 - HOLT_ALPHA) * (level + HOLT_PHI * trend)
+        level = np.where(update, smoothed, np.where(started & ~obs, level + HOLT_PHI * trend, level))
+        trend = np.where(
+            update,
+            HOLT_BETA * (level - prev_level) + (1 - HOLT_BETA) * HOLT_PHI * trend,
+            np.where(started & ~obs, HOLT_PHI * trend, trend)
+        )
+
+    damping = np.cumsum(HOLT_PHI ** steps)
+    holt_forecast = level[:, None] + damping[None, :] * trend[:, None] + season_future
+
+    # 3. 평균 + 상권 추세 반영
+    trend_slope = market_trend(stores, market_data, dataset_version)
+    log_forecast = 0.5 * (ls_forecast + holt_forecast) + MARKET_TREND_WEIGHT * trend_slope[:, None] * steps[None, :]
+    spread = BAND_Z * sigma[:, None] * np.sqrt(steps)[None, :]
+
+    point = np.maximum(np.expm1(log_forecast), 0)
+    lower = np.maximum(np.expm1(log_forecast - spread), 0)
+    upper = np.maximum(np.expm1(log_forecast + spread), 0)
+
+    now = datetime.utcnow()
+    docs = []
+    for s, store in enumerate(stores):
+        if observed[s] < MIN_HISTORY_MONTHS:
+            continue
+        base = int(last[s])
+        docs.append({
+            "user_email": store["user_id"],
+            "created_at": now,
+            "input_version": store.get("input_version", 0),
+            "dataset_version": dataset_version,
+            "base_ym": index_to_ym(base),
+            "horizon": horizon,
+            "forecast": [
+                {
+                    "ym": index_to_ym(base + h + 1),
+                    "quarter": ym_to_quarter_code(index_to_ym(base + h + 1)),
+                    "revenue": int(round(point[s, h])),
+                    "lower": int(round(lower[s, h])),
+                    "upper": int(round(upper[s, h])),
+                }
+                for h in range(horizon)
+            ],
+            "model": {
+                "history_months": int(observed[s]),
+                "seasonal": bool(seasonal[s]),
+                "market_trend_monthly": round(float(trend_slope[s]), 5),
+                "residual_sigma": round(float(sigma[s]), 4),
+            },
+        })
+    return docs
+
+
+FORECAST_PROJECTION = {
+    "_id": 0, "user_id": 1, "input_version": 1, "sector_code_cs": 1, "location.admin_code": 1,
+}
+
+
+# =================================================================
+# 배치 모드: 전체 매장 예측 후 forecastInfo에 저장
+#   python -m api.forecast
+# =================================================================
+@timer(STAGE_SECONDS, stage="forecast_batch")
+async def run_forecast_batch(batch_size: int = FORECAST_BATCH_SIZE) -> int:
+    from pymongo import UpdateOne
+
+    market = await get_market_index()
+    if market is None:
+        return 0
+
+    async def flush(chunk):
+        sales = await load_sales_arrays_many([store.get("user_id") for store in chunk], last_n=FORECAST_HISTORY_MONTHS)
+        for store in chunk:
+            store["sales"] = sales.get(store.get("user_id"))
+        docs = await asyncio.to_thread(forecast_stores, chunk, market.data, market.version)
+        if docs:
+            await forecast_collection.bulk_write(
+                [UpdateOne({"user_email": d["user_email"]}, {"$set": d}, upsert=True) for d in docs],
+                ordered=False
+            )
+        return len(docs)
+
+    total = 0
+    chunk = []
+    async for store in store_collection.find({}, FORECAST_PROJECTION):
+        chunk.append(store)
+        if len(chunk) >= batch_size:
+            total += await flush(chunk)
+            chunk = []
+    if chunk:
+        total += await flush(chunk)
+
+    logger.info("매출 예측 배치 완료", extra={"stores": total, "dataset_version": market.version})
+    return total
+
+
+# =================================================================
+# 예측 조회 API (캐시된 결과, 입력/데이터셋 버전이 바뀌었으면 다시 계산)
+# =================================================================
+@router.get("/forecast")
+async def get_forecast(current_user: str = Depends(get_current_user)):
+    store = await store_collection.find_one({"user_id": current_user}, FORECAST_PROJECTION)
+    if not store:
+        raise HTTPException(status_code=404, detail="등록된 매장 정보가 없습니다.")
+
+    market = await get_market_index()
+    if market is None:
+        raise HTTPException(status_code=503, detail="상권 데이터를 불러올 수 없습니다.")
+
+    cached = await forecast_collection.find_one({"user_email": current_user}, {"_id": 0})
+    if (cached and cached.get("input_version") == store.get("input_version", 0)
+            and cached.get("dataset_version") == market.version):
+        record_cache("forecast", True)
+        return {"hasData": True, "data": cached}
+    record_cache("forecast", False)
+
+    store["sales"] = await load_sales_arrays(current_user, last_n=FORECAST_HISTORY_MONTHS)
+    with timer(STAGE_SECONDS, stage="forecast"):
+        docs = forecast_stores([store], market.data, market.version)
+    if not docs:
+        return {
+            "hasData": False,
+            "message": f"예측하려면 최소 {MIN_HISTORY_MONTHS}개월의 매출 데이터가 필요합니다.",
+            "data": None
+        }
+
+    await forecast_collection.update_one({"user_email": current_user}, {"$set": docs[0]}, upsert=True)
+    return {"hasData": True, "data": docs[0]}
+
+
+if __name__ == "__main__":
+    from core.config import init_db
+    from core.logger import setup_logging
+
+    setup_logging()
+    init_db()
+    asyncio.run(run_forecast_batch())
@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from core.security import get_current_user
+from core.config import analysis_history_collection, ANALYSIS_HISTORY_RETENTION_DAYS
+from core.logger import get_logger
+from core.responses import dumps
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/api/analysis", tags=["analysis"])
+
+# =================================================================
+# 분석 이력 (analysisHistory)
+# - analysisInfo는 최신 결과 하나(포인터 역할)만 유지하고, 매 실행 결과는 요약 스냅샷으로 이력에 쌓음
+# - 문서 하나 = (사용자, 대상 연도) 버킷: {_id: "<user>:<year>", user_email, year, snapshots: [...], expires_at}
+#   → 사용자당 연도 수만큼의 문서만 생기고, 한 해 이력은 한 번에 읽음
+# - 보관 기간: 버킷에 마지막으로 기록한 뒤 ANALYSIS_HISTORY_RETENTION_DAYS 가 지나면 TTL 인덱스가 삭제
+# =================================================================
+# 버킷 하나에 보관하는 최대 스냅샷 수 (오래된 것부터 버림)
+HISTORY_BUCKET_MAX = 500
+HISTORY_DEFAULT_LIMIT = 50
+HISTORY_MAX_LIMIT = 500
+# 스트리밍 청크 크기 (스냅샷마다 보내면 압축 효율이 떨어짐)
+HISTORY_CHUNK_BYTES = 16 * 1024
+
+_history_index_ready = False
+
+
+async def _ensure_history_index():
+    global _history_index_ready
+    if _history_index_ready:
+        return
+    try:
+        await analysis_history_collection.create_index([("user_email", 1), ("year", -1)])
+        await analysis_history_collection.create_index("expires_at", expireAfterSeconds=0)
+        _history_index_ready = True
+    except Exception as e:
+        logger.error(f"analysisHistory 인덱스 생성 실패: {str(e)}")
+
+
+def analysis_snapshot(result: dict) -> dict:
+    """analysisInfo 결과 → 이력용 요약 (그래프 배열 등은 제외)"""
+    percentile = result.get("percentile") or {}
+    latest = result.get("latest_comparison") or {}
+    footfall = result.get("footfall_gap") or {}
+    return {
+        "target_ym": result["target_ym"],
+        "created_at": result.get("created_at") or datetime.utcnow(),
+        "dataset_version": result.get("dataset_version"),
+        "grade": percentile.get("grade"),
+        "ratio": percentile.get("ratio"),
+        "benchmark_revenue": percentile.get("benchmark_revenue"),
+        "mom": (result.get("mom_growth") or {}).get("value"),
+        "my_revenue": latest.get("my_store"),
+        "industry_avg_dong": latest.get("industry_avg_dong"),
+        "industry_avg_all": latest.get("industry_avg_all"),
+        "footfall_score": footfall.get("score"),
+    }
+
+
+async def record_analysis_snapshot(result: dict):
+    """분석 결과 저장 직후 호출. 실패해도 분석 자체는 성공으로 둠"""
+    try:
+        await _ensure_history_index()
+        snapshot = analysis_snapshot(result)
+        user_email = result["user_email"]
+        year = snapshot["target_ym"][:4]
+        await analysis_history_collection.update_one(
+            {"_id": f"{user_email}:{year}"},
+            {
+                "$push": {"snapshots": {"$each": [snapshot], "$slice": -HISTORY_BUCKET_MAX}},
+                "$set": {
+                    "user_email": user_email,
+                    "year": year,
+                    "updated_at": datetime.utcnow(),
+                    "expires_at": datetime.utcnow() + timedelta(days=ANALYSIS_HISTORY_RETENTION_DAYS),
+                },
+            },
+            upsert=True
+        )
+    except Exception:
+        logger.exception("분석 이력 저장 실패", extra={"user_id": result.get("user_email")})
+
+
+def _snapshot_key(snapshot: dict) -> tuple:
+    return snapshot["target_ym"], snapshot["created_at"]
+
+
+async def iter_history(user_email: str, before: Optional[tuple], limit: int):
+    """(대상 년월, 생성 시각) 내림차순으로 스냅샷을 하나씩. before보다 작은 것만"""
+    query = {"user_email": user_email}
+    if before is not None:
+        query["year"] = {"$lte": before[0][:4]}
+
+    sent = 0
+    cursor = analysis_history_collection.find(query, {"_id": 0, "snapshots": 1}).sort("year", -1)
+    async for bucket in cursor:
+        snapshots = sorted(bucket.get("snapshots") or [], key=_snapshot_key, reverse=True)
+        for snapshot in snapshots:
+            if before is not None and _snapshot_key(snapshot) >= before:
+                continue
+            yield snapshot
+            sent += 1
+            if sent >= limit:
+                return
+
+
+def _parse_cursor(before: Optional[str]):
+    if not before:
+        return None
+    ym, _, created_at = before.partition("|")
+    try:
+        return ym, datetime.fromisoformat(created_at) if created_at else datetime.min
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"잘못된 커서입니다: {before}")
+
+
+# =================================================================
+# 분석 이력 조회 API (커서 페이지네이션, 응답은 스트리밍)
+# - before: 이전 응답의 next_before 값 (없으면 최신부터)
+# - 응답: {"data": [...], "next_before": "YYYY-MM|생성시각" 또는 null}
+# =================================================================
+@router.get("/history")
+async def get_analysis_history(
+    limit: int = Query(HISTORY_DEFAULT_LIMIT, ge=1, le=HISTORY_MAX_LIMIT),
+    before: Optional[str] = Query(None, description="이 시점보다 이전 스냅샷부터 (YYYY-MM 또는 next_before 값)"),
+    current_user: str = Depends(get_current_user)
+):
+    cursor = _parse_cursor(before)
+
+    async def body():
+        buffer = bytearray(b'{"data":[')
+        count = 0
+        last = None
+        async for snapshot in iter_history(current_user, cursor, limit):
+            if count:
+                buffer += b","
+            buffer += dumps(snapshot)
+            count += 1
+            last = snapshot
+            if len(buffer) >= HISTORY_CHUNK_BYTES:
+                yield bytes(buffer)
+                buffer.clear()
+        next_before = None
+        if last is not None and count >= limit:
+            next_before = f"{last['target_ym']}|{last['created_at'].isoformat()}"
+        buffer += b'],"next_before":' + dumps(next_before) + b"}"
+        yield bytes(buffer)
+
+    return StreamingResponse(body(), media_type="application/json")
@@ -0,0 +1,253 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from core.security import get_current_user
+from core.config import cell_stats_collection, cell_member_collection, MIN_CELL_STORES
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/api/analysis", tags=["analysis"])
+
+# =================================================================
+# 행정동 x 업종 집계 (리더보드 / 히트맵)
+# - 분석 결과를 저장할 때마다 해당 셀의 합계/개수/히스토그램을 $inc로 갱신 (analysisInfo 전체를 다시 읽지 않음)
+#   셀 문서: {_id: "<행정동>:<업종>", count, ratio_sum, mom_sum, ratio_hist: {구간: 개수}, mom_hist, 요약값...}
+#   업종 전체 셀(업종 = "ALL")도 같이 갱신 → 행정동 단위 히트맵
+# - 매장별 현재 기여분은 dongSectorMember에 두고, 다시 분석되면 이전 기여분을 빼고 새 값을 더함
+# - 분위수는 고정 구간 히스토그램(가감 가능한 근사 스케치)에서 보간, 평균/중앙값 등 요약값은 갱신 때 같이 저장
+#   → 조회는 인덱스 정렬 + limit만 (요청마다 계산하지 않음)
+# - 매장 수가 MIN_CELL_STORES 미만인 셀은 다른 매장 매출이 드러나지 않도록 응답에서 제외
+# =================================================================
+ALL_SECTORS = "ALL"
+# percentile.ratio: 0 ~ 3 을 0.05 단위 60구간 (마지막 구간은 3 이상 전체)
+RATIO_BINS = (0.0, 0.05, 60)
+# MoM(%): -100 ~ 200 을 5%p 단위 60구간 (마지막 구간은 200 이상 전체)
+MOM_BINS = (-100.0, 5.0, 60)
+QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+SORT_FIELDS = {"ratio": "avg_ratio", "mom": "avg_mom", "count": "count"}
+LEADERBOARD_MAX_OFFSET = 5000
+
+_stats_index_ready = False
+
+
+async def _ensure_stats_index():
+    global _stats_index_ready
+    if _stats_index_ready:
+        return
+    try:
+        for field in SORT_FIELDS.values():
+            await cell_stats_collection.create_index([("sector_code", 1), (field, -1)])
+        _stats_index_ready = True
+    except Exception as e:
+        logger.error(f"dongSectorStats 인덱스 생성 실패: {str(e)}")
+
+
+def _bin(value: float, bins: tuple) -> int:
+    low, width, count = bins
+    return min(max(int((value - low) // width), 0), count)
+
+
+def hist_quantiles(hist: dict, bins: tuple, quantiles: list = QUANTILES) -> dict:
+    """히스토그램 {구간: 개수} → 분위수 근사 (구간 안에서는 선형 보간, 마지막 구간은 하한값)"""
+    low, width, count = bins
+    counts = [max(int(hist.get(str(i)) or 0), 0) for i in range(count + 1)]
+    total = sum(counts)
+    result = {}
+    for q in quantiles:
+        key = f"p{int(round(q * 100))}"
+        if total == 0:
+            result[key] = None
+            continue
+        target = q * total
+        seen = 0
+        for i, c in enumerate(counts):
+            if c and seen + c >= target:
+                fraction = (target - seen) / c if i < count else 0.0
+                result[key] = round(low + (i + fraction) * width, 2)
+                break
+            seen += c
+    return result
+
+
+def cell_contribution(result: dict, sector_code: str, admin_code: str, admin_dong_name: str = None):
+    """분석 결과 → 셀 기여분 (비율/MoM이 없으면 None)"""
+    ratio = (result.get("percentile") or {}).get("ratio")
+    mom = (result.get("mom_growth") or {}).get("value")
+    if ratio is None or mom is None or not admin_code or admin_code == "None" or not sector_code:
+        return None
+    return {
+        "cells": [f"{admin_code}:{sector_code}", f"{admin_code}:{ALL_SECTORS}"],
+        "admin_code": str(admin_code),
+        "sector_code": str(sector_code),
+        "admin_dong_name": admin_dong_name,
+        "ratio": float(ratio),
+        "mom": float(mom),
+        "ratio_bin": _bin(float(ratio), RATIO_BINS),
+        "mom_bin": _bin(float(mom), MOM_BINS),
+    }
+
+
+def _summary(cell: dict) -> dict:
+    count = cell.get("count") or 0
+    if count <= 0:
+        return {"avg_ratio": None, "avg_mom": None, "ratio_quantiles": {}, "mom_quantiles": {}}
+    return {
+        "avg_ratio": round(cell["ratio_sum"] / count, 4),
+        "avg_mom": round(cell["mom_sum"] / count, 2),
+        "ratio_quantiles": hist_quantiles(cell.get("ratio_hist") or {}, RATIO_BINS),
+        "mom_quantiles": hist_quantiles(cell.get("mom_hist") or {}, MOM_BINS),
+    }
+
+
+async def _apply(contribution: dict, sign: int):
+    from pymongo import ReturnDocument
+
+    for cell_id in contribution["cells"]:
+        sector = cell_id.rsplit(":", 1)[1]
+        update = {"$inc": {
+            "count": sign,
+            "ratio_sum": sign * contribution["ratio"],
+            "mom_sum": sign * contribution["mom"],
+            f"ratio_hist.{contribution['ratio_bin']}": sign,
+            f"mom_hist.{contribution['mom_bin']}": sign,
+        }}
+        if sign > 0:
+            update["$set"] = {"admin_code": contribution["admin_code"], "sector_code": sector, "updated_at": datetime.utcnow()}
+            if contribution.get("admin_dong_name"):
+                update["$set"]["admin_dong_name"] = contribution["admin_dong_name"]
+        cell = await cell_stats_collection.find_one_and_update(
+            {"_id": cell_id}, update, upsert=sign > 0, return_document=ReturnDocument.AFTER
+        )
+        if cell is None:
+            continue
+        # 요약값은 방금 읽은 합계가 그대로일 때만 기록 (동시에 갱신됐으면 나중 쪽이 기록)
+        await cell_stats_collection.update_one(
+            {"_id": cell_id, "count": cell["count"], "ratio_sum": cell["ratio_sum"], "mom_sum": cell["mom_sum"]},
+            {"$set": _summary(cell)}
+        )
+
+
+async def record_cell_stats(result: dict, sector_code: str, admin_code: str, admin_dong_name: str = None):
+    """분석 결과 저장 직후 호출. 이 매장의 이전 기여분을 빼고 새 값을 더함 (실패해도 분석은 성공으로 둠)"""
+    from pymongo import ReturnDocument
+
+    user_id = result.get("user_email")
+    try:
+        contribution = cell_contribution(result, str(sector_code), str(admin_code), admin_dong_name)
+        await _ensure_stats_index()
+        if contribution is None:
+            # 더 이상 어느 셀에도 속하지 않으면(비율/MoM 없음, 행정동 없음) 이전 기여분만 뺌
+            previous = await cell_member_collection.find_one_and_delete({"_id": user_id})
+            if previous is not None:
+                previous.pop("_id", None)
+                await _apply(previous, -1)
+            return
+        previous = await cell_member_collection.find_one_and_update(
+            {"_id": user_id}, {"$set": contribution}, upsert=True, return_document=ReturnDocument.BEFORE
+        )
+        if previous is not None:
+            previous.pop("_id", None)
+            if previous == contribution:
+                return
+            await _apply(previous, -1)
+        await _apply(contribution, 1)
+    except Exception:
+        logger.exception("행정동/업종 집계 갱신 실패", extra={"user_id": user_id})
+
+
+# =================================================================
+# 조회 API (집계 문서만 읽음)
+# =================================================================
+CELL_PROJECTION = {
+    "_id": 0, "admin_code": 1, "admin_dong_name": 1, "sector_code": 1, "count": 1,
+    "avg_ratio": 1, "avg_mom": 1, "ratio_quantiles": 1, "mom_quantiles": 1, "updated_at": 1,
+}
+
+
+@router.get("/leaderboard")
+async def get_leaderboard(
+    sector_code: Optional[str] = Query(None, description="업종 코드 (없으면 모든 행정동 x 업종)"),
+    sort: str = Query("ratio", description="정렬 기준: ratio(평균 매출 비율) / mom(평균 전월 대비) / count(매장 수)"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=LEADERBOARD_MAX_OFFSET),
+    current_user: str = Depends(get_current_user)
+):
+    field = SORT_FIELDS.get(sort)
+    if field is None:
+        raise HTTPException(status_code=400, detail=f"정렬 기준은 {', '.join(SORT_FIELDS)} 중 하나여야 합니다.")
+
+    query = {"count": {"$gte": MIN_CELL_STORES}}
+    query["sector_code"] = sector_code if sector_code else {"$ne": ALL_SECTORS}
+    cursor = (cell_stats_collection.find(query, CELL_PROJECTION)
+              .sort([(field, -1), ("admin_code", 1)]).skip(offset).limit(limit))
+    cells = [cell async for cell in cursor]
+    return {
+        "data": [{"rank": offset + i, **cell} for i, cell in enumerate(cells, start=1)],
+        "next_offset": offset + len(cells) if len(cells) == limit else None,
+    }
+
+
+@router.get("/heatmap")
+async def get_heatmap(
+    sector_code: Optional[str] = Query(None, description="업종 코드 (없으면 업종 전체)"),
+    current_user: str = Depends(get_current_user)
+):
+    query = {"sector_code": sector_code or ALL_SECTORS, "count": {"$gte": MIN_CELL_STORES}}
+    cells = [cell async for cell in cell_stats_collection.find(query, CELL_PROJECTION)]
+    ratios = [cell["avg_ratio"] for cell in cells if cell.get("avg_ratio") is not None]
+    return {
+        "sector_code": sector_code or ALL_SECTORS,
+        "min_stores": MIN_CELL_STORES,
+        "range": {"min": min(ratios), "max": max(ratios)} if ratios else None,
+        "cells": cells,
+    }
+
+
+# =================================================================
+# 재구성: analysisInfo 전체로 집계를 처음부터 다시 만듦 (python -m api.leaderboard)
+# - 처음 도입할 때, 또는 구간 설정을 바꾼 뒤 실행
+# =================================================================
+async def rebuild_cell_stats(batch_size: int = 500) -> int:
+    from core.config import analysis_collection, store_collection
+
+    await cell_stats_collection.delete_many({})
+    await cell_member_collection.delete_many({})
+
+    async def flush(chunk):
+        stores = {}
+        cursor = store_collection.find(
+            {"user_id": {"$in": [doc["user_email"] for doc in chunk]}},
+            {"_id": 0, "user_id": 1, "sector_code_cs": 1, "location.admin_code": 1, "location.admin_dong_name": 1}
+        )
+        async for store in cursor:
+            stores[store["user_id"]] = store
+        for doc in chunk:
+            store = stores.get(doc["user_email"])
+            if store:
+                location = store.get("location") or {}
+                await record_cell_stats(doc, store.get("sector_code_cs"), location.get("admin_code"),
+                                        location.get("admin_dong_name"))
+        return len(chunk)
+
+    total = 0
+    chunk = []
+    async for doc in analysis_collection.find({}, {"_id": 0, "user_email": 1, "percentile": 1, "mom_growth": 1}):
+        chunk.append(doc)
+        if len(chunk) >= batch_size:
+            total += await flush(chunk)
+            chunk = []
+    if chunk:
+        total += await flush(chunk)
+    logger.info("행정동/업종 집계 재구성 완료", extra={"stores": total})
+    return total
+
+
+if __name__ == "__main__":
+    import asyncio
+    from core.config import init_db
+    from core.logger import setup_logging
+
+    setup_logging()
+    init_db()
+    asyncio.run(rebuild_cell_stats())
@@ -1,15 +1,52 @@
 # main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from api.user import router as user_router
-from api.store import router as store_router
+from api.store import router as store_router, close_cell_client
 from api.analysis import router as analysis_router
 from api.solution import router as solution_router
 from api.chat import router as chat_router
+from api.forecast import router as forecast_router
+from api.peers import router as peers_router
+from api.simulate import router as simulate_router
+from api.history import router as history_router
+from api.leaderboard import router as leaderboard_router
+from core.config import init_db, close_db
+from core.dataset_registry import registry as dataset_registry
+from core.logger import setup_logging, RequestContextMiddleware
+from core.metrics import render_prometheus
+from core.responses import ORJSONResponse
+from core.compression import CompressionMiddleware
+from core.watchdog import watchdog, LoopWatchdogMiddleware, LOOP_WATCHDOG, LOOP_WATCHDOG_STRICT_MS
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+setup_logging()
+
+# 무거운 의존성(pandas, google.generativeai, requests, httpx)은 각 모듈에서 첫 사용 시 import
+# 서버 시작 시에는 DB 클라이언트만 준비
+# 디버그/테스트 시 LOOP_WATCHDOG=1 (또는 LOOP_WATCHDOG_STRICT_MS) 로 이벤트 루프 블로킹 감시
+WATCHDOG_ENABLED = LOOP_WATCHDOG or LOOP_WATCHDOG_STRICT_MS > 0
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    if WATCHDOG_ENABLED:
+        watchdog.start()
+    # data_set/ 감시 (새 분기 파일이 들어오면 재배포 없이 교체)
+    dataset_registry.start()
+    yield
+    await dataset_registry.stop()
+    await close_cell_client()
+    if WATCHDOG_ENABLED:
+        await watchdog.stop()
+    close_db()
 
 app = FastAPI(
     title="BIZIT",
     description="BIZIT",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 #라우터 등록
@@ -18,6 +55,11 @@ app.include_router(store_router)
 app.include_router(analysis_router)
 app.include_router(solution_router)
 app.include_router(chat_router)
+app.include_router(forecast_router)
+app.include_router(peers_router)
+app.include_router(simulate_router)
+app.include_router(history_router)
+app.include_router(leaderboard_router)
 
 #프론트엔드 통신
 app.add_middleware(
@@ -28,6 +70,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+#응답 압축 (br/gzip, 작은 응답은 제외)
+app.add_middleware(CompressionMiddleware)
+
+#이벤트 루프 블로킹 감시 (요청 ID가 붙은 뒤에 실행되도록 먼저 등록)
+if WATCHDOG_ENABLED:
+    app.add_middleware(LoopWatchdogMiddleware)
+
+#요청 ID + 요청 처리 시간 기록
+app.add_middleware(RequestContextMiddleware)
+
 @app.get("/")
 async def root():
-    return {"message": "hello world"}
\ No newline at end of file
+    return {"message": "hello world"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
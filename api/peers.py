@@ -0,0 +1,360 @@
+import asyncio
+import math
+import os
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from core.security import get_current_user
+from core.config import store_collection, MIN_CELL_STORES
+from core.logger import get_logger
+from core.metrics import timer, STAGE_SECONDS
+from api.sales_store import load_sales_logs_many
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/api/analysis", tags=["analysis"])
+
+# =================================================================
+# 유사 매장(peer) 검색
+# - 매장마다 매출 구성(요일/시간대/성별/연령 비중), 매출 규모, 매장 규모, 메뉴 가격대를
+#   고정 스케일로 정규화한 특징 벡터를 만들고 (모집단 통계에 의존하지 않아 매장 하나만 바뀌어도 갱신 가능)
+# - 워커 메모리의 (매장 x 특징) float32 행렬에서 코사인 유사도 전수 계산 + argpartition top-k
+#   (매장 수가 훨씬 많아지면 PeerIndex.search만 ANN 구조로 바꾸면 됨)
+# - 제출/매출 수정 시 해당 매장만 upsert, 다른 워커에서 바뀐 매장은 updated_at 기준으로 주기적으로 반영
+# =================================================================
+PEER_HISTORY_MONTHS = 12
+PEER_REVENUE_MONTHS = 3
+PEER_DEFAULT_K = 10
+PEER_MAX_K = 50
+# 유사 매장 매출은 이 분위수로만 공개 (개별 매장 값은 응답에 넣지 않음)
+PEER_REVENUE_BAND = (0.25, 0.5, 0.75)
+# 다른 워커의 변경분을 가져오는 주기(초)
+PEER_REFRESH_INTERVAL = float(os.getenv("PEER_REFRESH_INTERVAL", "300"))
+# 한 번에 점수를 계산하는 인덱스 행 수 (쿼리 여러 개를 묶을 때 메모리 상한)
+PEER_SEARCH_BLOCK = 65536
+
+WEEKLY_KEYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+TIME_SLOT_KEYS = ["t00_06", "t06_11", "t11_14", "t14_17", "t17_21", "t21_24"]
+GENDER_KEYS = ["male", "female"]
+AGE_KEYS = ["a10", "a20", "a30", "a40", "a50", "a60_over"]
+DETAIL_GROUPS = [
+    ("weekly", WEEKLY_KEYS),
+    ("time_slot", TIME_SLOT_KEYS),
+    ("gender", GENDER_KEYS),
+    ("age_groups", AGE_KEYS),
+]
+
+# 특징 그룹별 가중치 (비중 그룹은 합이 1인 분포라 규모 특징보다 값이 작음)
+GROUP_WEIGHTS = {
+    "weekly": 1.0,
+    "time_slot": 1.0,
+    "gender": 0.5,
+    "age_groups": 1.0,
+    "scale": 1.0,
+}
+# 규모 특징: log 값을 고정 범위로 나눠 대략 0~1 (월매출 1억 ≈ 1, 100평 ≈ 1 ...)
+REVENUE_LOG_SCALE = math.log1p(1e8)
+AREA_LOG_SCALE = math.log1p(100)
+SEATS_LOG_SCALE = math.log1p(100)
+PRICE_LOG_SCALE = math.log1p(50000)
+
+FEATURE_DIM = sum(len(keys) for _, keys in DETAIL_GROUPS) + 6
+
+PEER_PROJECTION = {
+    "_id": 0,
+    "user_id": 1,
+    "sector_code_cs": 1,
+    "location.admin_code": 1,
+    "location.admin_dong_name": 1,
+    "scale": 1,
+    "menus": 1,
+    "updated_at": 1,
+}
+
+
+def _shares(details: list, group: str, keys: list) -> list:
+    totals = [0.0] * len(keys)
+    for detail in details:
+        values = (detail or {}).get(group) or {}
+        for i, key in enumerate(keys):
+            totals[i] += max(float(values.get(key) or 0), 0.0)
+    total = sum(totals)
+    return [v / total for v in totals] if total > 0 else totals
+
+
+def recent_revenue(store: dict) -> float:
+    logs = [log for log in store.get("sales_logs") or [] if log.get("revenue") is not None]
+    recent = logs[-PEER_REVENUE_MONTHS:]
+    if not recent:
+        return 0.0
+    return sum(float(log["revenue"]) for log in recent) / len(recent)
+
+
+def store_features(store: dict):
+    """매장 문서 → (L2 정규화된 특징 벡터 리스트, 매출 정보 있음 여부)"""
+    logs = store.get("sales_logs") or []
+    details = [log.get("details") for log in logs if log.get("details")]
+
+    vector = []
+    for group, keys in DETAIL_GROUPS:
+        weight = GROUP_WEIGHTS[group]
+        vector.extend(v * weight for v in _shares(details, group, keys))
+
+    scale = store.get("scale") or {}
+    menus = (store.get("menus") or {}).get("main") or []
+    prices = [float(m.get("price") or 0) for m in menus if m.get("price")]
+    revenue = recent_revenue(store)
+    profits = [float(log.get("profit") or 0) for log in logs[-PEER_REVENUE_MONTHS:]]
+    margin = sum(profits) / (revenue * len(profits)) if revenue > 0 and profits else 0.0
+
+    weight = GROUP_WEIGHTS["scale"]
+    vector.extend(v * weight for v in [
+        math.log1p(max(revenue, 0.0)) / REVENUE_LOG_SCALE,
+        math.log1p(max(float(scale.get("area_size") or 0), 0.0)) / AREA_LOG_SCALE,
+        math.log1p(max(float(scale.get("seats") or 0), 0.0)) / SEATS_LOG_SCALE,
+        min(max(float(scale.get("turnover") or 0), 0.0), 10.0) / 10.0,
+        math.log1p(sum(prices) / len(prices)) / PRICE_LOG_SCALE if prices else 0.0,
+        min(max(margin, -1.0), 1.0),
+    ])
+
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm > 0:
+        vector = [v / norm for v in vector]
+    return vector, revenue > 0
+
+
+class PeerIndex:
+    """
+    (매장 x 특징) 행렬 기반 k-NN 인덱스. 행은 용량을 두 배씩 늘려가며 재사용하고,
+    삭제된 매장은 alive=False로 두었다가 같은 매장이 다시 들어오면 그 행을 씀.
+    """
+    def __init__(self, dim: int = FEATURE_DIM):
+        self.dim = dim
+        self.rows = {}        # user_id -> 행 번호
+        self.meta = []        # 행 번호 -> {sector, admin_code, dong_name, revenue, ...}
+        self.vectors = None
+        self.alive = None
+        self.sectors = None   # 행 번호 -> 업종 번호 (업종 필터용)
+        self.sector_ids = {}
+        self.size = 0
+        self.loaded = False
+        self.refreshed_at = None
+
+    def _grow(self, capacity: int):
+        import numpy as np
+
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        alive = np.zeros(capacity, dtype=bool)
+        sectors = np.full(capacity, -1, dtype=np.int32)
+        if self.vectors is not None:
+            vectors[:self.size] = self.vectors[:self.size]
+            alive[:self.size] = self.alive[:self.size]
+            sectors[:self.size] = self.sectors[:self.size]
+        self.vectors, self.alive, self.sectors = vectors, alive, sectors
+
+    def upsert(self, user_id: str, vector: list, meta: dict):
+        row = self.rows.get(user_id)
+        if row is None:
+            if self.vectors is None or self.size >= len(self.vectors):
+                self._grow(max(1024, self.size * 2))
+            row = self.size
+            self.size += 1
+            self.rows[user_id] = row
+            self.meta.append(meta)
+        else:
+            self.meta[row] = meta
+        self.vectors[row] = vector
+        self.alive[row] = True
+        sector = meta.get("sector") or ""
+        self.sectors[row] = self.sector_ids.setdefault(sector, len(self.sector_ids))
+
+    def remove(self, user_id: str):
+        row = self.rows.get(user_id)
+        if row is not None:
+            self.alive[row] = False
+
+    def search(self, queries, k: int, sector: str = None, exclude: list = None):
+        """
+        queries: (Q, dim) 정규화 벡터 → 쿼리별 [(행 번호, 유사도), ...] 상위 k개.
+        인덱스를 PEER_SEARCH_BLOCK 행씩 나눠 블록별 top-k를 구한 뒤 합침.
+        """
+        import numpy as np
+
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if self.size == 0:
+            return [[] for _ in range(len(queries))]
+
+        valid = self.alive[:self.size].copy()
+        if sector is not None:
+            sector_id = self.sector_ids.get(sector)
+            if sector_id is None:
+                return [[] for _ in range(len(queries))]
+            valid &= self.sectors[:self.size] == sector_id
+
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, self.size, PEER_SEARCH_BLOCK):
+            stop = min(start + PEER_SEARCH_BLOCK, self.size)
+            scores = queries @ self.vectors[start:stop].T
+            scores[:, ~valid[start:stop]] = -np.inf
+            if exclude is not None:
+                for q, row in enumerate(exclude):
+                    if row is not None and start <= row < stop:
+                        scores[q, row - start] = -np.inf
+            take = min(k, stop - start)
+            part = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+            best_rows = np.concatenate([best_rows, part + start], axis=1)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, part, axis=1)], axis=1)
+
+        order = np.argsort(-best_scores, axis=1)[:, :k]
+        rows = np.take_along_axis(best_rows, order, axis=1)
+        scores = np.take_along_axis(best_scores, order, axis=1)
+        return [
+            [(int(r), float(s)) for r, s in zip(rows[q], scores[q]) if np.isfinite(s)]
+            for q in range(len(queries))
+        ]
+
+
+peer_index = PeerIndex()
+_load_lock = asyncio.Lock()
+
+
+def _meta(store: dict, revenue: float) -> dict:
+    location = store.get("location") or {}
+    scale = store.get("scale") or {}
+    return {
+        "sector": str(store.get("sector_code_cs") or ""),
+        "admin_code": location.get("admin_code"),
+        "dong_name": location.get("admin_dong_name"),
+        "area_size": scale.get("area_size"),
+        "seats": scale.get("seats"),
+        "avg_revenue": int(revenue),
+    }
+
+
+def _featurize(stores: list) -> list:
+    """(동기 함수 - 스레드에서 실행) 매출 정보가 없는 매장은 비교 대상에서 제외"""
+    results = []
+    for store in stores:
+        vector, has_sales = store_features(store)
+        results.append((store["user_id"], vector if has_sales else None, _meta(store, recent_revenue(store))))
+    return results
+
+
+def _apply(results: list):
+    for user_id, vector, meta in results:
+        if vector is None:
+            peer_index.remove(user_id)
+        else:
+            peer_index.upsert(user_id, vector, meta)
+
+
+async def _attach_sales(stores: list):
+    logs = await load_sales_logs_many([store["user_id"] for store in stores], last_n=PEER_HISTORY_MONTHS)
+    for store in stores:
+        store["sales_logs"] = logs[store["user_id"]]
+
+
+async def _load(query: dict, batch_size: int = 2000) -> int:
+    count = 0
+    chunk = []
+    async for store in store_collection.find(query, PEER_PROJECTION):
+        chunk.append(store)
+        if len(chunk) >= batch_size:
+            await _attach_sales(chunk)
+            _apply(await asyncio.to_thread(_featurize, chunk))
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        await _attach_sales(chunk)
+        _apply(await asyncio.to_thread(_featurize, chunk))
+        count += len(chunk)
+    return count
+
+
+async def ensure_peer_index():
+    """처음 조회할 때 전체 매장으로 인덱스를 만들고, 이후에는 주기적으로 변경분만 반영"""
+    now = datetime.now()
+    if peer_index.loaded and (now - peer_index.refreshed_at).total_seconds() < PEER_REFRESH_INTERVAL:
+        return
+    async with _load_lock:
+        if peer_index.loaded and (now - peer_index.refreshed_at).total_seconds() < PEER_REFRESH_INTERVAL:
+            return
+        started = datetime.now()
+        if not peer_index.loaded:
+            with timer(STAGE_SECONDS, stage="peer_index_build"):
+                count = await _load({"user_id": {"$ne": None}})
+            peer_index.loaded = True
+            logger.info("유사 매장 인덱스 생성", extra={"stores": count, "indexed": len(peer_index.rows)})
+        else:
+            count = await _load({"updated_at": {"$gte": peer_index.refreshed_at}})
+            if count:
+                logger.info("유사 매장 인덱스 갱신", extra={"stores": count})
+        peer_index.refreshed_at = started
+
+
+async def refresh_peer(user_id: str):
+    """매장 정보/매출이 바뀐 뒤 해당 매장만 다시 넣음 (인덱스가 아직 없으면 첫 조회 때 전체 생성)"""
+    if not peer_index.loaded:
+        return
+    store = await store_collection.find_one({"user_id": user_id}, PEER_PROJECTION)
+    if store is None:
+        peer_index.remove(user_id)
+        return
+    await _attach_sales([store])
+    _apply(_featurize([store]))
+
+
+# =================================================================
+# 유사 매장 조회 API
+# =================================================================
+@router.get("/peers")
+async def get_peers(
+    k: int = Query(max(PEER_DEFAULT_K, MIN_CELL_STORES), ge=MIN_CELL_STORES, le=PEER_MAX_K),
+    same_sector: bool = Query(True, description="같은 업종 안에서만 검색"),
+    current_user: str = Depends(get_current_user)
+):
+    store = await store_collection.find_one({"user_id": current_user}, PEER_PROJECTION)
+    if not store:
+        raise HTTPException(status_code=404, detail="등록된 매장 정보가 없습니다.")
+    await _attach_sales([store])
+
+    vector, has_sales = store_features(store)
+    if not has_sales:
+        return {"hasData": False, "message": "유사 매장을 찾으려면 매출 데이터가 필요합니다.", "data": None}
+
+    await ensure_peer_index()
+    sector = str(store.get("sector_code_cs") or "") if same_sector else None
+    with timer(STAGE_SECONDS, stage="peer_search"):
+        matches = peer_index.search([vector], k, sector=sector, exclude=[peer_index.rows.get(current_user)])[0]
+
+    # 다른 매장의 매출/규모는 개별 값으로 내보내지 않음 (집계는 MIN_CELL_STORES개 이상일 때만, 행정동/업종 집계와 같은 기준)
+    if len(matches) < MIN_CELL_STORES:
+        return {"hasData": False, "message": "비교할 유사 매장이 충분하지 않습니다.", "data": None}
+
+    my_admin_code = (store.get("location") or {}).get("admin_code")
+    peers = []
+    for rank, (row, score) in enumerate(matches, start=1):
+        meta = peer_index.meta[row]
+        peers.append({
+            "rank": rank,
+            "similarity": round(score, 4),
+            "admin_dong_name": meta.get("dong_name"),
+            "same_dong": meta.get("admin_code") == my_admin_code,
+        })
+
+    my_revenue = int(recent_revenue(store))
+    revenues = sorted(peer_index.meta[row].get("avg_revenue") or 0 for row, _ in matches)
+    band = {f"p{int(q * 100)}": revenues[int(round((len(revenues) - 1) * q))] for q in PEER_REVENUE_BAND}
+    return {
+        "hasData": True,
+        "data": {
+            "k": k,
+            "same_sector": same_sector,
+            "peer_count": len(peers),
+            "my_avg_revenue": my_revenue,
+            "peer_median_revenue": band["p50"],
+            "peer_revenue_band": band,
+            "ratio_to_median": round(my_revenue / band["p50"], 4) if band["p50"] else None,
+            "peers": peers,
+        }
+    }
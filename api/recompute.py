@@ -0,0 +1,356 @@
+# 재계산 워커 (python -m api.recompute)
+# - storeInfo/storeSales 변경을 MongoDB 변경 스트림으로 받아 분석/솔루션/주변 상권을 다시 계산
+#   (제출 API뿐 아니라 DB 직접 수정, 백필, 데이터 보정도 반영됨)
+# - 변경 스트림을 못 쓰는 단일 인스턴스(standalone)에서는 updated_at 폴링으로 대신함
+# - 같은 매장의 연속 변경은 RECOMPUTE_DEBOUNCE 동안 모아서 한 번만 처리
+# - 단계별 입력 해시를 recomputeState에 저장해 두고, 입력이 바뀐 단계만 실행
+#   결과가 없는 단계는 마지막 시도 이후 입력이 바뀌었거나 다른 쪽(제출 API 등)이 입력 버전을 올렸을 때만 다시 시도
+#   (매출/좌표가 없어 결과를 못 만드는 매장을 매번 다시 돌리지 않도록)
+# - 워커가 스스로 입력 버전만 올린 변경 이벤트는 무시
+# - 처리가 끝난 변경까지의 resume token을 저장 → 재시작해도 놓치는 변경 없음
+#
+# 상태 문서 (recomputeState)
+#   {_id: "<user>", hashes: {surrounding, analysis, solution} (마지막으로 시도한 입력), version, updated_at}
+#   {_id: "__change_stream__", token, saved_at}
+#   {_id: "__poll__", watermarks: {storeInfo: 시각, storeSales: 시각}, saved_at}
+import asyncio
+import hashlib
+import json
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from core.config import (
+    store_collection, sales_collection, analysis_collection, solution_collection, surrounding_collection,
+    recompute_state_collection, init_db,
+    RECOMPUTE_DEBOUNCE, RECOMPUTE_POLL_INTERVAL, RECOMPUTE_CONCURRENCY,
+)
+from core.logger import get_logger
+from core.metrics import counter, timer, STAGE_SECONDS
+from core.singleflight import single_flight
+
+logger = get_logger("recompute")
+
+RECOMPUTE_TOTAL = counter("bizit_recompute_total", "재계산 워커 단계 실행 수 (stage별)")
+
+WATCHED_COLLECTIONS = ["storeInfo", "storeSales"]
+STREAM_STATE_ID = "__change_stream__"
+POLL_STATE_ID = "__poll__"
+# resume token이 만료됐을 때 마지막 저장 시각보다 이만큼 앞에서부터 다시 훑음
+# (storeInfo.updated_at은 로컬 시각, storeSales는 UTC라 시간대 차이를 넉넉히 덮음)
+CATCH_UP_MARGIN = timedelta(days=1)
+POLL_BATCH_SIZE = 1000
+TOKEN_SAVE_INTERVAL = 5.0
+# InvalidResumeToken, ChangeStreamFatalError, ChangeStreamHistoryLost
+RESUME_FAILURE_CODES = (260, 280, 286)
+
+STORE_PROJECTION = {"_id": 0, "user_id": 1, "input_version": 1, "sector_name": 1, "sector_code_cs": 1,
+                    "sector_code_low": 1, "location": 1, "fixed_cost": 1, "delivery": 1, "menus": 1,
+                    "scale": 1, "operation": 1, "goals": 1}
+
+
+def _digest(values) -> str:
+    return hashlib.sha1(json.dumps(values, sort_keys=True, default=str, ensure_ascii=False).encode()).hexdigest()
+
+
+def stage_hashes(store: dict) -> dict:
+    """단계별 입력 해시 (store에는 sales_logs가 붙어 있어야 함). 제출 API의 변경 판단과 같은 필드 사용"""
+    from api.store import ANALYSIS_FIELDS, SOLUTION_FIELDS, get_field
+
+    location = store.get("location") or {}
+    surrounding = _digest([location.get("lat"), location.get("lng"), store.get("sector_code_low")])
+    return {
+        "surrounding": surrounding,
+        "analysis": _digest([get_field(store, path) for path in ANALYSIS_FIELDS]),
+        # 주변 상권이 바뀌면 솔루션 프롬프트도 바뀜
+        "solution": _digest([get_field(store, path) for path in SOLUTION_FIELDS] + [surrounding]),
+    }
+
+
+async def _missing_results(user_id: str) -> set:
+    missing = set()
+    if not await surrounding_collection.find_one({"user_id": user_id}, {"_id": 1}):
+        missing.add("surrounding")
+    if not await analysis_collection.find_one({"user_email": user_id}, {"_id": 1}):
+        missing.add("analysis")
+    if not await solution_collection.find_one({"user_id": user_id}, {"_id": 1}):
+        missing.add("solution")
+    return missing
+
+
+async def recompute_user(user_id: str) -> list:
+    """매장 하나의 입력을 확인해 필요한 단계만 실행. 실행한 단계 목록을 반환"""
+    from api.analysis import run_analysis
+    from api.solution import run_sol
+    from api.store import refresh_surrounding
+    from api.sales_store import load_sales_logs
+
+    store = await store_collection.find_one({"user_id": user_id}, STORE_PROJECTION)
+    if not store:
+        return []
+    store["sales_logs"] = await load_sales_logs(user_id)
+    hashes = stage_hashes(store)
+
+    state = await recompute_state_collection.find_one({"_id": user_id})
+    missing = await _missing_results(user_id)
+    if state is None:
+        # 처음 보는 매장은 현재 입력을 기준으로 삼고 결과가 없는 단계만 실행
+        # (워커를 처음 띄웠을 때 전체 매장의 솔루션을 다시 만들지 않도록)
+        stages = missing
+    else:
+        changed = {stage for stage, value in hashes.items() if state["hashes"].get(stage) != value}
+        # 같은 입력으로 이미 시도했는데 결과가 없으면(매출/상권 자료 부족 등) 다시 요청받았을 때만 재시도
+        requested = store.get("input_version", 0) > state.get("version", -1)
+        stages = changed | (missing if requested else set())
+    if "surrounding" in stages:
+        stages.add("solution")
+
+    if stages:
+        # 같은 입력 버전은 lease가 이미 done일 수 있음 → 워커가 이미 처리한 버전이면 버전을 올려서 실행
+        # (제출 API가 올린 새 버전이면 그대로 써서 inline 실행과 겹쳐도 합류)
+        version = store.get("input_version", 0)
+        if state is None or version <= state.get("version", -1):
+            saved = await store_collection.find_one_and_update(
+                {"user_id": user_id},
+                {"$inc": {"input_version": 1}},
+                projection={"_id": 0, "input_version": 1},
+                return_document=True
+            )
+            if saved is None:
+                return []
+            version = saved["input_version"]
+
+        with timer(STAGE_SECONDS, stage="recompute"):
+            if "surrounding" in stages:
+                location = store.get("location") or {}
+                if location.get("lat") is not None and location.get("lng") is not None:
+                    await refresh_surrounding(user_id, location["lat"], location["lng"], store.get("sector_code_low"))
+            jobs = []
+            if "analysis" in stages:
+                jobs.append(single_flight("analysis", user_id, version, run_analysis, user_id))
+            if "solution" in stages:
+                jobs.append(single_flight("solution", user_id, version, run_sol, user_id))
+            await asyncio.gather(*jobs)
+        for stage in stages:
+            RECOMPUTE_TOTAL.inc(stage=stage)
+        logger.info("재계산 완료", extra={"user_id": user_id, "stages": sorted(stages), "version": version})
+    else:
+        version = (state or {}).get("version", store.get("input_version", 0))
+
+    await recompute_state_collection.update_one(
+        {"_id": user_id},
+        {"$set": {"hashes": hashes, "version": version, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+    return sorted(stages)
+
+
+def _own_version_bump(change: dict) -> bool:
+    """recompute_user가 입력 버전만 올린 storeInfo 변경 (워커 자신이 만든 이벤트)"""
+    if change["ns"]["coll"] != "storeInfo" or change.get("operationType") != "update":
+        return False
+    description = change.get("updateDescription") or {}
+    return (set(description.get("updatedFields") or {}) == {"input_version"}
+            and not description.get("removedFields"))
+
+
+def _user_of(collection: str, doc_id, doc: dict):
+    if doc and doc.get("user_id"):
+        return doc["user_id"]
+    if collection == "storeSales" and isinstance(doc_id, str):
+        # 버킷 _id = "<user>:<year>" (삭제 이벤트에는 문서가 없음)
+        return doc_id.rsplit(":", 1)[0]
+    return None
+
+
+class RecomputeWorker:
+    """
+    변경 이벤트를 매장별로 모아 두었다가(debounce) 한 번씩 처리.
+    resume token은 그보다 앞선 변경이 모두 처리된 뒤에만 저장.
+    """
+    def __init__(self, debounce: float = RECOMPUTE_DEBOUNCE, concurrency: int = RECOMPUTE_CONCURRENCY,
+                 poll_interval: float = RECOMPUTE_POLL_INTERVAL):
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.pending = {}       # user_id -> (처리 예정 시각, 가장 오래된 미처리 이벤트 번호)
+        self.running = {}       # user_id -> 처리 중인 이벤트 번호
+        self.dirty = {}         # 처리 중에 다시 바뀐 매장 -> 이벤트 번호
+        self.tokens = deque()   # (이벤트 번호, resume token)
+        self.seq = 0
+        self.safe_token = None
+        # 저장 위치 (변경 스트림이면 resume token, 폴링이면 컬렉션별 기준 시각)
+        self.checkpoint = (STREAM_STATE_ID, "token")
+        self.wakeup = asyncio.Event()
+
+    # ---------------------------------------------------------------
+    # 이벤트 수집
+    # ---------------------------------------------------------------
+    def notify(self, user_id: str, token=None):
+        self.seq += 1
+        if token is not None:
+            self.tokens.append((self.seq, token))
+        if user_id is None:
+            return
+        if user_id in self.running:
+            self.dirty.setdefault(user_id, self.seq)
+        elif user_id not in self.pending:
+            self.pending[user_id] = (time.monotonic() + self.debounce, self.seq)
+            self.wakeup.set()
+
+    def _advance_token(self):
+        """아직 처리 안 된 이벤트보다 앞선 token 중 가장 최근 것"""
+        outstanding = [seq for _, seq in self.pending.values()]
+        outstanding += list(self.running.values()) + list(self.dirty.values())
+        low = min(outstanding) if outstanding else float("inf")
+        while self.tokens and self.tokens[0][0] < low:
+            self.safe_token = self.tokens.popleft()[1]
+
+    # ---------------------------------------------------------------
+    # 처리
+    # ---------------------------------------------------------------
+    async def _process(self, user_id: str, seq: int):
+        try:
+            async with self.semaphore:
+                await recompute_user(user_id)
+        except Exception:
+            logger.exception("재계산 실패", extra={"user_id": user_id})
+        finally:
+            del self.running[user_id]
+            again = self.dirty.pop(user_id, None)
+            if again is not None:
+                self.pending[user_id] = (time.monotonic() + self.debounce, again)
+                self.wakeup.set()
+
+    async def _dispatch(self):
+        tasks = set()
+        while True:
+            now = time.monotonic()
+            due = [user_id for user_id, (at, _) in self.pending.items() if at <= now]
+            for user_id in due:
+                _, seq = self.pending.pop(user_id)
+                self.running[user_id] = seq
+                task = asyncio.create_task(self._process(user_id, seq))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            self.wakeup.clear()
+            timeout = min((at for at, _ in self.pending.values()), default=now + self.debounce) - now
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=max(timeout, 0.05))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _save_tokens(self):
+        saved = None
+        while True:
+            await asyncio.sleep(TOKEN_SAVE_INTERVAL)
+            self._advance_token()
+            if self.safe_token is not None and self.safe_token is not saved:
+                state_id, field = self.checkpoint
+                await recompute_state_collection.update_one(
+                    {"_id": state_id},
+                    {"$set": {field: self.safe_token, "saved_at": datetime.utcnow()}},
+                    upsert=True
+                )
+                saved = self.safe_token
+
+    # ---------------------------------------------------------------
+    # 변경 소스: 변경 스트림 / 폴링
+    # ---------------------------------------------------------------
+    async def _watch(self):
+        from pymongo.errors import OperationFailure
+
+        state = await recompute_state_collection.find_one({"_id": STREAM_STATE_ID}) or {}
+        token = state.get("token")
+        pipeline = [
+            {"$match": {
+                "ns.coll": {"$in": WATCHED_COLLECTIONS},
+                "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+            }},
+            {"$project": {"ns": 1, "documentKey": 1, "operationType": 1, "updateDescription": 1,
+                          "fullDocument.user_id": 1}},
+        ]
+        while True:
+            try:
+                async with init_db().watch(pipeline, full_document="updateLookup", resume_after=token) as stream:
+                    logger.info("변경 스트림 구독 시작", extra={"resumed": token is not None})
+                    async for change in stream:
+                        if _own_version_bump(change):
+                            # token만 기록 (다시 계산할 필요 없음)
+                            self.notify(None, change["_id"])
+                            continue
+                        collection = change["ns"]["coll"]
+                        user_id = _user_of(collection, change["documentKey"].get("_id"), change.get("fullDocument"))
+                        self.notify(user_id, change["_id"])
+            except OperationFailure as e:
+                if token is None or e.code not in RESUME_FAILURE_CODES:
+                    raise
+                # resume token이 oplog 범위를 벗어남 → 지금부터 다시 받고, 놓친 구간은 updated_at으로 훑음
+                logger.warning("resume token 만료, updated_at 기준으로 다시 확인", extra={"saved_at": state.get("saved_at")})
+                token = None
+                await self._catch_up(state.get("saved_at"))
+
+    async def _catch_up(self, since):
+        if since is None:
+            return
+        query = {"updated_at": {"$gte": since - CATCH_UP_MARGIN}}
+        for collection in (store_collection, sales_collection):
+            async for doc in collection.find(query, {"_id": 0, "user_id": 1}):
+                self.notify(doc.get("user_id"))
+
+    async def _poll(self):
+        state = await recompute_state_collection.find_one({"_id": POLL_STATE_ID}) or {}
+        watermarks = state.get("watermarks") or {}
+        collections = {"storeInfo": store_collection, "storeSales": sales_collection}
+        for name, collection in collections.items():
+            await collection.create_index("updated_at")
+            if name not in watermarks:
+                # 처음 폴링할 때는 지금 시점부터 (기존 매장 전체를 다시 계산하지 않음)
+                latest = await collection.find_one({}, {"_id": 0, "updated_at": 1}, sort=[("updated_at", -1)])
+                watermarks[name] = (latest or {}).get("updated_at") or datetime.min
+
+        logger.info("변경 스트림을 쓸 수 없어 폴링으로 감시", extra={"interval": self.poll_interval})
+        self.checkpoint = (POLL_STATE_ID, "watermarks")
+        while True:
+            for name, collection in collections.items():
+                cursor = collection.find(
+                    {"updated_at": {"$gt": watermarks[name]}}, {"_id": 0, "user_id": 1, "updated_at": 1}
+                ).sort("updated_at", 1).limit(POLL_BATCH_SIZE)
+                async for doc in cursor:
+                    watermarks[name] = doc["updated_at"]
+                    # 폴링 기준 시각도 resume token처럼 앞선 변경이 처리된 뒤에 저장
+                    self.notify(doc.get("user_id"), dict(watermarks))
+            await asyncio.sleep(self.poll_interval)
+
+    async def _source(self):
+        from pymongo.errors import OperationFailure
+
+        try:
+            await self._watch()
+        except (OperationFailure, NotImplementedError) as e:
+            # 40573: 레플리카 셋이 아닌 단일 인스턴스 (변경 스트림 미지원)
+            if isinstance(e, OperationFailure) and e.code != 40573:
+                raise
+            await self._poll()
+
+    async def run(self):
+        tasks = [
+            asyncio.create_task(self._dispatch()),
+            asyncio.create_task(self._save_tokens()),
+            asyncio.create_task(self._source()),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+if __name__ == "__main__":
+    from core.logger import setup_logging
+    import api.solution  # noqa: F401 - population 데이터셋 등록
+
+    setup_logging()
+    init_db()
+    asyncio.run(RecomputeWorker().run())
@@ -0,0 +1,234 @@
+import codecs
+import csv
+import re
+from collections import deque
+from datetime import date, datetime
+from fastapi import HTTPException, UploadFile
+
+# =================================================================
+# 매출 업로드 파일(CSV/XLSX) 스트리밍 파서
+# - 업로드를 청크 단위로 읽으면서 디코딩 → 행 단위로 흘려보냄
+# - 일별 데이터는 읽는 즉시 년월(YYYY-MM) 단위로 합산 (메모리 사용량은 개월 수에만 비례)
+# =================================================================
+
+# 헤더 후보 (POS 업체마다 컬럼명이 조금씩 다름)
+YM_HEADERS = ["년월", "일자", "날짜", "매출일자"]
+REVENUE_HEADERS = ["매출", "매출액"]
+PROFIT_HEADERS = ["순수익", "순이익"]
+
+# 헤더가 나오기 전 제목/설명 행을 몇 줄까지 건너뛸지
+MAX_HEADER_SCAN_ROWS = 20
+# 한 레코드(따옴표 안 줄바꿈 포함)의 최대 글자 수. 줄바꿈이 없는 파일을 통째로 버퍼링하지 않도록 제한
+MAX_CSV_RECORD_CHARS = 64 * 1024
+# 줄바꿈: CRLF / CR (구형 Mac, 일부 POS 내보내기) / LF
+NEWLINE_PATTERN = re.compile(r"\r\n|\r|\n")
+
+YM_PATTERN = re.compile(r"^(\d{4})\s*[-./년]?\s*(\d{1,2})(?:\s*[-./월]?\s*(\d{1,2}))?")
+
+
+class _LineQueue:
+    """csv.reader에 완성된 레코드만 하나씩 넘겨주는 반복자"""
+    def __init__(self):
+        self.records = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.records.popleft()
+
+
+def normalize_ym(value):
+    """
+    '2025-07', '202507', '2025.07', '2025-07-15', '20250715', datetime 등을 'YYYY-MM'으로 변환.
+    일 단위 값이면 (ym, True) 를 반환합니다.
+    """
+    if value is None:
+        return None, False
+    if isinstance(value, (datetime, date)):
+        # 엑셀 월별 데이터는 보통 매월 1일 날짜로 들어옴
+        return f"{value.year:04d}-{value.month:02d}", value.day != 1
+
+    text = str(value).strip()
+    if text.isdigit() and len(text) in (6, 8):
+        year, month, day = text[:4], text[4:6], text[6:8] or None
+    else:
+        match = YM_PATTERN.match(text)
+        if not match:
+            return None, False
+        year, month, day = match.groups()
+
+    month = int(month)
+    if not 1 <= month <= 12:
+        return None, False
+    return f"{year}-{month:02d}", day is not None
+
+
+def parse_amount(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)):
+        return int(round(value))
+    text = str(value).strip().replace(",", "")
+    if not text:
+        return 0
+    return int(float(text))
+
+
+class SalesAggregator:
+    """행을 받아서 년월 단위로 매출/순수익을 누적합니다."""
+    def __init__(self):
+        self.columns = None
+        self.months = {}
+        self.rows = 0
+        self.daily = False
+        self.scanned = 0
+
+    def _find_columns(self, row):
+        cells = [str(c).strip() if c is not None else "" for c in row]
+
+        def index_of(candidates):
+            for name in candidates:
+                if name in cells:
+                    return cells.index(name)
+            return None
+
+        ym_idx = index_of(YM_HEADERS)
+        revenue_idx = index_of(REVENUE_HEADERS)
+        if ym_idx is None or revenue_idx is None:
+            return None
+        return ym_idx, revenue_idx, index_of(PROFIT_HEADERS)
+
+    def add_row(self, row):
+        if self.columns is None:
+            self.scanned += 1
+            self.columns = self._find_columns(row)
+            if self.columns is None and self.scanned >= MAX_HEADER_SCAN_ROWS:
+                raise HTTPException(status_code=400, detail="'년월(또는 일자)'과 '매출' 컬럼을 찾을 수 없습니다.")
+            return
+
+        ym_idx, revenue_idx, profit_idx = self.columns
+        if len(row) <= max(ym_idx, revenue_idx):
+            return
+
+        ym, is_daily = normalize_ym(row[ym_idx])
+        if ym is None:
+            return
+        try:
+            revenue = parse_amount(row[revenue_idx])
+            profit = parse_amount(row[profit_idx]) if profit_idx is not None and profit_idx < len(row) else 0
+        except ValueError:
+            return
+
+        totals = self.months.get(ym)
+        if totals is None:
+            self.months[ym] = [revenue, profit]
+        else:
+            totals[0] += revenue
+            totals[1] += profit
+        self.rows += 1
+        self.daily = self.daily or is_daily
+
+    def result(self) -> list:
+        return [
+            {"ym": ym, "revenue": totals[0], "profit": totals[1], "details": None}
+            for ym, totals in sorted(self.months.items())
+        ]
+
+
+# =================================================================
+# CSV: 청크 단위 읽기 + 점진적 문자셋 판별 (UTF-8 → CP949)
+# =================================================================
+async def iter_csv_rows(file: UploadFile, max_bytes: int, chunk_size: int):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    encoding = "utf-8"
+    only_ascii_so_far = True
+    total = 0
+
+    queue = _LineQueue()
+    reader = csv.reader(queue)
+    pending = ""
+    record = ""
+    in_quotes = False
+
+    while True:
+        chunk = await file.read(chunk_size)
+        final = not chunk
+        total += len(chunk)
+        if total > max_bytes:
+            raise HTTPException(status_code=413, detail=f"업로드 파일이 너무 큽니다. (최대 {max_bytes // (1024 * 1024)}MB)")
+
+        # UTF-8 디코더가 아직 내보내지 않은 바이트 (청크 끝에서 잘린 멀티바이트 문자)
+        buffered_tail = decoder.getstate()[0] if encoding == "utf-8" else b""
+        try:
+            text = decoder.decode(chunk, final=final)
+        except UnicodeDecodeError:
+            # 지금까지 디코딩된 글자가 ASCII뿐이면 남은 바이트를 CP949(EUC-KR 상위호환)로 다시 해석해도 안전
+            if encoding != "utf-8" or not only_ascii_so_far:
+                raise HTTPException(status_code=400, detail="파일 인코딩을 판별할 수 없습니다. (UTF-8 또는 EUC-KR)")
+            encoding = "cp949"
+            decoder = codecs.getincrementaldecoder("cp949")()
+            try:
+                text = decoder.decode(buffered_tail + chunk, final=final)
+            except UnicodeDecodeError:
+                raise HTTPException(status_code=400, detail="파일 인코딩을 판별할 수 없습니다. (UTF-8 또는 EUC-KR)")
+        only_ascii_so_far = only_ascii_so_far and text.isascii()
+
+        pending += text
+        # 청크가 CR로 끝나면 다음 청크의 LF와 한 줄바꿈(CRLF)일 수 있으므로 남겨둠
+        held = "\r" if not final and pending.endswith("\r") else ""
+        lines = NEWLINE_PATTERN.split(pending[:len(pending) - len(held)])
+        pending = "" if final else lines.pop() + held
+        if len(pending) + len(record) > MAX_CSV_RECORD_CHARS:
+            raise HTTPException(status_code=400, detail="CSV 한 줄이 너무 깁니다. 줄바꿈이 있는 CSV 파일인지 확인해주세요.")
+
+        for line in lines:
+            # 따옴표 안의 줄바꿈은 한 레코드로 묶음
+            record += line + "\n"
+            if len(record) > MAX_CSV_RECORD_CHARS:
+                raise HTTPException(status_code=400, detail="CSV 한 줄이 너무 깁니다. 줄바꿈이 있는 CSV 파일인지 확인해주세요.")
+            if line.count('"') % 2 == 1:
+                in_quotes = not in_quotes
+            if in_quotes:
+                continue
+            if record.strip():
+                queue.records.append(record)
+                yield next(reader)
+            record = ""
+
+        if final:
+            break
+
+
+# =================================================================
+# XLSX: openpyxl read-only 모드로 시트를 행 단위 스트리밍 (스레드에서 실행)
+# =================================================================
+def iter_xlsx_rows(fileobj):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise HTTPException(status_code=500, detail="XLSX 처리를 위한 openpyxl이 설치되어 있지 않습니다.")
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+
+def upload_size(file: UploadFile) -> int:
+    if file.size is not None:
+        return file.size
+    current = file.file.tell()
+    file.file.seek(0, 2)
+    size = file.file.tell()
+    file.file.seek(current)
+    return size
+
+
+def aggregate_xlsx(fileobj) -> SalesAggregator:
+    aggregator = SalesAggregator()
+    for row in iter_xlsx_rows(fileobj):
+        aggregator.add_row(row)
+    return aggregator
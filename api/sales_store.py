@@ -0,0 +1,217 @@
+# 매장 월별 매출 저장소 (storeSales)
+# - storeInfo 안의 sales_logs 배열 대신 (매장, 연도) 버킷 문서에 월별로 저장
+#     {_id: "<user>:<year>", user_id, year: "2025", months: {"01": {ym, revenue, profit, details}, ...}, updated_at}
+#   → 매장 문서는 크기가 일정하고, 월 하나 수정은 $set months.MM 한 번
+# - 조회: 최근 N개월 / 기간(start_ym ~ end_ym), 여러 매장 한 번에, NumPy 배열 형태
+# - 예전 문서(storeInfo.sales_logs)는 처음 읽을 때 버킷으로 옮김 (python -m api.sales_store 로 일괄 이전 가능)
+import asyncio
+from datetime import datetime
+
+from core.config import sales_collection, store_collection
+from core.logger import get_logger
+from api.sales_parser import normalize_ym
+
+logger = get_logger("sales_store")
+
+_sales_index_ready = False
+
+
+async def _ensure_sales_index():
+    global _sales_index_ready
+    if _sales_index_ready:
+        return
+    try:
+        await sales_collection.create_index([("user_id", 1), ("year", -1)])
+        _sales_index_ready = True
+    except Exception as e:
+        logger.error(f"storeSales 인덱스 생성 실패: {str(e)}")
+
+
+def _normalized(logs: list) -> dict:
+    """ym 정규화 + 같은 달은 마지막 값 → {ym: log}"""
+    result = {}
+    for log in logs:
+        ym, _ = normalize_ym(log.get("ym"))
+        if ym is None:
+            continue
+        result[ym] = {**log, "ym": ym}
+    return result
+
+
+def _by_year(logs: dict) -> dict:
+    years = {}
+    for ym, log in logs.items():
+        years.setdefault(ym[:4], {})[ym[5:7]] = log
+    return years
+
+
+def _bucket_logs(bucket: dict) -> list:
+    months = bucket.get("months") or {}
+    return [months[m] for m in sorted(months)]
+
+
+def _trim(logs: list, last_n: int = None, start_ym: str = None, end_ym: str = None) -> list:
+    if start_ym:
+        logs = [log for log in logs if log["ym"] >= start_ym]
+    if end_ym:
+        logs = [log for log in logs if log["ym"] <= end_ym]
+    if last_n is not None:
+        logs = logs[-last_n:] if last_n > 0 else []
+    return logs
+
+
+# =================================================================
+# 저장
+# =================================================================
+async def save_sales_logs(user_id: str, logs: list, replace: bool = False) -> dict:
+    """
+    월별 매출 저장. replace=True면 전체 교체(매장 정보 제출), 아니면 해당 월만 추가/수정(PATCH).
+    반환: {"updated": [기존에 있던 ym], "inserted": [새로 생긴 ym]}
+    """
+    await _ensure_sales_index()
+    logs = _normalized(logs)
+    years = _by_year(logs)
+    now = datetime.utcnow()
+
+    existing = set()
+    if not replace:
+        # 예전 문서에 남은 이력을 먼저 옮겨야 일부 월만 저장해도 나머지가 사라지지 않음
+        await _migrate_legacy([user_id])
+    if not replace and years:
+        async for bucket in sales_collection.find(
+            {"_id": {"$in": [f"{user_id}:{year}" for year in years]}}, {"year": 1, "months": 1}
+        ):
+            existing.update(f"{bucket['year']}-{month}" for month in bucket.get("months") or {})
+
+    # 버킷은 매장당 연도 수만큼(보통 1~3개)이라 연도별 update 한 번씩
+    for year, months in years.items():
+        if replace:
+            update = {"$set": {"user_id": user_id, "year": year, "months": months, "updated_at": now}}
+        else:
+            update = {"$set": {
+                "user_id": user_id, "year": year, "updated_at": now,
+                **{f"months.{month}": log for month, log in months.items()}
+            }}
+        await sales_collection.update_one({"_id": f"{user_id}:{year}"}, update, upsert=True)
+    if replace:
+        # 새 입력에 없는 연도 버킷은 삭제
+        await sales_collection.delete_many({"user_id": user_id, "year": {"$nin": list(years)}})
+
+    return {
+        "updated": sorted(ym for ym in logs if ym in existing),
+        "inserted": sorted(ym for ym in logs if ym not in existing),
+    }
+
+
+async def _migrate_legacy(user_ids: list) -> dict:
+    """storeInfo.sales_logs가 남아 있는 예전 매장을 버킷으로 옮기고 배열은 삭제. {user_id: logs}"""
+    migrated = {}
+    cursor = store_collection.find(
+        {"user_id": {"$in": user_ids}, "sales_logs": {"$exists": True}},
+        {"_id": 0, "user_id": 1, "sales_logs": 1}
+    )
+    async for store in cursor:
+        legacy = store.get("sales_logs") or []
+        await save_sales_logs(store["user_id"], legacy, replace=True)
+        await store_collection.update_one({"user_id": store["user_id"]}, {"$unset": {"sales_logs": ""}})
+        logs = _normalized(legacy)
+        migrated[store["user_id"]] = [logs[ym] for ym in sorted(logs)]
+    if migrated:
+        logger.info("매출 이력 버킷 이전", extra={"stores": len(migrated)})
+    return migrated
+
+
+# =================================================================
+# 조회
+# =================================================================
+async def load_sales_logs(user_id: str, last_n: int = None, start_ym: str = None, end_ym: str = None) -> list:
+    """ym 오름차순 월별 매출 dict 리스트 (최근 last_n개월 / start_ym ~ end_ym)"""
+    query = {"user_id": user_id}
+    year_range = {}
+    if start_ym:
+        year_range["$gte"] = start_ym[:4]
+    if end_ym:
+        year_range["$lte"] = end_ym[:4]
+    if year_range:
+        query["year"] = year_range
+
+    # 최근 연도부터 읽고, 필요한 개월 수가 모이면 중단
+    buckets = []
+    found = 0
+    async for bucket in sales_collection.find(query, {"_id": 0, "months": 1}).sort("year", -1):
+        buckets.append(bucket)
+        found += len(_trim(_bucket_logs(bucket), None, start_ym, end_ym))
+        if last_n is not None and found >= last_n:
+            break
+
+    if not buckets:
+        legacy = (await _migrate_legacy([user_id])).get(user_id)
+        return _trim(legacy or [], last_n, start_ym, end_ym)
+
+    logs = [log for bucket in reversed(buckets) for log in _bucket_logs(bucket)]
+    return _trim(logs, last_n, start_ym, end_ym)
+
+
+async def load_sales_logs_many(user_ids: list, last_n: int = None) -> dict:
+    """여러 매장을 한 번에 (배치 작업용). {user_id: logs}"""
+    result = {user_id: [] for user_id in user_ids}
+    buckets = {}
+    async for bucket in sales_collection.find({"user_id": {"$in": list(user_ids)}}, {"_id": 0, "user_id": 1, "year": 1, "months": 1}):
+        buckets.setdefault(bucket["user_id"], []).append(bucket)
+    for user_id, user_buckets in buckets.items():
+        user_buckets.sort(key=lambda b: b["year"])
+        result[user_id] = _trim([log for b in user_buckets for log in _bucket_logs(b)], last_n)
+
+    missing = [user_id for user_id in user_ids if user_id not in buckets]
+    if missing:
+        for user_id, logs in (await _migrate_legacy(missing)).items():
+            result[user_id] = _trim(logs, last_n)
+    return result
+
+
+def ym_index(ym: str) -> int:
+    return int(ym[:4]) * 12 + int(ym[5:7]) - 1
+
+
+def sales_arrays(logs: list) -> dict:
+    """월별 매출 → NumPy 배열 {ym_index(연*12+월-1), revenue, profit} (ym 오름차순)"""
+    import numpy as np
+
+    logs = [log for log in logs if log.get("revenue") is not None]
+    return {
+        "ym_index": np.fromiter((ym_index(log["ym"]) for log in logs), dtype=np.int32, count=len(logs)),
+        "revenue": np.fromiter((int(log["revenue"]) for log in logs), dtype=np.int64, count=len(logs)),
+        "profit": np.fromiter((int(log.get("profit") or 0) for log in logs), dtype=np.int64, count=len(logs)),
+    }
+
+
+async def load_sales_arrays(user_id: str, last_n: int = None, start_ym: str = None, end_ym: str = None) -> dict:
+    return sales_arrays(await load_sales_logs(user_id, last_n, start_ym, end_ym))
+
+
+async def load_sales_arrays_many(user_ids: list, last_n: int = None) -> dict:
+    return {user_id: sales_arrays(logs) for user_id, logs in (await load_sales_logs_many(user_ids, last_n)).items()}
+
+
+# =================================================================
+# 일괄 이전: storeInfo.sales_logs → storeSales (python -m api.sales_store)
+# =================================================================
+async def migrate_all(batch_size: int = 500) -> int:
+    total = 0
+    while True:
+        cursor = store_collection.find(
+            {"sales_logs": {"$exists": True}, "user_id": {"$ne": None}}, {"_id": 0, "user_id": 1}
+        ).limit(batch_size)
+        user_ids = [store["user_id"] async for store in cursor]
+        if not user_ids:
+            return total
+        total += len(await _migrate_legacy(user_ids))
+
+
+if __name__ == "__main__":
+    from core.config import init_db
+    from core.logger import setup_logging
+
+    setup_logging()
+    init_db()
+    asyncio.run(migrate_all())
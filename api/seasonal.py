@@ -0,0 +1,204 @@
+# 월 단위 계절성 업종 기준 매출 (상권 추정매출 분기 자료 → 월별 기준값 + 신뢰 구간)
+# - 업종(서울 전체)마다 로그 매출 = 수준 + 추세 + 분기 계절 지수 를 가중 최소제곱으로 적합
+# - 행정동 x 업종은 업종의 계절 지수/추세를 기준으로 두고, 그 동의 편차만 릿지로 줄여서 적합
+#   (자료가 적은 동은 업종 모양을 따르고, 자료가 쌓이면 동 고유 계절성이 드러남)
+# - 월 값: 분기 중심 월(2/5/8/11월)에 실제 분기 값을 두고 그 사이는 로그 선형 보간,
+#   첫/마지막 분기 밖은 마지막 실제 값에서 추세 + 월별 계절 지수(분기 지수를 순환 보간) 변화만큼 외삽
+# - 신뢰 구간: 적합 잔차 표준편차 x sqrt(1 + 외삽 개월 수 / 3)
+# - 모든 값은 데이터셋을 만들 때 (계열 x 월) 배열로 미리 계산 → 요청마다 조회만
+import math
+
+from api.sales_store import ym_index
+
+# 마지막 분기 뒤로 미리 계산해 두는 개월 수 (그 뒤는 마지막 달 값을 씀)
+EXTRAPOLATE_MONTHS = 18
+# 동 계절 지수/추세 편차를 업종 쪽으로 당기는 강도 (분기 관측 수 단위)
+SEASONAL_SHRINK = 4.0
+TREND_SHRINK = 4.0
+# 업종 적합에 거는 약한 릿지 (분기 자료가 1년 미만이어도 풀리도록)
+BASE_RIDGE = 0.25
+# 잔차를 추정할 수 없을 때(관측 3개 미만) 쓰는 로그 표준편차, 하한
+DEFAULT_SIGMA = 0.15
+MIN_SIGMA = 0.02
+# 80% 구간
+BAND_Z = 1.2816
+
+
+def _quarter_number(code: str) -> int:
+    return int(code[:4]) * 4 + int(code[4:]) - 1
+
+
+def _season_design():
+    """분기 계절 지수 (합 0) 코딩: 1~3분기는 단위 벡터, 4분기는 -1"""
+    import numpy as np
+
+    return np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1], [-1, -1, -1]], dtype=np.float64)
+
+
+def _month_season_weights():
+    """월(0~11) x 분기 계절 지수 가중치: 분기 중심 월(1, 4, 7, 10) 사이를 순환 선형 보간"""
+    import numpy as np
+
+    weights = np.zeros((12, 4))
+    for month in range(12):
+        position = (month - 1) / 3
+        j = math.floor(position)
+        frac = position - j
+        weights[month, j % 4] += 1 - frac
+        weights[month, (j + 1) % 4] += frac
+    return weights
+
+
+def _fit(values, mask, quarter_of_year, t, base_season, base_slope, season_ridge, slope_ridge):
+    """
+    계열별 가중 최소제곱 (계열 x 분기 행렬 한 번에).
+    log 값 - (기준 계절 + 기준 추세 x t) = a + b t + 계절 편차 → (계절 지수[4], 기울기, 잔차 표준편차, 관측 수)
+    """
+    import numpy as np
+
+    design_s = _season_design()[quarter_of_year]                      # (K, 3)
+    X = np.concatenate([np.ones((len(t), 1)), t[:, None], design_s], axis=1)  # (K, 5)
+    target = values - base_season[:, quarter_of_year] - base_slope[:, None] * t[None, :]
+    target = target * mask
+
+    A = np.einsum("rk,ki,kj->rij", mask, X, X)
+    A += np.diag([1e-6, slope_ridge, season_ridge, season_ridge, season_ridge])[None, :, :]
+    rhs = np.einsum("rk,ki->ri", target, X)
+    params = np.linalg.solve(A, rhs[..., None])[..., 0]                # (R, 5)
+
+    residual = (target - params @ X.T) * mask
+    n = mask.sum(axis=1)
+    sigma = np.sqrt((residual ** 2).sum(axis=1) / np.maximum(n - 2, 1))
+    sigma = np.where(n >= 3, sigma, np.nan)
+
+    season = base_season + params[:, 2:] @ _season_design().T          # (R, 4)
+    slope = base_slope + params[:, 1]
+    return season, slope, sigma, n
+
+
+def _monthly_grid(values, mask, season, slope_month, start_moy: int, months: int):
+    """
+    (계열 x 월) 로그 기준값. 관측 분기 중심 사이는 보간, 밖은 추세 + 계절 변화로 외삽.
+    반환: (log 값, 첫 관측 중심 월, 마지막 관측 중심 월)
+    """
+    import numpy as np
+
+    rows, quarters = values.shape
+    grid = np.arange(months, dtype=np.float64)
+    month_season = season @ _month_season_weights().T                  # (R, 12)
+    season_at = month_season[:, (start_moy + np.arange(months)) % 12]  # (R, G)
+    centers = 3 * np.arange(quarters) + 1
+
+    result = np.zeros((rows, months), dtype=np.float32)
+    first = np.zeros(rows, dtype=np.int32)
+    last = np.zeros(rows, dtype=np.int32)
+    for r in range(rows):
+        observed = mask[r] > 0
+        cs = centers[observed]
+        ys = values[r, observed]
+        first[r], last[r] = cs[0], cs[-1]
+        line = np.interp(grid, cs, ys)
+        after = grid > cs[-1]
+        line[after] = ys[-1] + slope_month[r] * (grid[after] - cs[-1]) + season_at[r, after] - season_at[r, cs[-1]]
+        before = grid < cs[0]
+        line[before] = ys[0] + slope_month[r] * (grid[before] - cs[0]) + season_at[r, before] - season_at[r, cs[0]]
+        result[r] = line
+    return result, first, last
+
+
+def build_monthly_benchmarks(avg_all: dict, avg_dong: dict) -> dict:
+    """
+    build_market_index의 분기 평균 → 월 단위 기준값 배열. (동기 함수 - 레지스트리가 스레드에서 실행)
+    반환: {"start": 첫 달 ym_index, "months": 개월 수, "sector": 블록, "dong": 블록}
+      블록 = {"rows": {키: 행}, "log": (행 x 월) float32, "sigma", "first", "last"}
+    """
+    import numpy as np
+
+    quarters = sorted({quarter for _, quarter in avg_all} | {quarter for _, _, quarter in avg_dong})
+    q0 = _quarter_number(quarters[0])
+    K = _quarter_number(quarters[-1]) - q0 + 1
+    months = 3 * K + EXTRAPOLATE_MONTHS
+    start_moy = (q0 % 4) * 3
+    quarter_of_year = (q0 + np.arange(K)) % 4
+    # 추세 기준 시점은 가운데 분기, 단위는 년
+    t = (np.arange(K) - (K - 1) / 2) / 4
+
+    def matrix(series: dict, key_of):
+        rows = {}
+        for key in series:
+            rows.setdefault(key_of(key), len(rows))
+        values = np.zeros((len(rows), K))
+        mask = np.zeros((len(rows), K))
+        for key, value in series.items():
+            if value and value > 0:
+                r, k = rows[key_of(key)], _quarter_number(key[-1]) - q0
+                values[r, k] = math.log(value)
+                mask[r, k] = 1.0
+        # 매출이 한 번도 없는 계열은 제외 (rows는 행 번호 순으로 들어 있음)
+        keep = mask.sum(axis=1) > 0
+        kept = [key for key, r in rows.items() if keep[r]]
+        return {key: i for i, key in enumerate(kept)}, values[keep], mask[keep]
+
+    def block(rows, values, mask, season, slope, sigma, fallback_sigma):
+        sigma = np.where(np.isnan(sigma), fallback_sigma, sigma)
+        log, first, last = _monthly_grid(values, mask, season, slope / 12, start_moy, months)
+        return {
+            "rows": rows,
+            "log": log,
+            "sigma": np.maximum(sigma, MIN_SIGMA).astype(np.float32),
+            "first": first,
+            "last": last,
+        }
+
+    # 1. 업종 (서울 전체)
+    sector_rows, s_values, s_mask = matrix(avg_all, lambda key: str(key[0]))
+    zeros4 = np.zeros((len(sector_rows), 4))
+    s_season, s_slope, s_sigma, _ = _fit(s_values, s_mask, quarter_of_year, t, zeros4,
+                                         np.zeros(len(sector_rows)), BASE_RIDGE, BASE_RIDGE)
+    s_sigma = np.where(np.isnan(s_sigma), DEFAULT_SIGMA, s_sigma)
+    sectors = block(sector_rows, s_values, s_mask, s_season, s_slope, s_sigma, DEFAULT_SIGMA)
+
+    # 2. 행정동 x 업종 (업종 계절성/추세 기준, 편차만 줄여서 적합)
+    dong_rows, d_values, d_mask = matrix(avg_dong, lambda key: (str(key[0]), str(key[1])))
+    parent = np.array([sector_rows.get(sector, -1) for sector, _ in dong_rows], dtype=np.int64)
+    has_parent = parent >= 0
+    base_season = np.where(has_parent[:, None], s_season[parent], 0.0)
+    base_slope = np.where(has_parent, s_slope[parent], 0.0)
+    d_season, d_slope, d_sigma, _ = _fit(d_values, d_mask, quarter_of_year, t, base_season, base_slope,
+                                         SEASONAL_SHRINK, TREND_SHRINK)
+    fallback = np.where(has_parent, s_sigma[parent], DEFAULT_SIGMA)
+    dongs = block(dong_rows, d_values, d_mask, d_season, d_slope, d_sigma, fallback)
+
+    return {"start": q0 * 3, "months": months, "sector": sectors, "dong": dongs}
+
+
+def monthly_benchmark(monthly: dict, sector_code: str, admin_code: str, ym: str):
+    """
+    (업종[, 행정동], 년월) 기준 매출 → {"value", "lower", "upper", "source"} (계열이 없으면 None)
+    source: interpolated(분기 자료 구간 안) / extrapolated(구간 밖, 추세+계절 외삽) / clamped(미리 계산한 범위 밖)
+    """
+    if admin_code is None:
+        block, key = monthly["sector"], str(sector_code)
+    else:
+        block, key = monthly["dong"], (str(sector_code), str(admin_code))
+    row = block["rows"].get(key)
+    if row is None:
+        return None
+
+    col = ym_index(ym) - monthly["start"]
+    source = None
+    if col < 0 or col >= monthly["months"]:
+        source = "clamped"
+        col = min(max(col, 0), monthly["months"] - 1)
+    first, last = int(block["first"][row]), int(block["last"][row])
+    outside = max(col - last, first - col, 0)
+    source = source or ("extrapolated" if outside else "interpolated")
+
+    mid = float(block["log"][row, col])
+    half = BAND_Z * float(block["sigma"][row]) * math.sqrt(1 + outside / 3)
+    return {
+        "value": int(math.exp(mid)),
+        "lower": int(math.exp(mid - half)),
+        "upper": int(math.exp(mid + half)),
+        "source": source,
+    }
@@ -0,0 +1,224 @@
+import math
+import os
+from fastapi import APIRouter, Depends, HTTPException
+from core.security import get_current_user
+from core.config import store_collection
+from core.logger import get_logger
+from core.metrics import timer, STAGE_SECONDS
+from api.sales_store import load_sales_logs
+from schemas.simulationInfo import SimulationRequest
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/api/analysis", tags=["analysis"])
+
+# =================================================================
+# 수익성 what-if 시뮬레이션
+# - 기준값: 최근 3개월 평균 매출/이익, 고정비 합계, 메뉴 평균 원가율, 배달 매출 비중
+# - 가격 변화(탄력성 반영 판매량) x 원가율 변화 x 회전율 변화 x 배달 비중을
+#   (P, C, T, D) 배열 브로드캐스트 한 번으로 계산 → 이익, 이익률, 손익분기 매출
+# - 항목별 민감도: 다른 항목을 기준값에 두고 해당 항목만 움직였을 때 이익 변동 폭 순위
+# =================================================================
+SIMULATION_BASE_MONTHS = 3
+SIMULATION_MAX_SCENARIOS = int(os.getenv("SIMULATION_MAX_SCENARIOS", "50000"))
+# 메뉴 원가율도 매출/이익으로도 추정할 수 없을 때 쓰는 원가율
+DEFAULT_COST_RATE = 0.35
+MAX_COST_RATE = 0.99
+MAX_DELIVERY_SHARE = 0.95
+
+AXES = ["price_change", "cost_rate_change", "turnover_change", "delivery_share"]
+
+SIMULATION_PROJECTION = {
+    "_id": 0,
+    "menus": 1,
+    "fixed_cost": 1,
+    "delivery": 1,
+    "scale": 1,
+}
+
+
+def simulation_baseline(store: dict, delivery_fee_rate: float) -> dict:
+    logs = [log for log in store.get("sales_logs") or [] if log.get("revenue") is not None]
+    revenue = sum(float(log["revenue"]) for log in logs) / len(logs) if logs else 0.0
+    profit = sum(float(log.get("profit") or 0) for log in logs) / len(logs) if logs else 0.0
+    fixed_cost = sum(float(v or 0) for v in (store.get("fixed_cost") or {}).values())
+
+    delivery = store.get("delivery") or {}
+    delivery_share = float(delivery.get("sales_ratio") or 0) / 100 if delivery.get("is_active") else 0.0
+    delivery_share = min(max(delivery_share, 0.0), MAX_DELIVERY_SHARE)
+
+    menus = store.get("menus") or {}
+    cost_rates = [
+        float(item["cost_rate"]) / 100
+        for item in (menus.get("main") or []) + (menus.get("general") or [])
+        if item.get("cost_rate") is not None
+    ]
+    if cost_rates:
+        cost_rate, cost_source = sum(cost_rates) / len(cost_rates), "menus"
+    elif revenue > 0 and profit:
+        # 이익 = 매출 x (1 - 원가율) - 배달 수수료 - 고정비 → 원가율 역산
+        cost_rate = 1 - (profit + fixed_cost + revenue * delivery_share * delivery_fee_rate) / revenue
+        cost_source = "sales_logs"
+    else:
+        cost_rate, cost_source = DEFAULT_COST_RATE, "default"
+    cost_rate = min(max(cost_rate, 0.0), MAX_COST_RATE)
+
+    scale = store.get("scale") or {}
+    return {
+        "revenue": revenue,
+        "profit": profit,
+        "fixed_cost": fixed_cost,
+        "cost_rate": cost_rate,
+        "cost_rate_source": cost_source,
+        "delivery_share": delivery_share,
+        "seats": scale.get("seats"),
+        "turnover": scale.get("turnover"),
+    }
+
+
+def simulate_grid(baseline: dict, request: SimulationRequest) -> dict:
+    """시나리오 격자 전체를 한 번에 계산 (배열 모양: price x cost_rate x turnover x delivery)"""
+    import numpy as np
+
+    price = np.asarray(request.price_change, dtype=np.float64)[:, None, None, None]
+    cost = np.asarray(request.cost_rate_change, dtype=np.float64)[None, :, None, None]
+    turnover = np.asarray(request.turnover_change, dtype=np.float64)[None, None, :, None]
+    delivery_values = request.delivery_share if request.delivery_share is not None else [baseline["delivery_share"]]
+    delivery = np.asarray(delivery_values, dtype=np.float64)[None, None, None, :]
+
+    base_dine_in = baseline["revenue"] * (1 - baseline["delivery_share"])
+    # 가격이 (1+p)배면 판매량은 (1+p)^탄력성 배
+    volume = (1 + price) ** request.price_elasticity
+    dine_in = base_dine_in * (1 + price) * volume * (1 + turnover)
+    if request.delivery_share is not None:
+        # 매장 매출은 그대로 두고 배달 매출이 목표 비중이 되도록 늘리거나 줄임
+        delivery_revenue = dine_in * delivery / (1 - delivery)
+    else:
+        delivery_revenue = baseline["revenue"] * baseline["delivery_share"] * (1 + price) * volume * np.ones_like(delivery)
+    revenue = dine_in + delivery_revenue
+
+    # 원가는 판매량에 비례 (가격만 오르면 원가율은 1/(1+p)배)
+    cost_rate = np.clip(baseline["cost_rate"] + cost / 100, 0.0, MAX_COST_RATE) / (1 + price)
+    contribution = revenue * (1 - cost_rate) - delivery_revenue * request.delivery_fee_rate
+    profit = contribution - baseline["fixed_cost"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margin = np.where(revenue > 0, profit / revenue, np.nan)
+        contribution_ratio = np.where(revenue > 0, contribution / revenue, np.nan)
+        break_even = np.where(contribution_ratio > 0, baseline["fixed_cost"] / contribution_ratio, np.nan)
+
+    return {
+        "axes": {
+            "price_change": request.price_change,
+            "cost_rate_change": request.cost_rate_change,
+            "turnover_change": request.turnover_change,
+            "delivery_share": delivery_values,
+        },
+        "revenue": np.broadcast_to(revenue, profit.shape),
+        "profit": profit,
+        "margin": np.broadcast_to(margin, profit.shape),
+        "break_even_revenue": np.broadcast_to(break_even, profit.shape),
+    }
+
+
+def _base_index(values: list, base: float) -> int:
+    return min(range(len(values)), key=lambda i: abs(values[i] - base))
+
+
+def sensitivity_ranking(grid: dict, baseline: dict) -> list:
+    """다른 항목은 기준값(변화 0 / 현재 배달 비중)에 두고 한 항목만 움직일 때의 이익 변동 폭"""
+    axes = grid["axes"]
+    base = [
+        _base_index(axes["price_change"], 0.0),
+        _base_index(axes["cost_rate_change"], 0.0),
+        _base_index(axes["turnover_change"], 0.0),
+        _base_index(axes["delivery_share"], baseline["delivery_share"]),
+    ]
+    ranking = []
+    for axis, name in enumerate(AXES):
+        if len(axes[name]) < 2:
+            continue
+        index = list(base)
+        index[axis] = slice(None)
+        line = grid["profit"][tuple(index)]
+        ranking.append({
+            "axis": name,
+            "profit_min": int(line.min()),
+            "profit_max": int(line.max()),
+            "swing": int(line.max() - line.min()),
+            "best_value": axes[name][int(line.argmax())],
+        })
+    return sorted(ranking, key=lambda item: item["swing"], reverse=True)
+
+
+def _finite_list(values, digits: int) -> list:
+    """NaN/inf는 None으로 (손익분기가 없는 시나리오 등)"""
+    import numpy as np
+
+    flat = np.round(np.asarray(values, dtype=np.float64).ravel(), digits).tolist()
+    if digits == 0:
+        return [int(v) if math.isfinite(v) else None for v in flat]
+    return [v if math.isfinite(v) else None for v in flat]
+
+
+@router.post("/simulate")
+async def simulate(request: SimulationRequest, current_user: str = Depends(get_current_user)):
+    import numpy as np
+
+    if any(p <= -1 for p in request.price_change):
+        raise HTTPException(status_code=400, detail="가격 변화율은 -1보다 커야 합니다.")
+    if any(t <= -1 for t in request.turnover_change):
+        raise HTTPException(status_code=400, detail="회전율 변화율은 -1보다 커야 합니다.")
+    if request.delivery_share is not None and any(not 0 <= d <= MAX_DELIVERY_SHARE for d in request.delivery_share):
+        raise HTTPException(status_code=400, detail=f"배달 비중은 0 ~ {MAX_DELIVERY_SHARE} 사이여야 합니다.")
+
+    scenarios = (len(request.price_change) * len(request.cost_rate_change)
+                 * len(request.turnover_change) * len(request.delivery_share or [0]))
+    if scenarios > SIMULATION_MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"시나리오는 최대 {SIMULATION_MAX_SCENARIOS}개까지 계산할 수 있습니다.")
+
+    store = await store_collection.find_one({"user_id": current_user}, SIMULATION_PROJECTION)
+    if not store:
+        raise HTTPException(status_code=404, detail="등록된 매장 정보가 없습니다.")
+    store["sales_logs"] = await load_sales_logs(current_user, last_n=SIMULATION_BASE_MONTHS)
+
+    baseline = simulation_baseline(store, request.delivery_fee_rate)
+    if baseline["revenue"] <= 0:
+        return {"hasData": False, "message": "시뮬레이션하려면 매출 데이터가 필요합니다.", "data": None}
+
+    with timer(STAGE_SECONDS, stage="simulate"):
+        grid = simulate_grid(baseline, request)
+        ranking = sensitivity_ranking(grid, baseline)
+
+        profit = grid["profit"]
+        top = np.argsort(profit, axis=None)[::-1][:request.top_n]
+        best = []
+        for flat_index in top.tolist():
+            index = np.unravel_index(flat_index, profit.shape)
+            scenario = {name: grid["axes"][name][i] for name, i in zip(AXES, index)}
+            scenario.update({
+                "revenue": int(grid["revenue"][index]),
+                "profit": int(profit[index]),
+                "margin": round(float(grid["margin"][index]), 4),
+            })
+            best.append(scenario)
+
+        data = {
+            "baseline": {
+                **baseline,
+                "revenue": int(baseline["revenue"]),
+                "profit": int(baseline["profit"]),
+                "fixed_cost": int(baseline["fixed_cost"]),
+                "cost_rate": round(baseline["cost_rate"], 4),
+            },
+            "scenarios": scenarios,
+            # 결과 배열은 axes 순서의 다차원 격자를 펼친 것 (index = ((p*C + c)*T + t)*D + d)
+            "shape": list(profit.shape),
+            "axes": grid["axes"],
+            "profit": _finite_list(profit, 0),
+            "margin": _finite_list(grid["margin"], 4),
+            "break_even_revenue": _finite_list(grid["break_even_revenue"], 0),
+            "sensitivity": ranking,
+            "best": best,
+        }
+    return {"hasData": True, "data": data}
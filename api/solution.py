@@ -1,13 +1,21 @@
-import os
-import pandas as pd
 import asyncio
-import requests
 import json
+import time
 from datetime import datetime
 from fastapi import APIRouter, Depends
 from core.config import store_collection, surrounding_collection, solution_collection, GEMINI_API_KEY
 from core.security import get_current_user 
 from schemas.solutionInfo import SolutionSchema
+from api.chat import invalidate_chat_model
+from core.logger import get_logger
+from core.metrics import timer, record_llm_tokens, STAGE_SECONDS, EXTERNAL_CALL_SECONDS
+from core.dataset_registry import registry
+from api.analysis import ym_to_quarter_code
+from api.footfall import build_footfall_distributions
+from api.sales_parser import normalize_ym
+from api.sales_store import load_sales_logs
+
+logger = get_logger(__name__)
 
 router = APIRouter(prefix="/api/solution", tags=["Solution"])
 
@@ -34,74 +42,162 @@ def extract_search_criteria(store_doc: dict):
         quarters_set = set()
         
         for log in sales_logs:
-            ym = log.get("ym")
-            if ym and len(str(ym)) == 6:
-                try:
-                    s_ym = str(ym)
-                    year = s_ym[:4]
-                    month = int(s_ym[4:])
-                    quarter = (month - 1) // 3 + 1
-                    quarters_set.add(f"{year}{quarter}")
-                except ValueError:
-                    continue 
-        return admin_code, sector_code, list(quarters_set)
+            # 'YYYY-MM' (저장 형식) / 'YYYYMM' (예전 데이터) 모두 허용
+            ym, _ = normalize_ym(log.get("ym"))
+            if ym:
+                quarters_set.add(ym_to_quarter_code(ym))
+        return admin_code, sector_code, sorted(quarters_set)
     except Exception:
         return None, None, []
 
 # =================================================================
-# [Helper] CSV 1: 유동인구/소득 -> JSON List 변환
+# [Helper] CSV 1: 유동인구/소득 (레지스트리에 상주, 타입 스키마로 메모리 절약)
 # =================================================================
-def get_population_data(file_path: str, admin_code: str, quarters_list: list):
-    if not os.path.exists(file_path): return []
+POPULATION_PATTERN = "서울상권_소득소비_유동인구*.csv"
+
+# 코드/이름은 category, 인구 수·소득은 uint32, 지출 금액은 int64 (조 단위 값이 있음)
+POPULATION_CATEGORY_COLUMNS = ["기준_년분기_코드", "행정동_코드", "행정동_코드_명"]
+POPULATION_NUMERIC_COLUMNS = {
+    "월_평균_소득_금액": "uint32",
+    "소득_구간_코드": "uint8",
+    "지출_총금액": "int64",
+    "식료품_지출_총금액": "int64",
+    "의류_신발_지출_총금액": "int64",
+    "생활용품_지출_총금액": "int64",
+    "의료비_지출_총금액": "int64",
+    "교통_지출_총금액": "int64",
+    "교육_지출_총금액": "int64",
+    "유흥_지출_총금액": "int64",
+    "여가_문화_지출_총금액": "int64",
+    "기타_지출_총금액": "int64",
+    "음식_지출_총금액": "int64",
+    "총_유동인구_수": "uint32",
+    "남성_유동인구_수": "uint32",
+    "여성_유동인구_수": "uint32",
+    "연령대_10_유동인구_수": "uint32",
+    "연령대_20_유동인구_수": "uint32",
+    "연령대_30_유동인구_수": "uint32",
+    "연령대_40_유동인구_수": "uint32",
+    "연령대_50_유동인구_수": "uint32",
+    "연령대_60_이상_유동인구_수": "uint32",
+    "시간대_00_06_유동인구_수": "uint32",
+    "시간대_06_11_유동인구_수": "uint32",
+    "시간대_11_14_유동인구_수": "uint32",
+    "시간대_14_17_유동인구_수": "uint32",
+    "시간대_17_21_유동인구_수": "uint32",
+    "시간대_21_24_유동인구_수": "uint32",
+    "월요일_유동인구_수": "uint32",
+    "화요일_유동인구_수": "uint32",
+    "수요일_유동인구_수": "uint32",
+    "목요일_유동인구_수": "uint32",
+    "금요일_유동인구_수": "uint32",
+    "토요일_유동인구_수": "uint32",
+    "일요일_유동인구_수": "uint32",
+}
+# 현재 파일의 38개 컬럼은 모두 쓰임 (프롬프트 CSV + 고객 구성 격차 분석) → 메모리 절약은 컬럼 제외가 아니라 타입 축소에서 나옴
+# 스키마 밖 컬럼은 읽지 않음 (새 분기 파일에 컬럼이 추가되어도 상주 메모리/프롬프트가 늘지 않도록)
+POPULATION_COLUMNS = POPULATION_CATEGORY_COLUMNS + list(POPULATION_NUMERIC_COLUMNS)
+
+
+def _read_csv(path: str, **kwargs):
+    import pandas as pd
     try:
-        try:
-            df = pd.read_csv(file_path, encoding='utf-8')
-        except UnicodeDecodeError:
-            df = pd.read_csv(file_path, encoding='cp949')
-        
-        cond_admin = df['행정동_코드'].astype(str) == str(admin_code)
-        cond_quarter = df['기준_년분기_코드'].astype(str).isin(quarters_list)
-        
-        filtered_df = df[cond_admin & cond_quarter]
-        if filtered_df.empty: return []
-            
-        return filtered_df.to_dict(orient='records')
+        return pd.read_csv(path, encoding='utf-8', **kwargs)
+    except UnicodeDecodeError:
+        return pd.read_csv(path, encoding='cp949', **kwargs)
+
+
+def build_population_frame(files: list):
+    """
+    유동인구/소득 CSV를 타입 스키마대로 읽어 (행정동, 분기) 순으로 정렬해 둡니다.
+    행정동별 행 구간(offsets)을 같이 만들어 조회 시 복사 없이 잘라 씁니다. (동기 함수 - 스레드에서 실행)
+    """
+    import numpy as np
+    import pandas as pd
+
+    frames = []
+    for path in files:
+        df = _read_csv(
+            path,
+            usecols=lambda col: col in POPULATION_COLUMNS,
+            dtype={col: "category" for col in POPULATION_CATEGORY_COLUMNS}
+        )
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    if len(frames) > 1:
+        df = df.drop_duplicates(["기준_년분기_코드", "행정동_코드"], keep="last")
+        # concat 하면서 category가 object로 풀릴 수 있어 다시 지정
+        df = df.astype({col: "category" for col in POPULATION_CATEGORY_COLUMNS})
+
+    # 결측값은 0으로 두고 스키마 타입으로 축소 (일부 금액 컬럼은 지수 표기라 float로 읽힘)
+    for col, dtype in POPULATION_NUMERIC_COLUMNS.items():
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(dtype)
+
+    df = df.sort_values(["행정동_코드", "기준_년분기_코드"], kind="stable").reset_index(drop=True)
+    if df.empty:
+        return None
+
+    # 행정동 코드 -> (시작, 끝) 행 위치
+    codes = df["행정동_코드"].astype(str).to_numpy()
+    boundaries = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    starts = np.r_[0, boundaries]
+    stops = np.r_[boundaries, len(codes)]
+    offsets = {codes[a]: (int(a), int(b)) for a, b in zip(starts, stops)}
+
+    return {
+        "frame": df,
+        "offsets": offsets,
+        # (행정동, 분기)별 유동인구 비중 분포 (고객 구성 격차 분석용)
+        "footfall": build_footfall_distributions(df),
+        "latest_quarter": str(df["기준_년분기_코드"].astype(str).max()),
+    }
+
+
+def get_population_data(population: dict, admin_code: str, quarters_list: list):
+    """해당 행정동/분기 행만 DataFrame 슬라이스로 반환 (행마다 dict를 만들지 않음)"""
+    import pandas as pd
+    if not population: return pd.DataFrame()
+    try:
+        span = population["offsets"].get(str(admin_code))
+        if span is None: return pd.DataFrame()
+
+        rows = population["frame"].iloc[span[0]:span[1]]
+        return rows[rows["기준_년분기_코드"].astype(str).isin(quarters_list)]
     except Exception as e:
-        print(f"CSV 1 Error: {e}")
-        return []
+        logger.error(f"CSV 1 Error: {e}")
+        return pd.DataFrame()
 
 # =================================================================
-# [Helper] CSV 2: 매출 -> JSON List 변환
+# [Helper] CSV 2: 매출 -> 상권 스냅샷(build_market_index)에서 DataFrame 슬라이스
 # =================================================================
-def get_sales_data(file_path: str, admin_code: str, sector_code: str, quarters_list: list):
-    if not os.path.exists(file_path): return []
+def get_sales_data(market: dict, admin_code: str, sector_code: str, quarters_list: list):
+    """해당 행정동/업종/분기 행만 반환 (분석과 같은 스냅샷이라 데이터셋 교체 시 같이 바뀜)"""
+    import pandas as pd
+    if not market or not market.get("rows"): return pd.DataFrame()
     try:
-        try:
-            df = pd.read_csv(file_path, encoding='utf-8')
-        except UnicodeDecodeError:
-            df = pd.read_csv(file_path, encoding='cp949')
-        
-        cond_admin = df['행정동_코드'].astype(str) == str(admin_code)
-        cond_quarter = df['기준_년분기_코드'].astype(str).isin(quarters_list)
-        cond_sector = df['서비스_업종_코드'].astype(str) == str(sector_code)
-        
-        filtered_df = df[cond_admin & cond_quarter & cond_sector]
-        if filtered_df.empty: return []
-            
-        return filtered_df.to_dict(orient='records')
+        span = market["rows"]["offsets"].get(f"{admin_code}:{sector_code}")
+        if span is None: return pd.DataFrame()
+
+        rows = market["rows"]["frame"].iloc[span[0]:span[1]]
+        return rows[rows["기준_년분기_코드"].astype(str).isin(quarters_list)]
     except Exception as e:
-        print(f"CSV 2 Error: {e}")
-        return []
+        logger.error(f"CSV 2 Error: {e}")
+        return pd.DataFrame()
+
+
+registry.register("population", POPULATION_PATTERN, build_population_frame)
 
 # =================================================================
 # [Step 3] LLM 요청 함수 (Pandas + requests 사용)
 # =================================================================
 async def request_llm_generation(final_context: dict):
-    print("Step 2: Gemini 분석 요청 시작 (requests 라이브러리)")
+    import requests
+    logger.info("Gemini 솔루션 생성 요청 시작")
 
     # 1. API 키 확인
     if not GEMINI_API_KEY:
-        print("!! 오류: GEMINI_API_KEY가 설정되지 않았습니다.")
+        logger.error("GEMINI_API_KEY가 설정되지 않음")
         return {
             "title": ["API 키 설정 필요"],
             "solution": ["환경 변수 또는 설정 파일에서 GEMINI_API_KEY를 확인해주세요."]
@@ -112,11 +208,11 @@ async def request_llm_generation(final_context: dict):
     # 2. 데이터 최적화
     market_data = final_context.get("market_data", {})
     
-    pop_list = market_data.get("population", [])
-    pop_str = pd.DataFrame(pop_list).to_csv(index=False) if pop_list else "데이터 없음"
+    pop_df = market_data.get("population")
+    pop_str = pop_df.to_csv(index=False) if pop_df is not None and len(pop_df) else "데이터 없음"
 
-    sales_list = market_data.get("sales_estimate", [])
-    sales_str = pd.DataFrame(sales_list).to_csv(index=False) if sales_list else "데이터 없음"
+    sales_df = market_data.get("sales_estimate")
+    sales_str = sales_df.to_csv(index=False) if sales_df is not None and len(sales_df) else "데이터 없음"
 
     # 3. 프롬프트 구성
     system_instruction_text = """
@@ -181,18 +277,23 @@ async def request_llm_generation(final_context: dict):
 
     def _send_request():
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            with timer(EXTERNAL_CALL_SECONDS, service="gemini_solution"):
+                response = requests.post(url, headers=headers, json=payload)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"!! Requests 요청 오류: {e}")
-            if hasattr(e.response, 'text'):
-                print(f"   서버 응답: {e.response.text}")
+            logger.error(
+                f"Gemini 요청 오류: {e}",
+                extra={"response_text": getattr(e.response, 'text', None)}
+            )
             return None
 
     # 비동기 실행
     response_json = await asyncio.to_thread(_send_request)
 
+    usage = (response_json or {}).get("usageMetadata", {})
+    record_llm_tokens(MODEL_NAME, "solution", usage.get("promptTokenCount"), usage.get("candidatesTokenCount"))
+
     # 5. 결과 파싱
     if response_json and "candidates" in response_json:
         try:
@@ -211,7 +312,7 @@ async def request_llm_generation(final_context: dict):
                 titles.append(result_list.get("title", "제목 없음"))
                 solutions.append(result_list.get("solution", "내용 없음"))
             
-            print(f"--> Gemini 응답 성공 ({len(titles)}개 전략 도출)")
+            logger.info("Gemini 응답 성공", extra={"solution_count": len(titles)})
             
             return {
                 "title": titles,
@@ -219,13 +320,13 @@ async def request_llm_generation(final_context: dict):
             }
             
         except (KeyError, json.JSONDecodeError) as e:
-            print(f"!! 응답 파싱 실패: {e}\n원본: {response_json}")
+            logger.error(f"Gemini 응답 파싱 실패: {e}", extra={"response": response_json})
             return {
                 "title": ["분석 결과 형식 오류"],
                 "solution": ["AI 응답을 처리하는 중 오류가 발생했습니다."]
             }
     else:
-        print("!! 유효한 응답을 받지 못했습니다.")
+        logger.error("Gemini로부터 유효한 응답을 받지 못함")
         return {
             "title": ["분석 실패"],
             "solution": ["AI 서비스 연결 상태를 확인해주세요."]
@@ -245,36 +346,43 @@ async def save_solutions_to_db(user_id: str, generated_data: dict):
     if not titles: return
 
     try:
-        # ▼▼▼ [수정됨] 기존 데이터 모두 삭제 (덮어쓰기) ▼▼▼
-        # user_id에 해당하는 기존 솔루션을 전부 삭제합니다.
-        await solution_collection.delete_many({"user_id": user_id})
-        
-        # 2. 새로운 데이터 저장
+        # 1. 새로운 데이터를 먼저 저장 (같은 세대 번호를 붙여 챗봇 캐시 버전으로 사용)
+        generation = int(time.time() * 1000)
+        docs = []
         for t, s in zip(titles, solutions):
             solution_data = SolutionSchema(title=t, solution=s)
             doc = solution_data.model_dump() 
             doc["user_id"] = user_id
+            doc["generation"] = generation
             doc["created_at"] = datetime.now()
+            docs.append(doc)
+        await solution_collection.insert_many(docs)
+
+        # 2. 그 다음 이전 세대만 삭제 (조회 시점에 솔루션이 비거나 두 세트가 섞이지 않도록)
+        await solution_collection.delete_many({"user_id": user_id, "generation": {"$ne": generation}})
+
+        # 3. 챗봇 시스템 프롬프트 캐시 무효화
+        invalidate_chat_model(user_id, generation)
             
-            await solution_collection.insert_one(doc)
-            
-        print(f"솔루션 저장 완료 (기존 데이터 삭제 후 갱신)")
+        logger.info("솔루션 저장 완료 (새 세대 저장 후 이전 세대 삭제)", extra={"user_id": user_id, "generation": generation})
         
-    except Exception as e:
-        print(f"!! 데이터 저장 중 오류 발생: {e}")
+    except Exception:
+        logger.exception("솔루션 저장 중 오류 발생", extra={"user_id": user_id})
 
 # =================================================================
 # [Main] 메인 실행 함수
 # =================================================================
+@timer(STAGE_SECONDS, stage="solution")
 async def run_sol(user_id: str):
-    print(f"=== [Process Start] User: {user_id} ===")
+    logger.info("솔루션 생성 시작", extra={"user_id": user_id})
     
     # 1. Store Info 가져오기
     store_doc = await store_collection.find_one({"user_id": user_id})
     if not store_doc:
-        print("매장 정보 없음")
+        logger.error("매장 정보 없음", extra={"user_id": user_id})
         return 0
     if "_id" in store_doc: del store_doc["_id"]
+    store_doc["sales_logs"] = await load_sales_logs(user_id)
 
     # 2. Surrounding Info 가져와서 개수 세기
     surrounding_data = await surrounding_collection.find_one({"user_id": user_id})
@@ -290,14 +398,15 @@ async def run_sol(user_id: str):
 
     # 3. CSV 데이터 가져오기
     admin_code, sector_code, quarters_list = extract_search_criteria(store_doc)
-    csv1_data = []
-    csv2_data = []
+    csv1_data = None
+    csv2_data = None
     
     if admin_code:
-        CSV1_PATH = os.path.join("data_set", "서울상권_소득소비_유동인구.csv")
-        CSV2_PATH = os.path.join("data_set", "서울상권_추정매출.csv")
-        csv1_data = get_population_data(CSV1_PATH, admin_code, quarters_list)
-        csv2_data = get_sales_data(CSV2_PATH, admin_code, sector_code, quarters_list)
+        population = await registry.get("population")
+        market = await registry.get("market")
+        with timer(STAGE_SECONDS, stage="solution_context"):
+            csv1_data = get_population_data(population.data if population else None, admin_code, quarters_list)
+            csv2_data = get_sales_data(market.data if market else None, admin_code, sector_code, quarters_list)
 
     # 4. 통합 JSON 생성
     final_context = {
@@ -313,5 +422,5 @@ async def run_sol(user_id: str):
     generated_result = await request_llm_generation(final_context)
     await save_solutions_to_db(user_id, generated_result)
     
-    print("=== [Process End] 분석 완료 ===")
+    logger.info("솔루션 생성 완료", extra={"user_id": user_id})
     return 1
\ No newline at end of file
@@ -1,30 +1,39 @@
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status, BackgroundTasks
 from core.security import get_current_user
 from core.config import store_collection, surrounding_collection, code_mapping_collection, solution_collection, analysis_collection
-from core.config import KAKAO_API_KEY, DATA_GO_KR_API_KEY
-from schemas.storeInfo import StoreInfoSchema
+from core.config import surrounding_cell_collection, SURROUNDING_CELL_PRECISION, SURROUNDING_CELL_TTL
+from core.config import KAKAO_API_KEY, DATA_GO_KR_API_KEY, MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE, RECOMPUTE_MODE
+from schemas.storeInfo import StoreInfoSchema, SalesLogPatchSchema
 from schemas.aroundLocInfo import SurroundingSchema, Coordinate
-from datetime import datetime
-import csv
-import io
-from api.analysis import run_analysis
+from datetime import datetime, timedelta
+from api.sales_parser import SalesAggregator, iter_csv_rows, aggregate_xlsx, upload_size, normalize_ym
+from api.analysis import run_analysis, update_analysis_incremental
 from api.solution import run_sol
-import requests
-import httpx
+from api.peers import refresh_peer
+from api.sales_store import load_sales_logs, save_sales_logs
+from core.logger import get_logger
+from core.metrics import timer, record_cache, STAGE_SECONDS, EXTERNAL_CALL_SECONDS
+from core.admin_dong import resolve_admin_dong
+from core.geo import cells_covering, geohash_bbox, geohash_encode, haversine_m
+from core.responses import ORJSONResponse
+from core.singleflight import single_flight, is_running
 import asyncio
 
+logger = get_logger(__name__)
+
 router = APIRouter(prefix="/api/store", tags=["Store"])
 
 async def get_coordinates(address: str):
+    import requests
     headers = {"Authorization": f"KakaoAK {KAKAO_API_KEY}"} 
     url = 'https://dapi.kakao.com/v2/local/search/address.json'
     params = {'query': address}
 
-    response = requests.get(url, headers=headers, params=params)
+    with timer(EXTERNAL_CALL_SECONDS, service="kakao"):
+        response = requests.get(url, headers=headers, params=params)
 
     if response.status_code != 200:
-        print(f"Kakao API Error: {response.status_code}")
-        print(response.text)
+        logger.error(f"Kakao API Error: {response.status_code}", extra={"response_text": response.text})
         raise HTTPException(status_code=500, detail="Kakao API 호출 실패")
 
     result = response.json()
@@ -36,6 +45,12 @@ async def get_coordinates(address: str):
     lat = float(match_first['y'])
     lng = float(match_first['x'])
 
+    # 행정동은 로컬 경계 인덱스로 판별 (경계 파일이 없거나 경계 밖이면 Kakao h_code 사용)
+    resolved = await resolve_admin_dong(lat, lng)
+    if resolved:
+        admin_code, dong_name = resolved
+        return lat, lng, admin_code, dong_name
+
     if match_first.get('address'):
         addr_info = match_first['address']
         raw_code = addr_info.get('h_code', '') 
@@ -45,130 +60,318 @@ async def get_coordinates(address: str):
         admin_code = ""
         dong_name = ""
 
+    if not admin_code:
+        # 행정동 코드가 비면 상권 CSV와 조인되지 않아 분석이 빈 결과가 됨
+        logger.warning("행정동 코드 판별 실패", extra={"address": address, "lat": lat, "lng": lng})
+
     return lat, lng, admin_code, dong_name
 
 
 # =================================================================
-# 공공데이터 상권 정보 가져오기 (비동기 병렬 처리)
+# 공공데이터 상권 정보 가져오기 (geohash 셀 단위 공유 캐시)
+# - 반경 2km 안의 셀을 업종별로 캐시(surroundingCell)에서 읽고, 없는 셀만 사각형 조회로 채움
+# - 가까운 매장끼리는 셀을 공유하므로 밀집 지역에서는 대부분 외부 호출 없이 끝남
+# - 반경별 목록은 셀에 모인 업소 좌표를 거리로 걸러서 구성
 # =================================================================
-async def fetch_store_data_go_kr(lat: float, lng: float, radius: int) -> list[Coordinate]:
-    url = "http://apis.data.go.kr/B553077/api/open/sdsc2/storeListInRadius"
-    
+STORE_LIST_URL = "http://apis.data.go.kr/B553077/api/open/sdsc2/storeListInRectangle"
+STORE_LIST_PAGE_SIZE = 1000
+# 업종 코드가 없는 매장(매핑 이전 데이터)은 예전 기본 업종으로 조회
+DEFAULT_SURROUNDING_SECTOR = "S21105"
+SURROUNDING_RADII = (500, 1000, 1500, 2000)
+# 한 번에 외부로 나가는 셀 조회 수 제한
+CELL_FETCH_CONCURRENCY = 8
+
+_cell_fetch_semaphore = None
+# 같은 셀을 동시에 조회하는 요청은 하나의 호출에 합류: "업종:셀" -> Task
+_cell_fetches = {}
+# 합류한 조회 Task가 쓰는 클라이언트는 모듈이 소유 (처음 요청한 쪽이 끝나거나 취소돼도 닫히지 않도록)
+_cell_client = None
+_cell_index_ready = False
+
+
+async def _ensure_cell_index():
+    global _cell_index_ready
+    if _cell_index_ready:
+        return
+    try:
+        await surrounding_cell_collection.create_index("expires_at", expireAfterSeconds=0)
+        _cell_index_ready = True
+    except Exception as e:
+        logger.error(f"surroundingCell TTL 인덱스 생성 실패: {str(e)}")
+
+
+def _parse_store_items(body: dict) -> list:
+    items = body.get("items")
+    if not items:
+        return []
+    if isinstance(items, dict):
+        items = [items]
+
+    stores = []
+    for item in items:
+        try:
+            stores.append([float(item.get("lat")), float(item.get("lon"))])
+        except (ValueError, TypeError):
+            continue
+    return stores
+
+
+async def fetch_cell_from_data_go_kr(client, sector_code: str, cell: str):
+    """셀 사각형 안의 업소 좌표 [[lat, lng], ...]. 호출 실패 시 None (캐시하지 않음)"""
     from urllib.parse import unquote
-    service_key = unquote(DATA_GO_KR_API_KEY) 
 
+    min_lat, min_lng, max_lat, max_lng = geohash_bbox(cell)
     params = {
-        "serviceKey": service_key,
-        "pageNo": 1,
-        "numOfRows": 500,
-        "radius": radius,
-        "cx": lng,   # 경도
-        "cy": lat,   # 위도
-        "indsSclsCd": "S21105",
+        "serviceKey": unquote(DATA_GO_KR_API_KEY or ""),
+        "numOfRows": STORE_LIST_PAGE_SIZE,
+        "minx": min_lng,
+        "miny": min_lat,
+        "maxx": max_lng,
+        "maxy": max_lat,
+        "indsSclsCd": sector_code,
         "type": "json"
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, params=params, timeout=15.0)
-            
+    stores = []
+    page = 1
+    try:
+        while True:
+            with timer(EXTERNAL_CALL_SECONDS, service="data_go_kr"):
+                response = await client.get(STORE_LIST_URL, params={**params, "pageNo": page}, timeout=15.0)
+
             if response.status_code != 200:
-                print(f"API Error ({radius}m): {response.status_code} - {response.text}")
-                return []
+                logger.error(f"API Error (cell {cell}): {response.status_code}", extra={"response_text": response.text})
+                return None
 
             content_type = response.headers.get("Content-Type", "")
             if "xml" in content_type or response.text.strip().startswith("<"):
-                print(f"API Error ({radius}m) - XML Response received (Check ServiceKey)")
-                return []
+                logger.error(f"API Error (cell {cell}) - XML Response received (Check ServiceKey)")
+                return None
 
-            data = response.json()
-            body = data.get("body")
+            body = response.json().get("body")
             if not body:
-                return []
-
-            items = body.get("items")
-            if not items:
-                return []
-
-            if isinstance(items, dict):
-                items = [items]
-            
-            coords = []
-            for item in items:
-                try:
-                    c_lat = float(item.get("lat"))
-                    c_lon = float(item.get("lon"))
-                    coords.append(Coordinate(lat=c_lat, lng=c_lon))
-                except (ValueError, TypeError):
-                    continue
-            
-            return coords
-
-        except Exception as e:
-            print(f"Public Data API Exception ({radius}m): {str(e)}")
-            return []
-
-async def get_surrounding_commercial_areas(lat: float, lng: float) -> SurroundingSchema:
-    task_500 = fetch_store_data_go_kr(lat, lng, 500)
-    task_1000 = fetch_store_data_go_kr(lat, lng, 1000)
-    task_1500 = fetch_store_data_go_kr(lat, lng, 1500)
-    task_2000 = fetch_store_data_go_kr(lat, lng, 2000)
-
-    results = await asyncio.gather(task_500, task_1000, task_1500, task_2000)
+                # 결과 없음(해당 업종 업소가 없는 셀)도 정상 응답 → 빈 셀로 캐시
+                break
+
+            page_stores = _parse_store_items(body)
+            stores.extend(page_stores)
+            total = int(body.get("totalCount") or 0)
+            if not page_stores or page * STORE_LIST_PAGE_SIZE >= total:
+                break
+            page += 1
+    except Exception as e:
+        logger.error(f"Public Data API Exception (cell {cell}): {str(e)}")
+        return None
+
+    # 사각형 조회는 경계가 겹치므로 셀에 실제로 속한 업소만 남김 (셀 간 중복 방지)
+    precision = len(cell)
+    return [s for s in stores if geohash_encode(s[0], s[1], precision) == cell]
+
+
+def _get_cell_client():
+    import httpx
+
+    global _cell_client
+    if _cell_client is None or _cell_client.is_closed:
+        _cell_client = httpx.AsyncClient()
+    return _cell_client
+
+
+async def close_cell_client():
+    """앱 종료 시 호출 (api.main lifespan)"""
+    global _cell_client
+    if _cell_client is not None:
+        await _cell_client.aclose()
+        _cell_client = None
+
+
+async def _load_cell(client, sector_code: str, cell: str):
+    global _cell_fetch_semaphore
+    if _cell_fetch_semaphore is None:
+        _cell_fetch_semaphore = asyncio.Semaphore(CELL_FETCH_CONCURRENCY)
+
+    async with _cell_fetch_semaphore:
+        stores = await fetch_cell_from_data_go_kr(client, sector_code, cell)
+    if stores is None:
+        return []
+
+    now = datetime.utcnow()
+    await surrounding_cell_collection.update_one(
+        {"_id": f"{sector_code}:{cell}"},
+        {"$set": {
+            "sector_code": sector_code,
+            "cell": cell,
+            "stores": stores,
+            "fetched_at": now,
+            "expires_at": now + timedelta(seconds=SURROUNDING_CELL_TTL),
+        }},
+        upsert=True
+    )
+    return stores
+
+
+async def get_surrounding_commercial_areas(lat: float, lng: float, sector_code: str = None) -> SurroundingSchema:
+    sector_code = sector_code or DEFAULT_SURROUNDING_SECTOR
+    await _ensure_cell_index()
+
+    max_radius = SURROUNDING_RADII[-1]
+    cells = cells_covering(lat, lng, max_radius, SURROUNDING_CELL_PRECISION)
+    keys = [f"{sector_code}:{cell}" for cell in cells]
+
+    # 1. 캐시된 셀 (TTL 인덱스 삭제 주기 사이의 만료 문서는 제외)
+    cached = {}
+    cursor = surrounding_cell_collection.find(
+        {"_id": {"$in": keys}, "expires_at": {"$gt": datetime.utcnow()}},
+        {"stores": 1}
+    )
+    async for doc in cursor:
+        cached[doc["_id"]] = doc.get("stores") or []
+
+    for key in keys:
+        record_cache("surrounding_cell", key in cached)
+
+    # 2. 없는 셀만 조회 (다른 요청이 같은 셀을 조회 중이면 합류)
+    missing = [(key, cell) for key, cell in zip(keys, cells) if key not in cached]
+    if missing:
+        client = _get_cell_client()
+        tasks = []
+        for key, cell in missing:
+            task = _cell_fetches.get(key)
+            if task is None:
+                task = asyncio.create_task(_load_cell(client, sector_code, cell))
+                _cell_fetches[key] = task
+                task.add_done_callback(lambda t, k=key: _cell_fetches.pop(k, None))
+            tasks.append(task)
+        # 이 요청이 취소돼도 공유 Task는 계속 진행 (shield) → 합류한 다른 요청은 결과를 그대로 받음
+        results = await asyncio.gather(*(asyncio.shield(task) for task in tasks), return_exceptions=True)
+
+        for (key, cell), result in zip(missing, results):
+            if isinstance(result, asyncio.CancelledError):
+                # 조회 자체가 취소됨(종료 중) → 빈 셀로 저장하지 않도록 그대로 전파
+                raise result
+            if isinstance(result, BaseException):
+                logger.error(f"주변 상권 셀 조회 실패 ({cell}): {str(result)}")
+                result = []
+            cached[key] = result
+
+    # 3. 반경별 목록 (누적: 1000m 목록은 500m 안의 업소도 포함)
+    rings = {radius: [] for radius in SURROUNDING_RADII}
+    for key in keys:
+        for s_lat, s_lng in cached.get(key, []):
+            distance = haversine_m(lat, lng, s_lat, s_lng)
+            if distance > max_radius:
+                continue
+            coord = Coordinate(lat=s_lat, lng=s_lng)
+            for radius in SURROUNDING_RADII:
+                if distance <= radius:
+                    rings[radius].append(coord)
+
+    logger.info("주변 상권 조회", extra={
+        "sector_code": sector_code, "cells": len(cells), "fetched_cells": len(missing)
+    })
 
     return SurroundingSchema(
-        rad_500=results[0],
-        rad_1000=results[1],
-        rad_1500=results[2],
-        rad_2000=results[3]
-    )    
+        rad_500=rings[500],
+        rad_1000=rings[1000],
+        rad_1500=rings[1500],
+        rad_2000=rings[2000]
+    )
 
 
 # =================================================================
-# 1. CSV 파싱 API
+# 1. CSV 파싱 API (CSV / XLSX, 월별 또는 일별 데이터)
 # =================================================================
 @router.post("/parse-csv")
 async def parse_store_csv(
     file: UploadFile = File(...),
     current_user: str = Depends(get_current_user)
 ):
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="CSV 파일만 업로드 가능합니다.")
+    filename = (file.filename or "").lower()
+    if not filename.endswith(('.csv', '.xlsx')):
+        raise HTTPException(status_code=400, detail="CSV 또는 XLSX 파일만 업로드 가능합니다.")
 
     try:
-        content = await file.read()
-        try:
-            decoded = content.decode('utf-8')
-        except UnicodeDecodeError:
-            decoded = content.decode('euc-kr')
-
-        csv_reader = csv.DictReader(io.StringIO(decoded))
-        extracted_sales = []
-        
-        for row in csv_reader:
-            row = {k.strip(): v.strip() for k, v in row.items() if k}
-            if '년월' in row and '매출' in row:
-                try:
-                    revenue = int(row.get('매출', '0').replace(',', ''))
-                    profit = int(row.get('순수익', '0').replace(',', ''))
-                    extracted_sales.append({
-                        "ym": row['년월'],
-                        "revenue": revenue,
-                        "profit": profit,
-                        "details": None
-                    })
-                except ValueError:
-                    continue
+        with timer(STAGE_SECONDS, stage="csv_parse"):
+            if filename.endswith('.xlsx'):
+                if upload_size(file) > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=f"업로드 파일이 너무 큽니다. (최대 {MAX_UPLOAD_BYTES // (1024 * 1024)}MB)")
+                aggregator = await asyncio.to_thread(aggregate_xlsx, file.file)
+            else:
+                aggregator = SalesAggregator()
+                async for row in iter_csv_rows(file, MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE):
+                    aggregator.add_row(row)
 
         return {
             "message": "CSV parsed successfully",
-            "suggested_data": {"sales_logs": extracted_sales}
+            "suggested_data": {"sales_logs": aggregator.result()},
+            "granularity": "daily" if aggregator.daily else "monthly",
+            "row_count": aggregator.rows
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"CSV Parsing Error: {str(e)}")
 
 
+# =================================================================
+# 주변 상권 저장/재조회
+# =================================================================
+async def save_surrounding(user_id: str, surrounding_data: SurroundingSchema):
+    surrounding_dict = surrounding_data.dict()
+    surrounding_dict["user_id"] = user_id
+    surrounding_dict["updated_at"] = datetime.now()
+
+    await surrounding_collection.update_one(
+        {"user_id": user_id},
+        {"$set": surrounding_dict},
+        upsert=True
+    )
+
+
+async def refresh_surrounding(user_id: str, lat: float, lng: float, sector_code: str = None):
+    """주변 상권을 다시 조회해 저장 (재계산 워커용)"""
+    await save_surrounding(user_id, await get_surrounding_commercial_areas(lat, lng, sector_code))
+
+
+# =================================================================
+# [Helper] 재제출 시 변경된 필드 → 다시 실행할 단계 판별
+# =================================================================
+# 주소가 바뀌면 좌표/행정동 변환 + 주변 상권 조회
+ADDRESS_FIELDS = ["location.address"]
+# 매출/업종/행정동이 바뀌면 상권 비교 분석
+ANALYSIS_FIELDS = ["sales_logs", "sector_code_cs", "location.admin_code"]
+# 솔루션 프롬프트에 들어가는 정보가 바뀌면 솔루션 재생성 (상세 주소, 좌표 등은 제외)
+SOLUTION_FIELDS = [
+    "sector_name", "location.address", "sales_logs",
+    "fixed_cost", "delivery", "menus", "scale", "operation", "goals"
+]
+
+
+def get_field(doc: dict, path: str):
+    value = doc
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    if path == "sales_logs" and value:
+        # 값이 없는 선택 항목(details: None 등)은 키가 빠진 것과 같게 비교
+        value = [
+            {key: item for key, item in log.items() if item is not None}
+            for log in sorted(value, key=lambda log: log.get("ym", ""))
+        ]
+    return value
+
+
+def diff_store_fields(old_doc: dict, new_doc: dict) -> set:
+    if not old_doc:
+        return set(ADDRESS_FIELDS + ANALYSIS_FIELDS + SOLUTION_FIELDS)
+    return {
+        path for path in set(ADDRESS_FIELDS + ANALYSIS_FIELDS + SOLUTION_FIELDS)
+        if get_field(old_doc, path) != get_field(new_doc, path)
+    }
+
+
 # =================================================================
 # 2. 매장 정보 저장/수정 API (Submit)
 # =================================================================
@@ -178,8 +381,19 @@ async def submit_store_info(
     background_tasks: BackgroundTasks,
     current_user: str = Depends(get_current_user)
 ):
-    # 0. 업종 매핑
-    if store_data.sector_name:
+    # 기존 매장 정보 (바뀐 부분만 다시 처리하기 위해 비교 대상으로 사용)
+    old_store = await store_collection.find_one({"user_id": current_user}, {"_id": 0})
+    if old_store:
+        # 매출 이력은 storeSales 버킷에 있음 (예전 문서면 여기서 버킷으로 옮겨짐)
+        old_store["sales_logs"] = await load_sales_logs(current_user)
+    old_location = (old_store or {}).get("location") or {}
+
+    # 0. 업종 매핑 (업종명이 그대로면 기존 코드 재사용)
+    if old_store and old_store.get("sector_name") == store_data.sector_name and old_store.get("sector_code_cs"):
+        store_data.sector_code_cs = old_store.get("sector_code_cs")
+        store_data.sector_code_low = old_store.get("sector_code_low")
+        store_data.sector_code = old_store.get("sector_code")
+    elif store_data.sector_name:
         mapping_doc = await code_mapping_collection.find_one(
             {"ksic_list.name": store_data.sector_name}
         )
@@ -197,55 +411,176 @@ async def submit_store_info(
                 detail=f"지원하지 않는 업종명입니다: {store_data.sector_name}"
             )
     
-    # 1. 좌표 변환
+    # 1. 좌표 변환 (주소가 그대로면 기존 좌표/행정동 재사용)
     address = store_data.location.address
-    lat, lng, admin_code, dong_name = await get_coordinates(address)
+    address_changed = (
+        old_location.get("address") != address
+        or old_location.get("lat") is None
+        or old_location.get("lng") is None
+    )
+    if address_changed:
+        lat, lng, admin_code, dong_name = await get_coordinates(address)
 
-    if lat is None:
-        raise HTTPException(status_code=400, detail="유효하지 않은 주소입니다.")
+        if lat is None:
+            raise HTTPException(status_code=400, detail="유효하지 않은 주소입니다.")
+    else:
+        lat, lng = old_location["lat"], old_location["lng"]
+        admin_code = old_location.get("admin_code")
+        dong_name = old_location.get("admin_dong_name")
+        if not admin_code:
+            # 예전에 행정동 판별에 실패한 매장은 로컬 경계로 다시 시도
+            resolved = await resolve_admin_dong(lat, lng)
+            if resolved:
+                admin_code, dong_name = resolved
 
     store_data.location.lat = lat
     store_data.location.lng = lng
     store_data.location.admin_code = admin_code
     store_data.location.admin_dong_name = dong_name
 
-    # 2. 주변 상권 정보
-    surrounding_data = await get_surrounding_commercial_areas(lat, lng)
-    
-    await analysis_collection.delete_one({"user_email": current_user})
-    await solution_collection.delete_many({"user_id": current_user})
-    # 3. DB 저장 (Store Info)
     store_dict = store_data.dict()
+    # 저장된 이력(load_sales_logs)과 같은 형태로 비교하도록 년월 정규화 + 같은 달은 마지막 값
+    logs = {}
+    for log in store_dict["sales_logs"]:
+        ym, _ = normalize_ym(log["ym"])
+        if ym is not None:
+            logs[ym] = {**log, "ym": ym}
+    store_dict["sales_logs"] = [logs[ym] for ym in sorted(logs)]
     store_dict["user_id"] = current_user  
     store_dict["updated_at"] = datetime.now()
 
-    result = await store_collection.update_one(
-        {"user_id": current_user},    
-        {"$set": store_dict},         
-        upsert=True                   
-    )
-
-    # 4. DB 저장 (Surrounding Info)
-    surrounding_dict = surrounding_data.dict()
-    surrounding_dict["user_id"] = current_user
-    surrounding_dict["updated_at"] = datetime.now()
-
-    await surrounding_collection.update_one(
+    # 2. 변경된 필드에 따라 다시 실행할 단계 결정
+    changed = diff_store_fields(old_store, store_dict)
+    # 주변 상권은 업종별로 조회하므로 업종이 바뀌어도 다시 구성
+    run_surrounding = address_changed or (old_store or {}).get("sector_code_low") != store_data.sector_code_low
+    run_analysis_stage = bool(changed & set(ANALYSIS_FIELDS))
+    run_solution_stage = bool(changed & set(SOLUTION_FIELDS)) or run_surrounding
+
+    # 입력이 바뀌면 입력 버전을 올림 → 이전 제출로 시작된 계산은 취소되고 새 버전이 대신함
+    # (같은 내용의 중복 제출은 버전이 그대로라 진행 중인 계산에 합류)
+    current_version = (old_store or {}).get("input_version", 0)
+    bump_version = bool(changed)
+
+    # 이전 분석/솔루션 생성이 실패해서 결과가 없으면 변경이 없어도 다시 실행
+    # 단, 같은 버전이 아직 계산 중이면(결과가 아직 없을 뿐) 새로 시작하지 않고 합류
+    if not run_analysis_stage and not await analysis_collection.find_one({"user_email": current_user}, {"_id": 1}):
+        run_analysis_stage = True
+        bump_version = bump_version or not await is_running("analysis", current_user, current_version)
+    if not run_solution_stage and not await solution_collection.find_one({"user_id": current_user}, {"_id": 1}):
+        run_solution_stage = True
+        bump_version = bump_version or not await is_running("solution", current_user, current_version)
+
+    # 3. 주변 상권 정보 (주소가 바뀐 경우만, worker 모드에서는 재계산 워커가 조회)
+    if run_surrounding and RECOMPUTE_MODE == "inline":
+        surrounding_data = await get_surrounding_commercial_areas(lat, lng, store_data.sector_code_low)
+    
+    if run_analysis_stage:
+        await analysis_collection.delete_one({"user_email": current_user})
+    if run_solution_stage:
+        await solution_collection.delete_many({"user_id": current_user})
+
+    # 4. DB 저장 (매출은 storeSales 버킷, 나머지는 Store Info)
+    # 백그라운드 분석이 새 매출을 읽도록 입력 버전을 올리기 전에 저장
+    sales_logs = store_dict.pop("sales_logs")
+    if "sales_logs" in changed:
+        await save_sales_logs(current_user, sales_logs, replace=True)
+    store_dict.pop("input_version", None)
+    update = {"$set": store_dict}
+    if bump_version:
+        update["$inc"] = {"input_version": 1}
+    saved = await store_collection.find_one_and_update(
         {"user_id": current_user},
-        {"$set": surrounding_dict},
-        upsert=True
+        update,
+        projection={"_id": 0, "input_version": 1},
+        upsert=True,
+        return_document=True
     )
+    version = saved.get("input_version", 0)
 
-    # 5. 분석 실행
-    background_tasks.add_task(run_analysis, current_user)
-    background_tasks.add_task(run_sol, current_user) # 비동기 백그라운드 실행
+    # 5. DB 저장 (Surrounding Info)
+    if run_surrounding:
+        if RECOMPUTE_MODE == "inline":
+            await save_surrounding(current_user, surrounding_data)
+        else:
+            # 분석/솔루션과 마찬가지로 이전 결과를 지우면 워커가 결과 없는 단계로 보고 다시 조회
+            await surrounding_collection.delete_one({"user_id": current_user})
+
+    # 6. 분석 실행 (필요한 단계만, 같은 버전의 중복 제출은 진행 중인 실행에 합류)
+    # worker 모드에서는 재계산 워커가 storeInfo 변경을 감지해 실행하므로 여기서는 저장만 함
+    if RECOMPUTE_MODE == "inline":
+        if run_analysis_stage:
+            background_tasks.add_task(single_flight, "analysis", current_user, version, run_analysis, current_user)
+        if run_solution_stage:
+            background_tasks.add_task(single_flight, "solution", current_user, version, run_sol, current_user) # 비동기 백그라운드 실행
+    # 유사 매장 인덱스에 이 매장만 다시 반영
+    background_tasks.add_task(refresh_peer, current_user)
     
-    if result.upserted_id:
+    if old_store is None:
         msg = "매장 정보가 신규 등록되었습니다."
     else:
         msg = "매장 정보가 업데이트되었습니다."
 
-    return {"message": msg, "user_id": current_user}
+    return {
+        "message": msg,
+        "user_id": current_user,
+        "input_version": version,
+        "stages": {
+            "geocode": address_changed,
+            "surrounding": run_surrounding,
+            "analysis": run_analysis_stage,
+            "solution": run_solution_stage
+        }
+    }
+
+
+# =================================================================
+# 2-1. 매출 로그 추가/수정 API (월 단위 증분 업데이트)
+# =================================================================
+@router.patch("/sales-logs")
+async def patch_sales_logs(
+    patch_data: SalesLogPatchSchema,
+    current_user: str = Depends(get_current_user)
+):
+    # 같은 달이 여러 번 오면 마지막 값 사용
+    logs = {}
+    for log in patch_data.sales_logs:
+        ym, _ = normalize_ym(log.ym)
+        if ym is None:
+            raise HTTPException(status_code=400, detail=f"잘못된 년월 형식입니다: {log.ym}")
+        log_dict = log.dict()
+        log_dict["ym"] = ym
+        logs[ym] = log_dict
+
+    store = await store_collection.find_one({"user_id": current_user}, {"_id": 1})
+    if not store:
+        raise HTTPException(status_code=404, detail="등록된 매장 정보가 없습니다.")
+
+    # 1. 해당 월만 storeSales 버킷에 추가/수정
+    saved_logs = await save_sales_logs(current_user, list(logs.values()))
+
+    # 2. 입력 버전 증가 (진행 중인 이전 분석은 취소되고 아래 증분 분석이 대신함)
+    saved = await store_collection.find_one_and_update(
+        {"user_id": current_user},
+        {"$inc": {"input_version": 1}, "$set": {"updated_at": datetime.now()}},
+        projection={"_id": 0, "input_version": 1},
+        return_document=True
+    )
+
+    # 유사 매장 인덱스 갱신 (이 워커에 인덱스가 있을 때만)
+    await refresh_peer(current_user)
+
+    # 3. 최근 구간 지표(MoM, 추세, 백분위)만 다시 계산
+    analysis_updated = bool(await single_flight(
+        "analysis", current_user, saved["input_version"],
+        update_analysis_incremental, current_user, list(logs)
+    ))
+
+    return {
+        "message": "매출 정보가 반영되었습니다.",
+        "updated": len(saved_logs["updated"]),
+        "inserted": len(saved_logs["inserted"]),
+        "analysis_updated": analysis_updated
+    }
 
 
 # =================================================================
@@ -262,8 +597,10 @@ async def get_my_store_info(
 
     if not store:
         raise HTTPException(status_code=404, detail="등록된 매장 정보가 없습니다.")
+    store["sales_logs"] = await load_sales_logs(current_user)
 
-    return store
+    # 매출 이력 전체가 포함된 큰 응답 → jsonable_encoder를 거치지 않고 바로 직렬화
+    return ORJSONResponse(store)
 
 
 # =================================================================
@@ -383,7 +720,8 @@ async def get_dashboard_data(
         "my_address": address
     }
 
-    return {
+    # 좌표 수천 개 → jsonable_encoder를 거치지 않고 바로 직렬화
+    return ORJSONResponse({
         "hasData": True,
         "data": dashboard_data
-    }
\ No newline at end of file
+    })
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""
+두 벤치마크 결과(JSON) 비교.
+
+    python -m benchmarks.compare before.json after.json
+"""
+import json
+import sys
+
+METRICS = ["p50_ms", "p95_ms", "p99_ms", "throughput_per_s", "peak_rss_mb"]
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    return report, {r["scenario"]: r for r in report["results"]}
+
+
+def change(old: float, new: float) -> str:
+    if not old:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def main():
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(2)
+    before_report, before = load(sys.argv[1])
+    after_report, after = load(sys.argv[2])
+    print(f"{before_report.get('commit')} → {after_report.get('commit')}")
+    for scenario in before.keys() | after.keys():
+        if scenario not in before or scenario not in after:
+            print(f"\n[{scenario}] 한쪽 결과에만 존재")
+            continue
+        print(f"\n[{scenario}]")
+        for metric in METRICS:
+            old, new = before[scenario].get(metric, 0), after[scenario].get(metric, 0)
+            print(f"  {metric:<18} {old:>12} → {new:>12}  ({change(old, new)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+합성 데이터 생성기 (storeInfo 문서, 상권 추정매출 CSV, 유동인구 CSV)
+"""
+import csv
+import os
+import random
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+POPULATION_CSV = os.path.join(BASE_DIR, "data_set", "서울상권_소득소비_유동인구.csv")
+
+# 부하 테스트에서 code_mapping에 심어두는 업종명 (제출 시 sector_name으로 사용)
+SECTOR_NAME = "한식 일반 음식점업"
+
+QUARTERS = ["20241", "20242", "20243", "20244", "20251", "20252", "20253"]
+
+
+def make_codes(n_dongs: int, n_sectors: int):
+    dongs = [str(11110000 + i * 15) for i in range(n_dongs)]
+    sectors = [f"CS{100001 + i}" for i in range(n_sectors)]
+    return dongs, sectors
+
+
+def write_market_csv(path: str, dongs: list, sectors: list, quarters=QUARTERS, seed: int = 42):
+    """서울상권_추정매출.csv 와 같은 컬럼 구성의 합성 파일"""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            "기준_년분기_코드", "행정동_코드", "행정동_코드_명", "서비스_업종_코드", "서비스_업종_코드_명",
+            "당월_매출_금액", "당월_매출_건수", "당월_평균_매출"
+        ])
+        for q in quarters:
+            for d in dongs:
+                for s in sectors:
+                    avg = rng.randint(3_000_000, 60_000_000)
+                    writer.writerow([q, d, f"동{d[-4:]}", s, f"업종{s[-3:]}", avg * 12, rng.randint(100, 5000), avg])
+    return path
+
+
+def write_population_csv(path: str, dongs: list, quarters=QUARTERS, seed: int = 42):
+    """실제 유동인구 CSV 헤더를 그대로 쓰고 값만 합성"""
+    rng = random.Random(seed)
+    with open(POPULATION_CSV, encoding="utf-8") as f:
+        header = next(csv.reader(f))
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for q in quarters:
+            for d in dongs:
+                row = [q, d, f"동{d[-4:]}"] + [rng.randint(1_000, 5_000_000) for _ in header[3:]]
+                writer.writerow(row)
+    return path
+
+
+def make_sales_logs(rng: random.Random, months: int = 24, with_details: bool = True):
+    logs = []
+    base = rng.randint(5_000_000, 50_000_000)
+    for i in range(months):
+        year, month = 2024 + (i // 12), (i % 12) + 1
+        revenue = int(base * rng.uniform(0.8, 1.2))
+        log = {"ym": f"{year}-{month:02d}", "revenue": revenue, "profit": int(revenue * 0.2), "details": None}
+        if with_details:
+            log["details"] = {
+                "weekly": {k: rng.randint(0, revenue // 7) for k in ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]},
+                "time_slot": {k: rng.randint(0, revenue // 6) for k in ["t00_06", "t06_11", "t11_14", "t14_17", "t17_21", "t21_24"]},
+                "gender": {"male": revenue // 2, "female": revenue - revenue // 2},
+                "age_groups": {k: rng.randint(0, revenue // 6) for k in ["a10", "a20", "a30", "a40", "a50", "a60_over"]},
+            }
+        logs.append(log)
+    return logs
+
+
+def make_store_doc(user_id: str, dong: str, sector: str, rng: random.Random, months: int = 24):
+    return {
+        "user_id": user_id,
+        "sector_name": "한식 일반 음식점업",
+        "sector_code": "56111",
+        "sector_code_cs": sector,
+        "sector_code_low": "I20101",
+        "location": {
+            "address": "서울 강동구 테스트로 1",
+            "detail_address": None,
+            "lat": 37.5 + rng.random() * 0.1,
+            "lng": 127.0 + rng.random() * 0.1,
+            "admin_code": dong,
+            "admin_dong_name": f"동{dong[-4:]}",
+        },
+        "sales_logs": make_sales_logs(rng, months),
+        "fixed_cost": {"electricity": 300000, "water": 50000, "gas": 200000, "labor": 6000000, "rent": 3000000, "etc": 100000},
+        "delivery": {"is_active": True, "sales_ratio": 30.0},
+        "menus": {
+            "main": [{"name": "삼겹살", "price": 16000, "cost_rate": 32.0}],
+            "general": [{"name": "된장찌개", "price": 8000, "cost_rate": 25.0}],
+        },
+        "scale": {"area_size": 30.0, "seats": 40, "turnover": 2.5},
+        "operation": {"months_business": 36, "closed_days": ["sun"], "hours": {"start": "11:00", "end": "22:00"}},
+        "goals": {"growth_target": ["매출 증대"], "problem_area": ["저녁 손님 감소"]},
+    }
+
+
+def make_surrounding_doc(user_id: str, lat: float, lng: float, rng: random.Random, per_ring: int = 800):
+    doc = {"user_id": user_id}
+    for i, radius in enumerate((500, 1000, 1500, 2000)):
+        doc[f"rad_{radius}"] = [
+            {"lat": lat + rng.uniform(-0.02, 0.02), "lng": lng + rng.uniform(-0.02, 0.02)}
+            for _ in range(per_ring * (i + 1) // 4)
+        ]
+    return doc
+
+
+def make_sales_upload(rows: int, daily: bool = True, seed: int = 42) -> bytes:
+    """POS 내보내기 형태의 CSV 업로드 (일별이면 년월로 합산되는지 확인 가능)"""
+    rng = random.Random(seed)
+    lines = ["일자,매출,순수익" if daily else "년월,매출,순수익"]
+    for i in range(rows):
+        year = 2020 + (i // 365) % 6
+        if daily:
+            month, day = (i % 365) // 31 + 1, (i % 31) + 1
+            key = f"{year}-{min(month, 12):02d}-{day:02d}"
+        else:
+            key = f"{year}-{(i % 12) + 1:02d}"
+        revenue = rng.randint(100_000, 3_000_000)
+        lines.append(f'{key},"{revenue:,}",{revenue // 5}')
+    return ("\n".join(lines) + "\n").encode("utf-8")
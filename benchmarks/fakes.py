@@ -0,0 +1,82 @@
+"""
+벤치마크 / 부하 테스트용 로컬 대역(stand-in)
+- Mongo: mongomock-motor 인메모리 DB를 core.config에 주입
+- Kakao / data.go.kr / Gemini: 지연 시간만 흉내 내는 스텁으로 교체
+"""
+import asyncio
+import random
+
+from schemas.aroundLocInfo import SurroundingSchema, Coordinate
+
+
+def install_fake_mongo():
+    from mongomock_motor import AsyncMongoMockClient
+    import core.config as config
+
+    config.client = AsyncMongoMockClient()
+    config.db = config.client["BIZIT_DB"]
+    return config.db
+
+
+def install_external_stubs(kakao_ms: float = 80, data_go_kr_ms: float = 300, gemini_ms: float = 3000,
+                           surrounding_count: int = 300, seed: int = 42):
+    import api.store as store
+    import api.solution as solution
+    rng = random.Random(seed)
+
+    async def fake_get_coordinates(address: str):
+        await asyncio.sleep(kakao_ms / 1000)
+        return 37.5 + rng.random() * 0.1, 127.0 + rng.random() * 0.1, "11740700", "둔촌2동"
+
+    async def fake_surrounding(lat: float, lng: float, sector_code: str = None) -> SurroundingSchema:
+        await asyncio.sleep(data_go_kr_ms / 1000)
+        rings = {}
+        for radius in (500, 1000, 1500, 2000):
+            count = surrounding_count * radius // 2000
+            rings[f"rad_{radius}"] = [
+                Coordinate(lat=lat + rng.uniform(-0.01, 0.01), lng=lng + rng.uniform(-0.01, 0.01))
+                for _ in range(count)
+            ]
+        return SurroundingSchema(**rings)
+
+    async def fake_llm(final_context: dict):
+        await asyncio.sleep(gemini_ms / 1000)
+        return {
+            "title": [f"전략 {i}" for i in range(1, 5)],
+            "solution": ["벤치마크용 더미 솔루션입니다." * 10 for _ in range(4)],
+        }
+
+    store.get_coordinates = fake_get_coordinates
+    store.get_surrounding_commercial_areas = fake_surrounding
+    solution.request_llm_generation = fake_llm
+
+
+def install_chat_stub(gemini_ms: float = 1500):
+    """google.generativeai 대신 쓰는 가짜 모델 (send_message는 실제처럼 동기 함수)"""
+    import time
+    import types
+    import api.chat as chat
+
+    class FakeResponse:
+        def __init__(self, text: str):
+            self.text = text
+            self.usage_metadata = types.SimpleNamespace(prompt_token_count=len(text), candidates_token_count=len(text))
+
+    class FakeSession:
+        def send_message(self, message: str):
+            time.sleep(gemini_ms / 1000)
+            return FakeResponse(f"[stub] {message[:50]}")
+
+    class FakeModel:
+        def __init__(self, model_name: str = None, system_instruction: str = None):
+            self.system_instruction = system_instruction
+
+        def start_chat(self, history=None):
+            return FakeSession()
+
+        def generate_content(self, contents):
+            time.sleep(gemini_ms / 1000)
+            return FakeResponse("[stub] 요약")
+
+    fake_genai = types.SimpleNamespace(GenerativeModel=FakeModel)
+    chat.get_genai = lambda: fake_genai
@@ -0,0 +1,78 @@
+"""
+앱 cold start(import) 시간 예산 검사.
+
+    python -m benchmarks.import_time [--budget 0.8] [--runs 5]
+
+새 프로세스에서 `import api.main`에 걸리는 시간을 여러 번 재고 중앙값이 예산을 넘거나,
+첫 요청 전에 불러오면 안 되는 무거운 모듈이 import 되어 있으면 종료 코드 1로 실패합니다.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# lifespan 이후 / 첫 사용 시점까지 import를 미뤄야 하는 모듈
+HEAVY_MODULES = [
+    "pandas",
+    "numpy",
+    "google.generativeai",
+    "motor",
+    "pymongo",
+    "requests",
+    "httpx",
+]
+
+PROBE = (
+    "import json, sys, time\n"
+    "t = time.perf_counter()\n"
+    "import api.main\n"
+    "elapsed = time.perf_counter() - t\n"
+    f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+    "print(json.dumps({'elapsed': elapsed, 'heavy': heavy}))\n"
+)
+
+
+def measure_once() -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="api.main import 시간 예산 검사")
+    parser.add_argument("--budget", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET", "0.8")),
+                        help="허용 import 시간(초, 중앙값 기준)")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = [measure_once() for _ in range(args.runs)]
+    median = statistics.median(r["elapsed"] for r in results)
+    heavy = sorted({m for r in results for m in r["heavy"]})
+
+    print(json.dumps({
+        "median_seconds": round(median, 4),
+        "budget_seconds": args.budget,
+        "heavy_modules_loaded": heavy,
+    }, ensure_ascii=False))
+
+    failed = False
+    if heavy:
+        print(f"!!! [FAIL] 시작 시점에 무거운 모듈이 import 됨: {', '.join(heavy)}")
+        failed = True
+    if median > args.budget:
+        print(f"!!! [FAIL] import 시간 {median:.3f}s > 예산 {args.budget:.3f}s")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
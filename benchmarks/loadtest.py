@@ -0,0 +1,220 @@
+"""
+월초 '매출 제출 폭주 + 대시보드 폴링' 부하 테스트.
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.loadtest --users 50 --duration 60 --mix submit=2,dashboard=10,chat=1,signup=1
+
+benchmarks.stub_app(실제 앱 + 인메모리 Mongo + 외부 API 스텁)을 uvicorn 하위 프로세스로 띄우고,
+가상 사용자(virtual user)들이 가입 → 매출 제출 → isAnalyzing이 풀릴 때까지 대시보드 폴링 → 챗봇 대화를
+섞어서 호출합니다. 엔드포인트별 p50/p95/p99 지연 시간과 서버 이벤트 루프 지연(lag)을 JSON으로 출력합니다.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks import datasets
+from benchmarks.run import percentile
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint: str, seconds: float, ok: bool):
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def report(self, wall: float) -> dict:
+        out = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            ordered = sorted(samples)
+            out[endpoint] = {
+                "requests": len(samples),
+                "errors": self.errors[endpoint],
+                "rps": round(len(samples) / wall, 2),
+                "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+                "max_ms": round(ordered[-1] * 1000, 2),
+            }
+        return out
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"signup", "submit", "dashboard", "chat"}
+    if unknown:
+        raise SystemExit(f"알 수 없는 트래픽 종류: {', '.join(sorted(unknown))}")
+    return mix
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, stats: Stats, args, vu_id: int):
+        self.client = client
+        self.stats = stats
+        self.args = args
+        self.vu_id = vu_id
+        self.rng = random.Random(args.seed + vu_id)
+        self.email = None
+        self.submitted = False
+        self.accounts = 0
+
+    async def call(self, endpoint: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        self.stats.record(endpoint, time.perf_counter() - started, ok)
+        return response
+
+    def headers(self):
+        return {"token": self.email}
+
+    async def signup(self):
+        self.accounts += 1
+        self.email = f"load{self.vu_id}-{self.accounts}@bizit.kr"
+        self.submitted = False
+        await self.call("POST /api/user/signup", "POST", "/api/user/signup", json={
+            "user_email": self.email, "password": "pw", "biz_name": "부하테스트", "user_name": "테스터"
+        })
+
+    async def submit(self):
+        store = datasets.make_store_doc(self.email, "11740700", "CS100001", self.rng, self.args.months)
+        body = {key: store[key] for key in (
+            "sector_name", "sales_logs", "fixed_cost", "delivery", "menus", "scale", "operation", "goals"
+        )}
+        body["sector_name"] = datasets.SECTOR_NAME
+        body["location"] = {"address": f"서울 강동구 부하로 {self.rng.randint(1, 500)}"}
+        response = await self.call("POST /api/store/submit", "POST", "/api/store/submit", json=body, headers=self.headers())
+        self.submitted = response is not None and response.status_code == 200
+
+    async def dashboard(self):
+        # 제출 직후라면 isAnalyzing이 풀릴 때까지 폴링 (최대 poll_timeout 초)
+        deadline = time.monotonic() + self.args.poll_timeout
+        while True:
+            response = await self.call("GET /api/store/dashboard", "GET", "/api/store/dashboard", headers=self.headers())
+            if response is None or response.status_code != 200:
+                return
+            if not response.json().get("isAnalyzing") or time.monotonic() > deadline:
+                return
+            await asyncio.sleep(self.args.poll_interval)
+
+    async def chat(self):
+        await self.call("POST /api/chat/conversation", "POST", "/api/chat/conversation",
+                        json={"message": "이번 달 매출을 올리려면 어떻게 해야 하나요?"}, headers=self.headers())
+
+    async def run(self, stop_at: float, mix: dict):
+        await self.signup()
+        names = list(mix)
+        weights = [mix[n] for n in names]
+        while time.monotonic() < stop_at:
+            action = self.rng.choices(names, weights)[0]
+            if action == "signup":
+                await self.signup()
+            elif action == "submit" or not self.submitted:
+                await self.submit()
+            elif action == "dashboard":
+                await self.dashboard()
+            elif action == "chat":
+                await self.chat()
+            await asyncio.sleep(self.rng.uniform(0, self.args.think_time))
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("stub 서버가 시작되지 않았습니다.")
+
+
+async def drive(args) -> dict:
+    base_url = f"http://127.0.0.1:{args.port}"
+    limits = httpx.Limits(max_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        await wait_ready(client)
+        await client.get("/__loadtest/lag", params={"reset": True})
+
+        stats = Stats()
+        mix = parse_mix(args.mix)
+        started = time.monotonic()
+        stop_at = started + args.duration
+        users = [VirtualUser(client, stats, args, i) for i in range(args.users)]
+        await asyncio.gather(*(u.run(stop_at, mix) for u in users))
+        wall = time.monotonic() - started
+
+        lag = (await client.get("/__loadtest/lag")).json()
+        return {
+            "params": vars(args),
+            "wall_seconds": round(wall, 2),
+            "endpoints": stats.report(wall),
+            "event_loop_lag": lag,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BIZIT 부하 테스트 (제출 폭주 + 대시보드 폴링)")
+    parser.add_argument("--users", type=int, default=50, help="동시 가상 사용자 수")
+    parser.add_argument("--duration", type=float, default=60, help="부하 지속 시간(초)")
+    parser.add_argument("--mix", default="signup=1,submit=2,dashboard=10,chat=1", help="트래픽 비율")
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--poll-timeout", type=float, default=30.0)
+    parser.add_argument("--think-time", type=float, default=0.5, help="요청 사이 최대 대기(초)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--kakao-ms", type=float, default=80)
+    parser.add_argument("--data-go-kr-ms", type=float, default=300)
+    parser.add_argument("--gemini-ms", type=float, default=3000)
+    parser.add_argument("--chat-ms", type=float, default=1500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (없으면 표준 출력)")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.update({
+        "STUB_KAKAO_MS": str(args.kakao_ms),
+        "STUB_DATA_GO_KR_MS": str(args.data_go_kr_ms),
+        "STUB_GEMINI_MS": str(args.gemini_ms),
+        "STUB_CHAT_MS": str(args.chat_ms),
+        "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+    })
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.stub_app:app",
+         "--port", str(args.port), "--log-level", "warning", "--no-access-log"],
+        cwd=datasets.BASE_DIR, env=env,
+    )
+    try:
+        report = asyncio.run(drive(args))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+분석 / 솔루션 컨텍스트 / CSV 파싱 / 대시보드 핫패스 벤치마크.
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.run --stores 200 --dongs 120 --sectors 40 --iterations 50 --output bench.json
+
+인메모리 Mongo(mongomock-motor)와 외부 API 스텁 위에서 실행하며,
+시나리오별 지연 시간 백분위(p50/p95/p99), 처리량, 최대 RSS를 JSON으로 출력합니다.
+커밋 간 비교는 `python -m benchmarks.compare old.json new.json`.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks import datasets
+from benchmarks.fakes import install_fake_mongo, install_external_stubs
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def peak_rss_mb() -> float:
+    # 리눅스는 KB, macOS는 바이트 단위
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def summarize(name: str, samples: list, wall: float) -> dict:
+    ordered = sorted(samples)
+    return {
+        "scenario": name,
+        "iterations": len(samples),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3) if samples else 0.0,
+        "throughput_per_s": round(len(samples) / wall, 2) if wall > 0 else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def measure(name: str, func, iterations: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        await func()
+    samples = []
+    wall_start = time.perf_counter()
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - started)
+    return summarize(name, samples, time.perf_counter() - wall_start)
+
+
+def population_memory(path: str, population: dict) -> dict:
+    """유동인구 데이터: 기본 read_csv 대비 상주 DataFrame 크기"""
+    import pandas as pd
+    naive = pd.read_csv(path).memory_usage(deep=True).sum()
+    resident = population["frame"].memory_usage(deep=True).sum()
+    return {
+        "rows": len(population["frame"]),
+        "naive_mb": round(naive / 1024 / 1024, 3),
+        "resident_mb": round(resident / 1024 / 1024, 3),
+        "reduction": round(naive / resident, 2) if resident else None,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=datasets.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+async def seed_database(db, args, dongs, sectors, rng):
+    from api.sales_store import save_sales_logs
+
+    users = []
+    for i in range(args.stores):
+        user_id = f"bench{i}@bizit.test"
+        store = datasets.make_store_doc(user_id, rng.choice(dongs), rng.choice(sectors), rng, args.months)
+        await save_sales_logs(user_id, store.pop("sales_logs"), replace=True)
+        await db["storeInfo"].insert_one(store)
+        await db["surroundingInfo"].insert_one(datasets.make_surrounding_doc(
+            user_id, store["location"]["lat"], store["location"]["lng"], rng, args.surrounding
+        ))
+        for j in range(4):
+            await db["solutionInfo"].insert_one({
+                "user_id": user_id, "title": f"전략 {j}", "solution": "벤치마크용 솔루션 " * 20,
+                "generation": 1, "created_at": datetime.now()
+            })
+        users.append(user_id)
+    return users
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    db = install_fake_mongo()
+    install_external_stubs(seed=args.seed)
+
+    import api.analysis as analysis
+    import api.solution as solution
+    import api.store as store
+    from api.sales_store import load_sales_logs
+    from core.dataset_registry import registry
+    from starlette.datastructures import UploadFile
+
+    workdir = tempfile.mkdtemp(prefix="bizit-bench-")
+    dongs, sectors = datasets.make_codes(args.dongs, args.sectors)
+    market_csv = datasets.write_market_csv(os.path.join(workdir, "서울상권_추정매출.csv"), dongs, sectors, seed=args.seed)
+    population_csv = datasets.write_population_csv(os.path.join(workdir, "서울상권_소득소비_유동인구.csv"), dongs, seed=args.seed)
+    registry.set_source("market", market_csv)
+    registry.set_source("population", population_csv)
+
+    users = await seed_database(db, args, dongs, sectors, rng)
+    results = []
+
+    # 1. run_analysis (첫 실행은 CSV 인덱스 생성 포함 → 별도 측정)
+    started = time.perf_counter()
+    await analysis.run_analysis(users[0])
+    results.append(summarize("run_analysis_cold", [time.perf_counter() - started], time.perf_counter() - started))
+
+    async def bench_analysis():
+        await analysis.run_analysis(rng.choice(users))
+    results.append(await measure("run_analysis", bench_analysis, args.iterations))
+
+    # 2. 솔루션 프롬프트용 CSV 컨텍스트 생성
+    async def bench_solution_context():
+        user_id = rng.choice(users)
+        store_doc = await db["storeInfo"].find_one({"user_id": user_id})
+        store_doc["sales_logs"] = await load_sales_logs(user_id)
+        admin_code, sector_code, quarters = solution.extract_search_criteria(store_doc)
+        quarters = quarters or datasets.QUARTERS[-2:]
+        population = await registry.get("population")
+        solution.get_population_data(population.data, admin_code, quarters)
+        market = await registry.get("market")
+        solution.get_sales_data(market.data, admin_code, sector_code, quarters)
+    results.append(await measure("solution_context", bench_solution_context, max(1, args.iterations // 5)))
+    memory = {"population": population_memory(population_csv, (await registry.get("population")).data)}
+
+    # 3. 매출 CSV 업로드 파싱
+    for label, rows in (("parse_store_csv_small", 1_000), ("parse_store_csv_large", args.upload_rows)):
+        payload = datasets.make_sales_upload(rows, daily=True, seed=args.seed)
+
+        async def bench_parse(payload=payload):
+            upload = UploadFile(file=io.BytesIO(payload), filename="sales.csv")
+            await store.parse_store_csv(file=upload, current_user=users[0])
+        result = await measure(label, bench_parse, max(1, args.iterations // 5))
+        result["upload_bytes"] = len(payload)
+        results.append(result)
+
+    # 4. 대시보드 조회 (분석 결과가 있는 사용자 대상)
+    analysed = [u for u in users if await db["analysisInfo"].find_one({"user_email": u}, {"_id": 1})]
+
+    async def bench_dashboard():
+        await store.get_dashboard_data(current_user=rng.choice(analysed))
+    results.append(await measure("get_dashboard_data", bench_dashboard, args.iterations))
+
+    return {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": vars(args),
+        "results": results,
+        "memory": memory,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BIZIT 핫패스 벤치마크")
+    parser.add_argument("--stores", type=int, default=200)
+    parser.add_argument("--months", type=int, default=24, help="매장당 매출 개월 수")
+    parser.add_argument("--dongs", type=int, default=120, help="합성 상권 CSV의 행정동 수")
+    parser.add_argument("--sectors", type=int, default=40, help="합성 상권 CSV의 업종 수")
+    parser.add_argument("--surrounding", type=int, default=800, help="2km 반경 주변 상가 좌표 수")
+    parser.add_argument("--upload-rows", type=int, default=100_000, help="대용량 업로드 CSV 행 수")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (없으면 표준 출력)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+부하 테스트용 앱 진입점: 실제 api.main.app에 로컬 대역(인메모리 Mongo, 외부 API 스텁)을 끼워 띄웁니다.
+
+    uvicorn benchmarks.stub_app:app --port 8765
+
+스텁 지연 시간은 환경 변수(STUB_KAKAO_MS, STUB_DATA_GO_KR_MS, STUB_GEMINI_MS, STUB_CHAT_MS)로 조절합니다.
+/__loadtest/lag 에서 서버 이벤트 루프 지연(lag) 통계를 돌려줍니다.
+
+스텁 배선 점검 (가입 → 제출 → 대시보드 → 챗봇을 한 번씩 호출, 5xx나 예외가 나면 실패, 스텁 지연 기본값 0):
+
+    python -m benchmarks.stub_app --smoke
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from collections import deque
+from contextlib import asynccontextmanager
+
+from benchmarks import datasets
+from benchmarks.fakes import install_fake_mongo, install_external_stubs, install_chat_stub
+
+SMOKE = __name__ == "__main__" and "--smoke" in sys.argv
+
+
+def _stub_ms(name: str, default: str) -> float:
+    return float(os.getenv(name, "0" if SMOKE else default))
+
+
+db = install_fake_mongo()
+install_external_stubs(
+    kakao_ms=_stub_ms("STUB_KAKAO_MS", "80"),
+    data_go_kr_ms=_stub_ms("STUB_DATA_GO_KR_MS", "300"),
+    gemini_ms=_stub_ms("STUB_GEMINI_MS", "3000"),
+)
+install_chat_stub(gemini_ms=_stub_ms("STUB_CHAT_MS", "1500"))
+
+from core.dataset_registry import registry
+from api.main import app
+
+LAG_INTERVAL = float(os.getenv("LAG_SAMPLE_INTERVAL", "0.05"))
+lag_samples = deque(maxlen=200_000)
+
+
+async def sample_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LAG_INTERVAL)
+        lag_samples.append(max(0.0, loop.time() - started - LAG_INTERVAL))
+
+
+_original_lifespan = app.router.lifespan_context
+
+
+@asynccontextmanager
+async def lifespan(app_):
+    async with _original_lifespan(app_):
+        workdir = tempfile.mkdtemp(prefix="bizit-load-")
+        dongs, sectors = datasets.make_codes(int(os.getenv("STUB_DONGS", "120")), int(os.getenv("STUB_SECTORS", "40")))
+        registry.set_source("market", datasets.write_market_csv(os.path.join(workdir, "서울상권_추정매출.csv"), dongs, sectors))
+        await db["code_mapping"].insert_one({
+            "code_cs": sectors[0], "so_code": "I20101",
+            "ksic_list": [{"name": datasets.SECTOR_NAME, "code": "56111"}]
+        })
+        sampler = asyncio.create_task(sample_loop_lag())
+        yield
+        sampler.cancel()
+
+
+app.router.lifespan_context = lifespan
+
+
+@app.get("/__loadtest/lag", include_in_schema=False)
+async def loop_lag(reset: bool = False):
+    samples = sorted(lag_samples)
+    if reset:
+        lag_samples.clear()
+
+    def pct(p):
+        return round(samples[int((len(samples) - 1) * p)] * 1000, 3) if samples else 0.0
+
+    return {
+        "samples": len(samples),
+        "interval_ms": LAG_INTERVAL * 1000,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": round(samples[-1] * 1000, 3) if samples else 0.0,
+    }
+
+
+# =================================================================
+# 스텁 배선 점검: 부하 테스트가 쓰는 경로를 한 번씩 호출
+# - 실제 앱 함수 시그니처가 바뀌었는데 스텁이 따라가지 못하면 여기서 바로 드러남
+# =================================================================
+def smoke() -> int:
+    import random
+
+    from fastapi.testclient import TestClient
+
+    email = "smoke@bizit.kr"
+    headers = {"token": email}
+    store = datasets.make_store_doc(email, "11740700", "CS100001", random.Random(0), 12)
+    body = {key: store[key] for key in (
+        "sector_name", "sales_logs", "fixed_cost", "delivery", "menus", "scale", "operation", "goals"
+    )}
+    body["sector_name"] = datasets.SECTOR_NAME
+    body["location"] = {"address": "서울 강동구 점검로 1"}
+
+    steps = [
+        ("POST /api/user/signup", "POST", "/api/user/signup", {"json": {
+            "user_email": email, "password": "pw", "biz_name": "점검", "user_name": "테스터"
+        }}),
+        ("POST /api/store/submit", "POST", "/api/store/submit", {"json": body, "headers": headers}),
+        ("GET /api/store/dashboard", "GET", "/api/store/dashboard", {"headers": headers}),
+        ("POST /api/chat/conversation", "POST", "/api/chat/conversation", {
+            "json": {"message": "이번 달 매출을 올리려면 어떻게 해야 하나요?"}, "headers": headers
+        }),
+    ]
+    failed = 0
+    # raise_server_exceptions=True: 백그라운드 분석에서 난 예외도 그대로 실패로 잡힘
+    with TestClient(app) as client:
+        for name, method, url, kwargs in steps:
+            try:
+                response = client.request(method, url, **kwargs)
+                status = response.status_code
+            except Exception as e:
+                status = f"{type(e).__name__}: {e}"
+            ok = isinstance(status, int) and status < 500
+            failed += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {name} -> {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    if not SMOKE:
+        raise SystemExit("사용법: python -m benchmarks.stub_app --smoke  (서버로 띄울 때는 uvicorn benchmarks.stub_app:app)")
+    raise SystemExit(smoke())
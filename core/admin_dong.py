@@ -0,0 +1,269 @@
+# 오프라인 행정동 판별 (좌표 → 행정동 코드/이름)
+# - data_set/ 의 서울 행정동 경계 GeoJSON을 레지스트리 데이터셋으로 로딩 (파일이 바뀌면 자동 교체)
+# - 경계 사각형으로 STR 방식 R-tree를 만들고, 후보 행정동만 점-다각형 포함 검사
+# - 단건(resolve_admin_dong)과 배치용 대량 판별(resolve_many) 지원
+# - 경계 파일이 없거나 경계 밖 좌표면 None → 호출하는 쪽에서 Kakao h_code로 대체
+import asyncio
+import json
+import math
+
+from core.dataset_registry import registry
+from core.logger import get_logger
+
+# 예: https://github.com/vuski/admdongkor 의 HangJeongDong_ver*.geojson 에서 서울만 추린 파일
+ADMIN_DONG_PATTERN = "서울_행정동_경계*.geojson"
+# R-tree 노드 하나에 담는 자식 수
+RTREE_NODE_SIZE = 16
+# 대량 판별 시 (좌표 수 x 경계 변 수) 한 번에 계산할 최대 크기
+BULK_CHUNK_CELLS = 2_000_000
+
+# 상권 CSV의 행정동_코드(8자리)와 맞추기 위해 10자리 코드는 앞 8자리만 사용
+CODE_PROPERTIES = ("adm_cd2", "ADSTRD_CD", "adm_cd8", "h_code")
+NAME_PROPERTIES = ("adm_nm", "ADSTRD_NM", "dong_name")
+
+logger = get_logger("admin_dong")
+
+
+def _feature_rings(geometry: dict) -> list:
+    if not geometry:
+        return []
+    if geometry.get("type") == "Polygon":
+        return list(geometry.get("coordinates") or [])
+    if geometry.get("type") == "MultiPolygon":
+        return [ring for polygon in geometry.get("coordinates") or [] for ring in polygon]
+    return []
+
+
+def _first_property(props: dict, keys: tuple) -> str:
+    for key in keys:
+        value = props.get(key)
+        if value:
+            return str(value)
+    return ""
+
+
+def _build_str_tree(bboxes):
+    """
+    STR(Sort-Tile-Recursive) 벌크 적재 R-tree.
+    리프는 x 중심으로 세로 띠를 나눈 뒤 띠 안에서 y 중심으로 정렬하고, 위 레벨은 연속한 노드를 묶음.
+    반환: (리프 순서, levels) - levels[0]은 리프 경계, 위 레벨은 (경계 배열, 자식 시작/끝 인덱스 배열)
+    """
+    import numpy as np
+
+    count = len(bboxes)
+    slices = math.ceil(math.sqrt(math.ceil(count / RTREE_NODE_SIZE)))
+    per_slice = slices * RTREE_NODE_SIZE
+    cx = (bboxes[:, 0] + bboxes[:, 2]) / 2
+    cy = (bboxes[:, 1] + bboxes[:, 3]) / 2
+    by_x = np.argsort(cx, kind="stable")
+    order = np.concatenate([
+        strip[np.argsort(cy[strip], kind="stable")]
+        for strip in (by_x[start:start + per_slice] for start in range(0, count, per_slice))
+    ])
+
+    boxes = bboxes[order]
+    levels = [(boxes, None)]
+    while len(boxes) > 1:
+        starts = np.arange(0, len(boxes), RTREE_NODE_SIZE)
+        stops = np.minimum(starts + RTREE_NODE_SIZE, len(boxes))
+        boxes = np.stack([
+            np.minimum.reduceat(boxes[:, 0], starts),
+            np.minimum.reduceat(boxes[:, 1], starts),
+            np.maximum.reduceat(boxes[:, 2], starts),
+            np.maximum.reduceat(boxes[:, 3], starts),
+        ], axis=1)
+        levels.append((boxes, np.stack([starts, stops], axis=1)))
+    return order, levels
+
+
+def build_admin_dong_index(files: list):
+    """GeoJSON → {codes, names, edges, bboxes, levels}. (동기 함수 - 레지스트리가 스레드에서 실행)"""
+    import numpy as np
+
+    codes, names, bboxes, edges = [], [], [], []
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            collection = json.load(f)
+        for feature in collection.get("features", []):
+            props = feature.get("properties") or {}
+            code = _first_property(props, CODE_PROPERTIES)[:8]
+            rings = [np.asarray(ring, dtype=np.float64)[:, :2] for ring in _feature_rings(feature.get("geometry"))]
+            rings = [ring for ring in rings if len(ring) >= 3]
+            if not code or not rings:
+                continue
+
+            # 변 목록 (x1, y1, x2, y2) - 외곽/구멍 링을 모두 합쳐 홀짝 규칙으로 판별
+            feature_edges = np.concatenate([
+                np.hstack([ring, np.roll(ring, -1, axis=0)]) for ring in rings
+            ])
+            points = np.concatenate(rings)
+            codes.append(code)
+            names.append(_first_property(props, NAME_PROPERTIES).split(" ")[-1])
+            bboxes.append([points[:, 0].min(), points[:, 1].min(), points[:, 0].max(), points[:, 1].max()])
+            edges.append(feature_edges)
+
+    if not codes:
+        logger.error("행정동 경계 파일에서 읽은 다각형 없음", extra={"files": files})
+        return None
+
+    bboxes = np.asarray(bboxes, dtype=np.float64)
+    order, levels = _build_str_tree(bboxes)
+    return {
+        # 리프 순서(order)에 맞춰 재배열
+        "codes": [codes[i] for i in order],
+        "names": [names[i] for i in order],
+        "edges": [edges[i] for i in order],
+        "bboxes": levels[0][0],
+        "levels": levels,
+    }
+
+
+def _contains(edges, lng: float, lat: float) -> bool:
+    import numpy as np
+
+    x1, y1, x2, y2 = edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+    straddle = (y1 > lat) != (y2 > lat)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_cross = x1 + (lat - y1) * (x2 - x1) / (y2 - y1)
+    return bool(np.count_nonzero(straddle & (lng < x_cross)) & 1)
+
+
+def _candidates(index: dict, lng: float, lat: float) -> list:
+    """R-tree를 위에서부터 내려가며 좌표를 포함하는 리프(행정동) 인덱스 목록"""
+    levels = index["levels"]
+    nodes = [0]
+    for level in range(len(levels) - 1, 0, -1):
+        boxes, ranges = levels[level]
+        next_nodes = []
+        for node in nodes:
+            if not (boxes[node, 0] <= lng <= boxes[node, 2] and boxes[node, 1] <= lat <= boxes[node, 3]):
+                continue
+            next_nodes.extend(range(ranges[node, 0], ranges[node, 1]))
+        nodes = next_nodes
+    leaf_boxes = levels[0][0]
+    return [
+        i for i in nodes
+        if leaf_boxes[i, 0] <= lng <= leaf_boxes[i, 2] and leaf_boxes[i, 1] <= lat <= leaf_boxes[i, 3]
+    ]
+
+
+def resolve_point(index: dict, lat: float, lng: float):
+    """(admin_code, dong_name) 또는 None"""
+    for i in _candidates(index, lng, lat):
+        if _contains(index["edges"][i], lng, lat):
+            return index["codes"][i], index["names"][i]
+    return None
+
+
+def resolve_points(index: dict, lats, lngs) -> list:
+    """
+    대량 판별 (백필/배치용). 행정동마다 경계 사각형으로 후보 좌표를 고른 뒤
+    (후보 좌표 x 변) 브로드캐스트로 한 번에 포함 검사. 결과는 입력 순서대로 (code, name) 또는 None
+    """
+    import numpy as np
+
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    owner = np.full(len(lats), -1, dtype=np.int64)
+
+    for i, box in enumerate(index["bboxes"]):
+        candidate = np.flatnonzero(
+            (owner < 0) & (lngs >= box[0]) & (lngs <= box[2]) & (lats >= box[1]) & (lats <= box[3])
+        )
+        if len(candidate) == 0:
+            continue
+        edges = index["edges"][i]
+        x1, y1, x2, y2 = (edges[:, k][None, :] for k in range(4))
+        step = max(1, BULK_CHUNK_CELLS // len(edges))
+        for start in range(0, len(candidate), step):
+            idx = candidate[start:start + step]
+            px = lngs[idx][:, None]
+            py = lats[idx][:, None]
+            straddle = (y1 > py) != (y2 > py)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                x_cross = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+            inside = (np.count_nonzero(straddle & (px < x_cross), axis=1) & 1).astype(bool)
+            owner[idx[inside]] = i
+
+    return [
+        (index["codes"][i], index["names"][i]) if i >= 0 else None
+        for i in owner.tolist()
+    ]
+
+
+registry.register("admin_dong", ADMIN_DONG_PATTERN, build_admin_dong_index)
+
+
+async def resolve_admin_dong(lat: float, lng: float):
+    """좌표가 속한 (행정동 코드 8자리, 행정동 이름). 경계 파일이 없거나 경계 밖이면 None"""
+    snapshot = await registry.get("admin_dong")
+    if snapshot is None or lat is None or lng is None:
+        return None
+    return resolve_point(snapshot.data, lat, lng)
+
+
+async def resolve_many(coords: list) -> list:
+    """[(lat, lng), ...] → [(code, name) 또는 None, ...] (이벤트 루프를 막지 않도록 스레드에서 계산)"""
+    snapshot = await registry.get("admin_dong")
+    if snapshot is None or not coords:
+        return [None] * len(coords)
+    lats = [c[0] for c in coords]
+    lngs = [c[1] for c in coords]
+    return await asyncio.to_thread(resolve_points, snapshot.data, lats, lngs)
+
+
+# =================================================================
+# 백필: 저장된 매장 좌표로 행정동 코드를 다시 계산 (python -m core.admin_dong)
+# =================================================================
+async def backfill_admin_codes(batch_size: int = 1000) -> int:
+    from pymongo import UpdateOne
+    from core.config import store_collection
+
+    async def flush(chunk):
+        resolved = await resolve_many([(s["location"]["lat"], s["location"]["lng"]) for s in chunk])
+        ops = []
+        for store, result in zip(chunk, resolved):
+            if result is None:
+                continue
+            code, name = result
+            if store["location"].get("admin_code") == code and store["location"].get("admin_dong_name") == name:
+                continue
+            # 행정동이 바뀌면 분석 입력이 바뀐 것이므로 입력 버전도 올림
+            ops.append(UpdateOne(
+                {"user_id": store["user_id"]},
+                {"$set": {"location.admin_code": code, "location.admin_dong_name": name},
+                 "$inc": {"input_version": 1}}
+            ))
+        if ops:
+            await store_collection.bulk_write(ops, ordered=False)
+        return len(ops)
+
+    if await registry.get("admin_dong") is None:
+        logger.error("행정동 경계 데이터가 없어 백필을 건너뜀")
+        return 0
+
+    updated = 0
+    chunk = []
+    cursor = store_collection.find(
+        {"location.lat": {"$ne": None}, "location.lng": {"$ne": None}},
+        {"_id": 0, "user_id": 1, "location": 1}
+    )
+    async for store in cursor:
+        chunk.append(store)
+        if len(chunk) >= batch_size:
+            updated += await flush(chunk)
+            chunk = []
+    if chunk:
+        updated += await flush(chunk)
+
+    logger.info("행정동 코드 백필 완료", extra={"updated": updated})
+    return updated
+
+
+if __name__ == "__main__":
+    from core.config import init_db
+    from core.logger import setup_logging
+
+    setup_logging()
+    init_db()
+    asyncio.run(backfill_admin_codes())
@@ -0,0 +1,147 @@
+# 응답 압축 (Accept-Encoding 협상: br > gzip)
+# - COMPRESS_MIN_BYTES 보다 작은 응답은 그대로 전송 (압축 오버헤드가 더 큼)
+# - 스트리밍 응답도 청크 단위로 압축
+# - brotli 패키지가 없으면 gzip만 사용
+import gzip
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# 동적 응답이므로 속도 위주의 낮은 품질 사용
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    """Accept-Encoding 헤더(q 값 포함)에서 사용할 인코딩을 고름. 없으면 None"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for name in candidates:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.compress = self._obj.process
+            self.flush = self._obj.flush
+            self.finish = self._obj.finish
+        else:
+            # gzip 헤더 포함 (wbits 16+)
+            self._obj = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.compress = self._obj.compress
+            self.flush = lambda: self._obj.flush(zlib.Z_SYNC_FLUSH)
+            self.finish = self._obj.flush
+
+
+def compress_body(encoding: str, body: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """순수 ASGI 압축 미들웨어 (starlette GZipMiddleware와 달리 brotli 협상 지원)"""
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "compressor": None, "passthrough": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # 본문 첫 청크를 볼 때까지 헤더 전송을 미룸
+                state["start"] = message
+                return
+
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            start = state["start"]
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if state["compressor"] is None:
+                headers = start.get("headers", [])
+                content_type = b""
+                already_encoded = False
+                for name, value in headers:
+                    if name == b"content-type":
+                        content_type = value
+                    elif name == b"content-encoding":
+                        already_encoded = True
+                compressible = content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES)
+
+                if already_encoded or not compressible or (not more_body and len(body) < self.minimum_size):
+                    state["passthrough"] = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                headers = [(n, v) for n, v in headers if n != b"content-length"]
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+                headers.append((b"vary", b"Accept-Encoding"))
+
+                if not more_body:
+                    # 한 번에 끝나는 응답은 길이를 알 수 있음
+                    compressed = compress_body(encoding, body)
+                    headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+                    start["headers"] = headers
+                    await send(start)
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+
+                start["headers"] = headers
+                state["compressor"] = _Compressor(encoding)
+                await send(start)
+
+            compressor = state["compressor"]
+            if more_body:
+                chunk = compressor.compress(body) + compressor.flush()
+            else:
+                chunk = compressor.compress(body) + compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,6 +1,6 @@
-from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 import os
+from core.metrics import timer, MONGO_OP_SECONDS
 
 load_dotenv()
 MONGO_URL = os.getenv("MONGO_URL")
@@ -8,16 +8,114 @@ KAKAO_API_KEY = os.getenv("KAKAO_API")
 DATA_GO_KR_API_KEY = os.getenv("DATA_GO_KR_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-#await 붙여야함- 비동기 실행
-client = AsyncIOMotorClient(MONGO_URL)
+# 챗봇 컨텍스트 설정 (최근 K턴만 원문 유지, 나머지는 요약)
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "6"))
+CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "4000"))
+# 사용자별 챗봇 모델 캐시 유지 시간(초) - 다른 워커에서 솔루션이 갱신된 경우 대비
+CHAT_MODEL_TTL = int(os.getenv("CHAT_MODEL_TTL", "600"))
+
+# 매출 파일 업로드 제한 (바이트)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+
+# 분석/솔루션 생성 lease 유지 시간(초) - 워커가 죽으면 이 시간 뒤 다른 워커가 이어받음
+JOB_LEASE_TTL = int(os.getenv("JOB_LEASE_TTL", "60"))
+JOB_LEASE_POLL = float(os.getenv("JOB_LEASE_POLL", "1.0"))
+
+# 분석/솔루션 재계산 방식
+# - inline: 매장 정보 제출 요청이 BackgroundTasks로 바로 실행
+# - worker: 제출은 저장만 하고, 재계산 워커(python -m api.recompute)가 storeInfo/storeSales 변경을 감지해 실행
+RECOMPUTE_MODE = os.getenv("RECOMPUTE_MODE", "inline")
+# 같은 매장의 연속 변경을 한 번으로 묶는 대기 시간(초), 변경 스트림을 못 쓸 때 폴링 주기(초)
+RECOMPUTE_DEBOUNCE = float(os.getenv("RECOMPUTE_DEBOUNCE", "2.0"))
+RECOMPUTE_POLL_INTERVAL = float(os.getenv("RECOMPUTE_POLL_INTERVAL", "5.0"))
+RECOMPUTE_CONCURRENCY = int(os.getenv("RECOMPUTE_CONCURRENCY", "4"))
+
+# 분석 이력 보관 기간(일) - 사용자/연도 버킷 단위로 마지막 기록 이후 이 기간이 지나면 삭제
+ANALYSIS_HISTORY_RETENTION_DAYS = int(os.getenv("ANALYSIS_HISTORY_RETENTION_DAYS", str(3 * 365)))
+
+# 행정동 x 업종 리더보드/히트맵에 노출할 최소 매장 수 (이보다 적으면 개별 매장 매출이 드러남)
+MIN_CELL_STORES = int(os.getenv("MIN_CELL_STORES", "3"))
+
+# 주변 상권(공공데이터) geohash 셀 캐시 - 6자리 셀은 약 1.2km x 0.6km, 기본 7일 유지
+SURROUNDING_CELL_PRECISION = int(os.getenv("SURROUNDING_CELL_PRECISION", "6"))
+SURROUNDING_CELL_TTL = int(os.getenv("SURROUNDING_CELL_TTL", str(7 * 24 * 3600)))
+
+# Mongo 클라이언트는 import 시점이 아니라 lifespan 시작(또는 첫 사용) 시점에 생성
+# motor import 자체도 이때까지 미룸
+client = None
+db = None
+
+
+def init_db():
+    global client, db
+    if db is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        #await 붙여야함- 비동기 실행
+        client = AsyncIOMotorClient(MONGO_URL)
+        db = client["BIZIT_DB"]
+    return db
+
+
+def close_db():
+    global client, db
+    if client is not None:
+        client.close()
+    client = None
+    db = None
+
+
+# 처리 시간을 기록할 Mongo 명령 (await 하는 것만 - find()는 커서라 제외)
+TIMED_MONGO_OPS = {
+    "find_one", "insert_one", "insert_many", "update_one", "update_many",
+    "delete_one", "delete_many", "count_documents", "find_one_and_update", "bulk_write"
+}
+
+
+def _timed_mongo_op(method, collection: str, op: str):
+    async def wrapper(*args, **kwargs):
+        with timer(MONGO_OP_SECONDS, collection=collection, op=op):
+            return await method(*args, **kwargs)
+    return wrapper
+
+
+class LazyCollection:
+    """
+    기존처럼 모듈 import 시점에 꺼내 쓸 수 있는 컬렉션 핸들.
+    실제 motor 컬렉션은 첫 메서드 호출 시에 연결됩니다.
+    """
+    def __init__(self, name: str):
+        self.name = name
+
+    def __getattr__(self, attr):
+        target = getattr(init_db()[self.name], attr)
+        if attr in TIMED_MONGO_OPS:
+            return _timed_mongo_op(target, self.name, attr)
+        return target
 
-db = client["BIZIT_DB"]
 
 #collection 생성
 #나중에 쓸때는 await users_collection.function(...)
-user_collection = db["users"]
-store_collection = db['storeInfo']
-solution_collection = db['solutionInfo']
-surrounding_collection = db['surroundingInfo']
-analysis_collection = db['analysisInfo']
-code_mapping_collection = db['code_mapping']
\ No newline at end of file
+user_collection = LazyCollection("users")
+store_collection = LazyCollection('storeInfo')
+# 매장 월별 매출 (매장 x 연도 버킷, storeInfo에는 매출 이력을 두지 않음)
+sales_collection = LazyCollection('storeSales')
+solution_collection = LazyCollection('solutionInfo')
+surrounding_collection = LazyCollection('surroundingInfo')
+# 주변 상권 셀 캐시 (업종 x geohash 셀, expires_at TTL 인덱스)
+surrounding_cell_collection = LazyCollection('surroundingCell')
+analysis_collection = LazyCollection('analysisInfo')
+# 분석 이력 (사용자 x 대상 연도 버킷, analysisInfo는 최신 결과만 유지)
+analysis_history_collection = LazyCollection('analysisHistory')
+# 행정동 x 업종 분석 집계 (분석 저장 때 증분 갱신) / 매장별 현재 기여분
+cell_stats_collection = LazyCollection('dongSectorStats')
+cell_member_collection = LazyCollection('dongSectorMember')
+code_mapping_collection = LazyCollection('code_mapping')
+# 재계산 워커 상태 (매장별 마지막 입력 해시, 변경 스트림 resume token / 폴링 기준 시각)
+recompute_state_collection = LazyCollection('recomputeState')
+# 분석/솔루션 생성 단일 실행용 lease (워커 간 중복 실행 방지)
+job_lease_collection = LazyCollection('jobLease')
+# 상권 데이터셋 버전 이력
+dataset_version_collection = LazyCollection('datasetVersion')
+# 매출 예측 결과 캐시
+forecast_collection = LazyCollection('forecastInfo')
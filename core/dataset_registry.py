@@ -0,0 +1,173 @@
+# 상권 데이터셋 레지스트리 (data_set/ 감시 → 백그라운드 재생성 → 원자적 교체)
+# - 데이터셋마다 파일 패턴(glob)과 빌더 함수(파일 목록 → 인덱스/집계)를 등록
+# - 감시 루프가 파일 목록/수정 시각/크기 지문(fingerprint)을 주기적으로 비교해서 바뀌면 스레드에서 다시 빌드
+# - 빌드가 끝나면 스냅샷 참조만 바꿔 끼움 → 진행 중인 요청은 이전 스냅샷을 그대로 사용
+# - 스냅샷마다 버전 문자열이 있어 분석 결과에 어떤 데이터로 계산했는지 기록 가능
+import asyncio
+import glob
+import hashlib
+import os
+from datetime import datetime
+
+from core.config import dataset_version_collection
+from core.logger import get_logger
+from core.metrics import timer, record_cache, STAGE_SECONDS
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data_set")
+# 0이면 감시하지 않음 (처음 사용할 때 한 번만 로딩)
+DATASET_WATCH_INTERVAL = float(os.getenv("DATASET_WATCH_INTERVAL", "30"))
+
+logger = get_logger("datasets")
+
+
+class DatasetSnapshot:
+    def __init__(self, name: str, version: str, data, files: list, fingerprint: str):
+        self.name = name
+        self.version = version
+        self.data = data
+        self.files = files
+        self.fingerprint = fingerprint
+        self.loaded_at = datetime.utcnow()
+
+
+class DatasetRegistry:
+    def __init__(self, data_dir: str = DATA_DIR):
+        self.data_dir = data_dir
+        self.sources = {}     # 이름 -> 파일 패턴 (data_dir 기준 상대 경로 또는 절대 경로)
+        self.builders = {}    # 이름 -> 빌더 (동기 함수, 스레드에서 실행)
+        self.snapshots = {}   # 이름 -> 현재 DatasetSnapshot
+        self.listeners = {}   # 이름 -> [async fn(old, new, first_claim)]
+        self.locks = {}
+        self.missing = set()  # 파일 없음을 이미 기록한 데이터셋 (선택 데이터셋이 매 요청 로그를 남기지 않도록)
+        self.watch_task = None
+
+    def register(self, name: str, pattern: str, builder):
+        # set_source로 먼저 지정된 위치가 있으면 유지
+        self.sources.setdefault(name, pattern)
+        self.builders[name] = builder
+        self.listeners.setdefault(name, [])
+        self.locks.setdefault(name, asyncio.Lock())
+
+    def set_source(self, name: str, pattern: str):
+        """파일 위치 변경 (벤치마크 / 로컬 실험용). 다음 조회 때 다시 빌드됨"""
+        self.sources[name] = pattern
+        self.snapshots.pop(name, None)
+
+    def on_swap(self, name: str, listener):
+        self.listeners.setdefault(name, []).append(listener)
+
+    def files(self, name: str) -> list:
+        pattern = self.sources[name]
+        if not os.path.isabs(pattern):
+            pattern = os.path.join(self.data_dir, pattern)
+        # 분기별 파일이 여러 개면 이름 순서대로 (뒤 파일이 앞 파일의 같은 키를 덮어씀)
+        return sorted(glob.glob(pattern))
+
+    @staticmethod
+    def fingerprint(files: list) -> str:
+        digest = hashlib.sha1()
+        for path in files:
+            stat = os.stat(path)
+            digest.update(f"{os.path.basename(path)}|{stat.st_mtime_ns}|{stat.st_size};".encode("utf-8"))
+        return digest.hexdigest()[:12]
+
+    def current(self, name: str):
+        """I/O 없이 현재 스냅샷만 돌려줌 (아직 없으면 None)"""
+        return self.snapshots.get(name)
+
+    async def get(self, name: str):
+        snapshot = self.snapshots.get(name)
+        if snapshot is not None:
+            record_cache(f"dataset_{name}", True)
+            return snapshot
+        record_cache(f"dataset_{name}", False)
+        return await self.reload(name)
+
+    async def reload(self, name: str):
+        """파일 지문이 바뀌었으면 다시 빌드해서 교체. 현재(또는 새) 스냅샷 반환"""
+        async with self.locks[name]:
+            files = await asyncio.to_thread(self.files, name)
+            if not files:
+                if name not in self.missing:
+                    self.missing.add(name)
+                    logger.error("데이터셋 파일 없음", extra={"dataset": name, "pattern": self.sources[name]})
+                return self.snapshots.get(name)
+            self.missing.discard(name)
+
+            fingerprint = await asyncio.to_thread(self.fingerprint, files)
+            old = self.snapshots.get(name)
+            if old is not None and old.fingerprint == fingerprint:
+                return old
+
+            with timer(STAGE_SECONDS, stage=f"dataset_build_{name}"):
+                data = await asyncio.to_thread(self.builders[name], files)
+            if not data:
+                return old
+
+            label = data.get("latest_quarter", "") if isinstance(data, dict) else ""
+            version = f"{label}.{fingerprint[:8]}" if label else fingerprint[:8]
+            new = DatasetSnapshot(name, version, data, files, fingerprint)
+            self.snapshots[name] = new
+            logger.info("데이터셋 교체", extra={
+                "dataset": name, "version": version,
+                "previous_version": old.version if old else None,
+                "files": [os.path.basename(f) for f in files]
+            })
+
+        first_claim = await self._record_version(new)
+        for listener in self.listeners.get(name, []):
+            try:
+                await listener(old, new, first_claim)
+            except Exception:
+                logger.exception("데이터셋 교체 후처리 실패", extra={"dataset": name, "version": new.version})
+        return new
+
+    async def _record_version(self, snapshot: DatasetSnapshot) -> bool:
+        """버전 이력 저장. 여러 워커 중 처음 기록한 워커만 True (후처리를 한 번만 하기 위함)"""
+        from pymongo.errors import DuplicateKeyError
+        try:
+            await dataset_version_collection.insert_one({
+                "_id": f"{snapshot.name}:{snapshot.version}",
+                "dataset": snapshot.name,
+                "version": snapshot.version,
+                "files": [os.path.basename(f) for f in snapshot.files],
+                "loaded_at": snapshot.loaded_at,
+            })
+            return True
+        except DuplicateKeyError:
+            return False
+        except Exception:
+            logger.exception("데이터셋 버전 기록 실패", extra={"dataset": snapshot.name})
+            return False
+
+    # -------------------------------------------------------------
+    # 감시 루프 (lifespan에서 시작/종료)
+    # -------------------------------------------------------------
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            for name in list(self.sources):
+                # 한 번도 사용하지 않은 데이터셋은 미리 만들지 않음
+                if name not in self.snapshots:
+                    continue
+                try:
+                    await self.reload(name)
+                except Exception:
+                    logger.exception("데이터셋 재생성 실패", extra={"dataset": name})
+
+    def start(self, interval: float = DATASET_WATCH_INTERVAL):
+        if interval > 0 and self.watch_task is None:
+            self.watch_task = asyncio.get_running_loop().create_task(self._watch(interval))
+
+    async def stop(self):
+        if self.watch_task is not None:
+            self.watch_task.cancel()
+            try:
+                await self.watch_task
+            except asyncio.CancelledError:
+                pass
+            self.watch_task = None
+
+
+registry = DatasetRegistry()
@@ -0,0 +1,113 @@
+# 좌표 계산 유틸 (외부 라이브러리 없이 순수 파이썬)
+# - geohash 인코딩 / 셀 경계 / 반경을 덮는 셀 목록
+# - 두 좌표 사이 거리 (haversine)
+import math
+
+EARTH_RADIUS_M = 6371008.8
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {ch: i for i, ch in enumerate(_BASE32)}
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """두 좌표 사이 거리(m)"""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def geohash_encode(lat: float, lng: float, precision: int) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits, value, even = 0, 0, True
+    while len(chars) < precision:
+        # 짝수 번째 비트는 경도, 홀수 번째 비트는 위도
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                value = value * 2 + 1
+                lng_lo = mid
+            else:
+                value = value * 2
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = value * 2 + 1
+                lat_lo = mid
+            else:
+                value = value * 2
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def geohash_bbox(cell: str) -> tuple:
+    """셀 경계 (min_lat, min_lng, max_lat, max_lng)"""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    even = True
+    for ch in cell:
+        value = _DECODE[ch]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                if bit:
+                    lng_lo = mid
+                else:
+                    lng_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lat_lo, lng_lo, lat_hi, lng_hi
+
+
+def geohash_cell_size(precision: int) -> tuple:
+    """셀 한 칸의 (위도 폭, 경도 폭) 도 단위"""
+    total = 5 * precision
+    lng_bits = (total + 1) // 2
+    lat_bits = total // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def _distance_to_bbox_m(lat: float, lng: float, bbox: tuple) -> float:
+    min_lat, min_lng, max_lat, max_lng = bbox
+    near_lat = min(max(lat, min_lat), max_lat)
+    near_lng = min(max(lng, min_lng), max_lng)
+    return haversine_m(lat, lng, near_lat, near_lng)
+
+
+def cells_covering(lat: float, lng: float, radius_m: float, precision: int) -> list:
+    """중심에서 radius_m 안에 조금이라도 걸치는 geohash 셀 목록"""
+    dlat, dlng = geohash_cell_size(precision)
+    span_lat = math.degrees(radius_m / EARTH_RADIUS_M)
+    span_lng = span_lat / max(math.cos(math.radians(lat)), 1e-6)
+
+    # 셀 격자에 맞춰 정렬한 뒤 한 칸씩 이동하며 셀 중심을 인코딩
+    lat_start = math.floor((lat - span_lat + 90.0) / dlat) * dlat - 90.0
+    lng_start = math.floor((lng - span_lng + 180.0) / dlng) * dlng - 180.0
+    rows = int(math.ceil((lat + span_lat - lat_start) / dlat))
+    cols = int(math.ceil((lng + span_lng - lng_start) / dlng))
+
+    cells = []
+    for i in range(rows):
+        center_lat = lat_start + (i + 0.5) * dlat
+        for j in range(cols):
+            center_lng = lng_start + (j + 0.5) * dlng
+            cell = geohash_encode(center_lat, center_lng, precision)
+            # 원에 닿지 않는 모서리 셀은 제외
+            if _distance_to_bbox_m(lat, lng, geohash_bbox(cell)) <= radius_m:
+                cells.append(cell)
+    return cells
@@ -0,0 +1,104 @@
+# 구조화 로그 (JSON 한 줄) + 요청 ID 연동
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from core.metrics import HTTP_REQUEST_SECONDS
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+# 요청마다 부여되는 ID (백그라운드 작업에도 그대로 전달됨)
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# LogRecord 기본 속성 (extra로 넘어온 필드만 골라내기 위함)
+_RESERVED = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": request_id_var.get(),
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def setup_logging():
+    root = logging.getLogger("bizit")
+    if root.handlers:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"bizit.{name}")
+
+
+class RequestContextMiddleware:
+    """
+    요청 ID 부여(X-Request-ID 헤더 재사용 가능) + 라우트별 처리 시간 기록.
+    BaseHTTPMiddleware 대신 순수 ASGI로 작성해 오버헤드를 줄임.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        started = time.perf_counter()
+        state = {"status": 500, "recorded": False}
+
+        def record():
+            # 응답 전송이 끝난 시점 기준 (뒤이어 실행되는 BackgroundTasks 시간은 제외)
+            if state["recorded"]:
+                return
+            state["recorded"] = True
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"], route=path, status=state["status"]
+            )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            record()
+            request_id_var.reset(token)
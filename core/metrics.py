@@ -0,0 +1,165 @@
+# 성능 계측 (Prometheus 텍스트 포맷)
+# 외부 호출 / 파이프라인 단계 / Mongo / LLM 토큰 / 캐시 적중률
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# 초 단위 기본 버킷 (Mongo 수 ms ~ Gemini 수십 초까지)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_metrics = {}
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple, extra: dict = None) -> str:
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{str(v)}"' for k, v in items)
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.values = {}  # label key -> [버킷별 개수..., 합계, 전체 개수]
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            data = self.values.get(key)
+            if data is None:
+                data = self.values[key] = [0] * (len(self.buckets) + 2)
+            if idx < len(self.buckets):
+                data[idx] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, data in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, {'le': bound})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, {'le': '+Inf'})} {data[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {data[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {data[-1]}")
+        return lines
+
+
+def counter(name: str, help_text: str = "") -> Counter:
+    with _lock:
+        if name not in _metrics:
+            _metrics[name] = Counter(name, help_text)
+        return _metrics[name]
+
+
+def histogram(name: str, help_text: str = "", buckets=DEFAULT_BUCKETS) -> Histogram:
+    with _lock:
+        if name not in _metrics:
+            _metrics[name] = Histogram(name, help_text, buckets)
+        return _metrics[name]
+
+
+def render_prometheus() -> str:
+    with _lock:
+        metrics = list(_metrics.values())
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# =================================================================
+# 공용 지표
+# =================================================================
+HTTP_REQUEST_SECONDS = histogram("bizit_http_request_seconds", "HTTP 요청 처리 시간")
+EXTERNAL_CALL_SECONDS = histogram("bizit_external_call_seconds", "외부 API 호출 시간 (Kakao, data.go.kr, Gemini)")
+STAGE_SECONDS = histogram("bizit_stage_seconds", "파이프라인 단계별 처리 시간")
+MONGO_OP_SECONDS = histogram("bizit_mongo_op_seconds", "Mongo 명령 처리 시간")
+LLM_TOKENS = counter("bizit_llm_tokens_total", "LLM 토큰 사용량")
+CACHE_REQUESTS = counter("bizit_cache_requests_total", "캐시 조회 결과 (hit / miss)")
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_llm_tokens(model: str, purpose: str, prompt_tokens, completion_tokens):
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, model=model, purpose=purpose, kind="prompt")
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, model=model, purpose=purpose, kind="completion")
+
+
+class timer:
+    """
+    컨텍스트 매니저 / 데코레이터 겸용 타이머.
+
+        with timer(EXTERNAL_CALL_SECONDS, service="kakao"):
+            ...
+
+        @timer(STAGE_SECONDS, stage="analysis")
+        async def run_analysis(...):
+    """
+    def __init__(self, metric: Histogram, **labels):
+        self.metric = metric
+        self.labels = labels
+
+    @contextmanager
+    def _measure(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.metric.observe(time.perf_counter() - started, **self.labels)
+
+    def __enter__(self):
+        self._ctx = self._measure()
+        return self._ctx.__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._ctx.__exit__(exc_type, exc, tb)
+
+    def __call__(self, func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with self._measure():
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self._measure():
+                return func(*args, **kwargs)
+        return wrapper
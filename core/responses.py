@@ -0,0 +1,37 @@
+# orjson 기반 JSON 응답
+# - Mongo 문서에 들어있는 datetime / ObjectId를 그대로 직렬화
+# - 라우터에서 직접 반환하면 FastAPI의 jsonable_encoder 단계를 건너뜀 (큰 응답일수록 차이가 큼)
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson이 없으면 표준 json으로 동작
+    orjson = None
+
+
+def _default(obj):
+    # ObjectId는 bson을 import하지 않고 타입 이름으로 판별 (motor 초기화 전에도 사용 가능)
+    if type(obj).__name__ == "ObjectId":
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "tolist"):  # numpy 배열 / 스칼라
+        return obj.tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,169 @@
+# 단일 실행(single-flight): (작업 종류, 사용자, 입력 버전)당 계산은 한 번만
+# - 같은 버전의 중복 요청(더블클릭, 프론트 재시도)은 진행 중인 실행에 합류해 같은 결과를 받음
+# - 더 새로운 버전이 들어오면 이전 버전 실행은 취소
+# - 워커 간에는 Mongo lease(jobLease 컬렉션)로 조율
+#     {_id: "analysis:<user>", version, owner, status: running|done|failed, expires_at}
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from core.config import job_lease_collection, JOB_LEASE_TTL, JOB_LEASE_POLL
+from core.logger import get_logger
+from core.metrics import counter
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+SINGLE_FLIGHT = counter("bizit_single_flight_total", "단일 실행 결과 (run / joined / stale / superseded)")
+
+logger = get_logger("singleflight")
+
+
+class _Flight:
+    def __init__(self, version: int):
+        self.version = version
+        self.task = None
+        self.superseded = False
+
+
+# 이 워커에서 진행 중인 실행: "종류:사용자" -> _Flight
+_inflight = {}
+
+
+async def _acquire_lease(key: str, version: int) -> str:
+    """lease 획득 시도. acquired / running(다른 워커가 같은 버전 실행 중) / done / stale"""
+    from pymongo.errors import DuplicateKeyError
+
+    now = datetime.utcnow()
+    try:
+        await job_lease_collection.find_one_and_update(
+            {"_id": key, "$or": [
+                {"version": {"$lt": version}},
+                {"version": version, "status": "failed"},
+                {"version": version, "status": "running", "expires_at": {"$lt": now}},
+            ]},
+            {"$set": {
+                "version": version,
+                "owner": WORKER_ID,
+                "status": "running",
+                "expires_at": now + timedelta(seconds=JOB_LEASE_TTL),
+            }},
+            upsert=True
+        )
+        return "acquired"
+    except DuplicateKeyError:
+        # 조건에 맞지 않는 lease가 이미 있음 → 누가 어떤 버전을 잡고 있는지 확인
+        lease = await job_lease_collection.find_one({"_id": key})
+        if lease is None:
+            return "running"  # 그 사이 삭제됨 → 다음 폴링에서 다시 시도
+        if lease["version"] > version:
+            return "stale"
+        if lease["status"] == "done":
+            return "done"
+        return "running"
+
+
+async def _keep_lease(key: str, flight: _Flight):
+    while True:
+        await asyncio.sleep(JOB_LEASE_TTL / 3)
+        result = await job_lease_collection.update_one(
+            {"_id": key, "owner": WORKER_ID, "version": flight.version},
+            {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=JOB_LEASE_TTL)}}
+        )
+        if result.matched_count == 0:
+            # 다른 워커가 더 새로운 버전으로 lease를 가져감
+            flight.superseded = True
+            flight.task.cancel()
+            return
+
+
+async def _release_lease(key: str, version: int, status: str):
+    await job_lease_collection.update_one(
+        {"_id": key, "owner": WORKER_ID, "version": version},
+        {"$set": {"status": status, "finished_at": datetime.utcnow()}}
+    )
+
+
+async def _execute(kind: str, key: str, flight: _Flight, func, args):
+    try:
+        while True:
+            state = await _acquire_lease(key, flight.version)
+            if state == "acquired":
+                break
+            if state in ("stale", "done"):
+                # 더 새로운 입력이 이미 처리 중이거나, 다른 워커가 같은 입력으로 끝냄 (결과는 DB에 있음)
+                SINGLE_FLIGHT.inc(kind=kind, result="stale" if state == "stale" else "joined")
+                return None
+            await asyncio.sleep(JOB_LEASE_POLL)
+
+        SINGLE_FLIGHT.inc(kind=kind, result="run")
+        heartbeat = asyncio.create_task(_keep_lease(key, flight))
+        status = "failed"
+        try:
+            result = await func(*args)
+            status = "done"
+            return result
+        finally:
+            heartbeat.cancel()
+            await _release_lease(key, flight.version, status)
+    except asyncio.CancelledError:
+        if flight.superseded:
+            SINGLE_FLIGHT.inc(kind=kind, result="superseded")
+            logger.info("새 입력 버전으로 이전 실행 취소", extra={"job": key, "version": flight.version})
+            return None
+        raise
+    finally:
+        if _inflight.get(key) is flight:
+            del _inflight[key]
+
+
+async def _wait(kind: str, flight: _Flight):
+    # 요청(백그라운드 작업)이 끊겨도 계산은 계속 진행되도록 shield
+    try:
+        return await asyncio.shield(flight.task)
+    except asyncio.CancelledError:
+        # 시작도 하기 전에 새 버전에 밀려 취소된 경우 (_execute의 except까지 가지 못함)
+        if flight.superseded and flight.task.cancelled():
+            SINGLE_FLIGHT.inc(kind=kind, result="superseded")
+            return None
+        raise
+
+
+async def is_running(kind: str, user_id: str, version: int) -> bool:
+    """해당 버전 계산이 (이 워커 또는 다른 워커에서) 아직 진행 중인지"""
+    key = f"{kind}:{user_id}"
+    version = version or 0
+    flight = _inflight.get(key)
+    if flight is not None and flight.version == version:
+        return True
+    lease = await job_lease_collection.find_one(
+        {"_id": key, "version": version, "status": "running", "expires_at": {"$gt": datetime.utcnow()}},
+        {"_id": 1}
+    )
+    return lease is not None
+
+
+async def single_flight(kind: str, user_id: str, version: int, func, *args):
+    """
+    func(*args)를 (kind, user_id, version)당 한 번만 실행하고 그 결과를 돌려줌.
+    더 새로운 버전에 밀려 취소되었거나 실행할 필요가 없었으면 None.
+    """
+    key = f"{kind}:{user_id}"
+    version = version or 0
+
+    flight = _inflight.get(key)
+    if flight is not None:
+        if flight.version == version:
+            SINGLE_FLIGHT.inc(kind=kind, result="joined")
+            return await _wait(kind, flight)
+        if flight.version > version:
+            SINGLE_FLIGHT.inc(kind=kind, result="stale")
+            return None
+        flight.superseded = True
+        flight.task.cancel()
+
+    flight = _Flight(version)
+    _inflight[key] = flight
+    flight.task = asyncio.create_task(_execute(kind, key, flight, func, args))
+    return await _wait(kind, flight)
@@ -0,0 +1,188 @@
+# 이벤트 루프 지연(lag) / 블로킹 호출 감시 (디버그용, 기본 꺼짐)
+# - 루프 안에서 하트비트 코루틴이 주기적으로 시각을 기록
+# - 별도 스레드가 하트비트가 멈춘 시간을 감시하다가 임계값을 넘으면
+#   루프 스레드의 현재 스택 + 당시 실행 중이던 요청 라우트를 로그로 남김
+# - 엄격 모드(LOOP_WATCHDOG_STRICT_MS)에서는 핸들러가 N ms 이상 루프를 막으면 요청을 실패시킴 (테스트용)
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+
+from core.logger import get_logger, request_id_var
+from core.metrics import counter, histogram
+
+LOOP_WATCHDOG = os.getenv("LOOP_WATCHDOG", "0").lower() in ("1", "true", "yes")
+LOOP_WATCHDOG_INTERVAL_MS = float(os.getenv("LOOP_WATCHDOG_INTERVAL_MS", "20"))
+LOOP_WATCHDOG_THRESHOLD_MS = float(os.getenv("LOOP_WATCHDOG_THRESHOLD_MS", "100"))
+# 0이면 끔. 값이 있으면 그 이상 루프를 막은 요청은 BlockingCallError로 실패
+LOOP_WATCHDOG_STRICT_MS = float(os.getenv("LOOP_WATCHDOG_STRICT_MS", "0"))
+
+LOOP_LAG_SECONDS = histogram(
+    "bizit_event_loop_lag_seconds", "이벤트 루프 지연 시간",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+LOOP_BLOCKED = counter("bizit_event_loop_blocked_total", "임계값 이상 루프를 막은 횟수 (라우트별)")
+
+logger = get_logger("watchdog")
+
+
+class BlockingCallError(RuntimeError):
+    pass
+
+
+class LoopWatchdog:
+    def __init__(self, interval_ms: float = LOOP_WATCHDOG_INTERVAL_MS,
+                 threshold_ms: float = LOOP_WATCHDOG_THRESHOLD_MS,
+                 strict_ms: float = LOOP_WATCHDOG_STRICT_MS):
+        self.interval = interval_ms / 1000
+        self.strict = strict_ms / 1000
+        # 엄격 모드 기준이 더 낮으면 그 기준부터 감지
+        self.threshold = min(threshold_ms, strict_ms) / 1000 if strict_ms else threshold_ms / 1000
+        self.loop = None
+        self.loop_thread_id = None
+        self.last_beat = time.monotonic()
+        self.heartbeat_task = None
+        self.thread = None
+        self.stopped = threading.Event()
+        # 요청 처리 task -> (ASGI scope, 요청 ID) (라우트 귀속용)
+        self.task_scopes = weakref.WeakKeyDictionary()
+        # 요청 task -> 엄격 모드 위반 내역
+        self.violations = weakref.WeakKeyDictionary()
+
+    # -------------------------------------------------------------
+    # 시작 / 종료 (lifespan에서 호출)
+    # -------------------------------------------------------------
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stopped.clear()
+        self.heartbeat_task = self.loop.create_task(self._heartbeat())
+        self.thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self.thread.start()
+        logger.info("이벤트 루프 감시 시작", extra={
+            "interval_ms": self.interval * 1000, "threshold_ms": self.threshold * 1000,
+            "strict_ms": self.strict * 1000
+        })
+
+    async def stop(self):
+        self.stopped.set()
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+            try:
+                await self.heartbeat_task
+            except asyncio.CancelledError:
+                pass
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+
+    async def _heartbeat(self):
+        while True:
+            started = time.monotonic()
+            self.last_beat = started
+            await asyncio.sleep(self.interval)
+            LOOP_LAG_SECONDS.observe(max(0.0, time.monotonic() - started - self.interval))
+
+    # -------------------------------------------------------------
+    # 감시 스레드
+    # -------------------------------------------------------------
+    def _route_of(self, task):
+        tracked = self.task_scopes.get(task) if task is not None else None
+        if tracked is None:
+            return "background", "-"
+        scope, request_id = tracked
+        route = scope.get("route")
+        return f"{scope['method']} {getattr(route, 'path', None) or scope['path']}", request_id
+
+    def _watch(self):
+        poll = max(self.interval / 2, 0.005)
+        stall = None  # 진행 중인 막힘: {"beat", "task", "route", "stack", "blocked"}
+
+        while not self.stopped.wait(poll):
+            beat = self.last_beat
+            blocked = time.monotonic() - beat - self.interval
+
+            if stall is not None and beat != stall["beat"]:
+                self._finish(stall)
+                stall = None
+
+            if blocked < self.threshold or stall is not None and stall["beat"] == beat:
+                if stall is not None:
+                    stall["blocked"] = blocked
+                continue
+
+            # 임계값을 처음 넘은 시점에 루프 스레드 스택을 캡처
+            frame = sys._current_frames().get(self.loop_thread_id)
+            task = asyncio.current_task(self.loop)
+            route, request_id = self._route_of(task)
+            stall = {
+                "beat": beat,
+                "task": task,
+                "route": route,
+                "request_id": request_id,
+                "stack": "".join(traceback.format_stack(frame)) if frame is not None else "",
+                "blocked": blocked,
+            }
+            logger.warning("이벤트 루프가 막혀 있습니다", extra={
+                "route": route, "blocked_request_id": request_id,
+                "blocked_ms": round(blocked * 1000, 1), "stack": stall["stack"]
+            })
+
+    def _finish(self, stall: dict):
+        LOOP_BLOCKED.inc(route=stall["route"])
+        logger.warning("이벤트 루프 막힘 해제", extra={
+            "route": stall["route"], "blocked_request_id": stall["request_id"],
+            "blocked_ms": round(stall["blocked"] * 1000, 1)
+        })
+        task = stall["task"]
+        if self.strict and task is not None and task in self.task_scopes and stall["blocked"] >= self.strict:
+            self.violations.setdefault(task, []).append(stall)
+
+    # -------------------------------------------------------------
+    # 요청 task 등록 (미들웨어에서 호출)
+    # -------------------------------------------------------------
+    def track(self, scope):
+        task = asyncio.current_task()
+        self.task_scopes[task] = (scope, request_id_var.get())
+        return task
+
+    def untrack(self, task) -> list:
+        self.task_scopes.pop(task, None)
+        return self.violations.pop(task, [])
+
+
+watchdog = LoopWatchdog()
+
+
+class LoopWatchdogMiddleware:
+    """
+    요청을 처리하는 task와 라우트를 연결해 막힘을 라우트별로 귀속.
+    엄격 모드에서는 응답 후 위반 내역이 있으면 BlockingCallError를 던짐.
+    """
+    def __init__(self, app, monitor: LoopWatchdog = None):
+        self.app = app
+        self.monitor = monitor or watchdog
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        task = self.monitor.track(scope)
+        try:
+            await self.app(scope, receive, send)
+            # 마지막 막힘은 감시 스레드가 해제를 확인할 때까지 잠깐 기다려야 집계됨
+            if self.monitor.strict:
+                await asyncio.sleep(self.monitor.interval * 2)
+        finally:
+            violations = self.monitor.untrack(task)
+
+        if violations:
+            worst = max(violations, key=lambda v: v["blocked"])
+            raise BlockingCallError(
+                f"{worst['route']} 핸들러가 이벤트 루프를 {worst['blocked'] * 1000:.0f}ms 동안 막았습니다 "
+                f"(허용 {self.monitor.strict * 1000:.0f}ms)\n{worst['stack']}"
+            )
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 # 1. 백분위 등급 정보 (Percentile)
@@ -8,6 +8,9 @@ class PercentileInfo(BaseModel):
     label: str = Field(..., description="등급 한글 라벨 (예: 상위 10~15%)")
     ratio: float = Field(..., description="내 매출 / 기준 매출 비율")
     benchmark_revenue: int = Field(..., description="비교 대상(동종업계) 평균 매출")
+    benchmark_lower: Optional[int] = Field(None, description="기준 매출 80% 구간 하한")
+    benchmark_upper: Optional[int] = Field(None, description="기준 매출 80% 구간 상한")
+    benchmark_source: Optional[str] = Field(None, description="기준값 출처 (interpolated, extrapolated, clamped)")
 
 # 2. 전월 대비 성장률 (MoM Growth)
 class MomGrowthInfo(BaseModel):
@@ -21,7 +24,10 @@ class MonthlyTrendInfo(BaseModel):
     my_store: List[int] = Field(..., description="내 매장 매출 리스트")
     industry_avg_all: List[int] = Field(..., description="서울시 전체 평균 매출 리스트")
     industry_avg_dong: List[int] = Field(..., description="행정동 평균 매출 리스트")
-    basis: str = Field(..., description="데이터 기준 (예: quarterly_month_average)")
+    industry_dong_lower: Optional[List[int]] = Field(None, description="행정동 기준 매출 80% 구간 하한 리스트")
+    industry_dong_upper: Optional[List[int]] = Field(None, description="행정동 기준 매출 80% 구간 상한 리스트")
+    benchmark_source: Optional[List[Optional[str]]] = Field(None, description="월별 기준값 출처 (interpolated, extrapolated, clamped)")
+    basis: str = Field(..., description="데이터 기준 (예: monthly_seasonal)")
 
 # 4. 최신 데이터 비교 (Latest Comparison)
 class LatestComparisonInfo(BaseModel):
@@ -30,7 +36,31 @@ class LatestComparisonInfo(BaseModel):
     industry_avg_all: int = Field(..., description="서울시 전체 평균")
     industry_avg_dong: int = Field(..., description="행정동 평균")
 
-# 5. 전체 분석 정보 스키마 (Main Schema)
+# 5. 고객 구성 vs 유동인구 격차 (Footfall Gap)
+class FootfallBucket(BaseModel):
+    key: str = Field(..., description="항목 키 (예: t17_21, a20, sat, female)")
+    store_share: float = Field(..., description="내 매장 매출 비중")
+    footfall_share: float = Field(..., description="행정동 유동인구 비중")
+    gap: float = Field(..., description="비중 차이 (음수면 덜 잡히는 고객층)")
+    capture_index: float = Field(..., description="매출 비중 / 유동인구 비중")
+
+class FootfallDimension(BaseModel):
+    score: float = Field(..., description="분포 차이 점수 (0~1, 총변동거리)")
+    buckets: List[FootfallBucket]
+
+class UnderCapturedInfo(BaseModel):
+    dimension: str = Field(..., description="차원 (time_slot, weekday, age, gender)")
+    key: str = Field(..., description="항목 키")
+    gap: float = Field(..., description="비중 차이")
+
+class FootfallGapInfo(BaseModel):
+    admin_code: str = Field(..., description="비교한 행정동 코드")
+    quarter: str = Field(..., description="비교한 유동인구 분기 (YYYYQ)")
+    score: float = Field(..., description="차원별 점수 평균")
+    dimensions: Dict[str, FootfallDimension] = Field(..., description="차원별 격차 (매장이 입력한 차원만)")
+    under_captured: List[UnderCapturedInfo] = Field(default=[], description="유동인구 대비 덜 잡히는 항목 (격차 큰 순)")
+
+# 6. 전체 분석 정보 스키마 (Main Schema)
 class AnalysisResultSchema(BaseModel):
     user_email: str = Field(..., description="사용자 이메일")
     created_at: datetime = Field(..., description="분석 생성/수정 일시")
@@ -40,6 +70,7 @@ class AnalysisResultSchema(BaseModel):
     mom_growth: MomGrowthInfo
     monthly_trend: MonthlyTrendInfo
     latest_comparison: LatestComparisonInfo
+    footfall_gap: Optional[FootfallGapInfo] = None
 
     class Config:
         json_schema_extra = {
@@ -63,13 +94,31 @@ class AnalysisResultSchema(BaseModel):
                     "my_store": [10000000, 12000000, 10000000],
                     "industry_avg_all": [321469110, 321469110, 300330547],
                     "industry_avg_dong": [7311100, 7311100, 10751618],
-                    "basis": "quarterly_month_average"
+                    "basis": "monthly_seasonal"
                 },
                 "latest_comparison": {
                     "month": "2025-07",
                     "my_store": 10000000,
                     "industry_avg_all": 300330547,
                     "industry_avg_dong": 10751618
+                },
+                "footfall_gap": {
+                    "admin_code": "11110530",
+                    "quarter": "20253",
+                    "score": 0.14,
+                    "dimensions": {
+                        "gender": {
+                            "score": 0.08,
+                            "buckets": [
+                                {"key": "male", "store_share": 0.4, "footfall_share": 0.48, "gap": -0.08, "capture_index": 0.833},
+                                {"key": "female", "store_share": 0.6, "footfall_share": 0.52, "gap": 0.08, "capture_index": 1.154}
+                            ]
+                        }
+                    },
+                    "under_captured": [
+                        {"dimension": "time_slot", "key": "t17_21", "gap": -0.12},
+                        {"dimension": "gender", "key": "male", "gap": -0.08}
+                    ]
                 }
             }
         }
\ No newline at end of file
@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+# 수익성 시뮬레이션 요청 (각 항목 값 목록의 모든 조합을 한 번에 계산)
+class SimulationRequest(BaseModel):
+    price_change: List[float] = Field([0.0], min_length=1, max_length=101, description="메뉴 가격 변화율 목록 (0.05 = +5%)")
+    cost_rate_change: List[float] = Field([0.0], min_length=1, max_length=101, description="원가율 변화 목록 (%p, 예: -2.0)")
+    turnover_change: List[float] = Field([0.0], min_length=1, max_length=101, description="좌석 회전율 변화율 목록 (0.1 = +10%)")
+    delivery_share: Optional[List[float]] = Field(None, min_length=1, max_length=101, description="배달 매출 비중 목록 (0~0.95, 없으면 현재 비중 유지)")
+
+    price_elasticity: float = Field(-1.0, le=0, description="가격 탄력성 (가격 1% 인상 시 판매량 변화 %)")
+    delivery_fee_rate: float = Field(0.15, ge=0, lt=1, description="배달 매출에 붙는 수수료율")
+    top_n: int = Field(5, ge=1, le=50, description="이익이 큰 순으로 돌려줄 시나리오 수")
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "price_change": [-0.1, -0.05, 0.0, 0.05, 0.1],
+                "cost_rate_change": [-3.0, 0.0, 3.0],
+                "turnover_change": [0.0, 0.1, 0.2],
+                "delivery_share": [0.1, 0.2, 0.3],
+                "price_elasticity": -1.0,
+                "delivery_fee_rate": 0.15,
+                "top_n": 5
+            }
+        }
+    }
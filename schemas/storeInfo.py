@@ -59,6 +59,10 @@ class SalesLog(BaseModel):
     profit: int = Field(..., description="순이익")
     details: Optional[SalesLogDetails] = None
 
+# 매출 로그 추가/수정 (PATCH용)
+class SalesLogPatchSchema(BaseModel):
+    sales_logs: List[SalesLog] = Field(..., min_length=1, description="추가하거나 수정할 월별 매출 (ym 기준)")
+
 # 4. 고정 지출
 class FixedCost(BaseModel):
     electricity: Optional[int] = 0